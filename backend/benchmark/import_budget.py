@@ -0,0 +1,73 @@
+# @Function: 启动导入耗时检查
+# 在全新的子进程中 import main，用 python -X importtime 统计总耗时，超出预算或加载了应按需导入的模块时以非零状态退出，
+# 用于防止启动变慢（worker 重启、扩容时每个进程都要付出这段时间）；CI 中由 tests/test_import_budget.py 调用 measure 检查，本脚本用于排查耗时最多的模块。
+# 用法（在 backend 目录下）：
+#   python -m benchmark.import_budget --budget-ms 1500 --runs 5
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# 这些模块较重或会建立连接，应在第一次使用时才导入
+LAZY_MODULES = ("openai", "httpx", "pymysql", "aiomysql", "numpy")
+
+PROBE = "import sys, main; print('LOADED:' + ','.join(m for m in {modules!r} if m in sys.modules))"
+
+
+def measure(target: str, lazy: tuple) -> tuple[float, dict[str, tuple[int, int]], list[str]]:
+    """返回 (总耗时毫秒, 模块 -> (自身耗时, 累计耗时) 微秒, 被提前导入的模块)"""
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = PROBE.replace("main", target, 1).format(modules=lazy)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=backend, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"❌ 导入 {target} 失败")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    # 导入过程中的启动提示也会打印到标准输出，只取探测结果那一行
+    result = next(line for line in proc.stdout.splitlines() if line.startswith("LOADED:"))
+    loaded = [m for m in result[len("LOADED:"):].split(",") if m]
+    return modules[target][1] / 1000, modules, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动导入耗时检查")
+    parser.add_argument("--target", default="main", help="要导入的模块")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="导入耗时预算（毫秒），取多次运行的中位数比较")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="列出自身耗时最多的模块数")
+    parser.add_argument("--allow", nargs="*", default=[], help="允许在导入时加载的模块，从默认的按需导入列表中排除")
+    args = parser.parse_args()
+
+    lazy = tuple(m for m in LAZY_MODULES if m not in args.allow)
+    totals = []
+    for _ in range(args.runs):
+        total, modules, loaded = measure(args.target, lazy)
+        totals.append(total)
+    median = statistics.median(totals)
+
+    print(f"⏱️ import {args.target}：中位数 {median:.0f} ms（{', '.join(f'{t:.0f}' for t in totals)}），预算 {args.budget_ms:.0f} ms")
+    print(f"自身耗时最多的 {args.top} 个模块（最后一次运行）：")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda m: -m[1][0])[:args.top]:
+        print(f"   {self_us / 1000:8.1f} ms  {name}（累计 {cumulative_us / 1000:.1f} ms）")
+
+    failed = False
+    if median > args.budget_ms:
+        print(f"❌ 导入耗时超出预算 {median - args.budget_ms:.0f} ms")
+        failed = True
+    if loaded:
+        print(f"❌ 以下模块应按需导入，却在导入 {args.target} 时被加载：{', '.join(loaded)}")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ 导入耗时在预算内")
+
+
+if __name__ == "__main__":
+    main()
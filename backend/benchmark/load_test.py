@@ -0,0 +1,245 @@
+# @Function: 后端接口并发压测
+# 对各路由的流式/非流式接口施加并发负载，统计 p50/p95/p99 延迟、首字耗时（TTFT）
+# 和每个服务进程可持续承载的流数，结果写入 JSON 文件，可与基线结果对比发现性能回退。
+# 用法（在 backend 目录下，先启动 benchmark.mock_llm 和指向它的后端服务）：
+#   python -m benchmark.load_test --target http://127.0.0.1:8000 --concurrency 50 --duration 30 \
+#       --out bench.json --baseline bench_baseline.json
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Optional
+
+import httpx
+
+
+class Scenario:
+    def __init__(self, name: str, method: str, path: str, body: Callable[[str], Optional[dict]] = None,
+                 stream: bool = False, expect: tuple = (200,)):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body or (lambda nonce: None)  # 参数为请求唯一标识，用于绕过生成结果缓存
+        self.stream = stream  # 是否为 SSE 流式接口
+        self.expect = expect  # 视为成功的状态码
+
+
+SAMPLE_CODE = "def add(a, b):\n    return a + b\n"
+
+SCENARIOS = {s.name: s for s in [
+    Scenario("requirementgen", "POST", "/api/requirementgen/",
+             lambda n: {"topic": f"用户登录模块 {n}"}),
+    Scenario("requirementgen_stream", "POST", "/api/requirementgen/",
+             lambda n: {"topic": f"用户登录模块 {n}", "stream": True}, stream=True),
+    Scenario("architecture", "POST", "/api/architecture/",
+             lambda n: {"requirement_text": f"在线需求管理系统 {n}"}),
+    Scenario("architecture_stream", "POST", "/api/architecture/",
+             lambda n: {"requirement_text": f"在线需求管理系统 {n}", "stream": True}, stream=True),
+    Scenario("codegen", "POST", "/api/codegen/",
+             lambda n: {"module_description": f"用户注册接口 {n}"}),
+    Scenario("codegen_stream", "POST", "/api/codegen/",
+             lambda n: {"module_description": f"用户注册接口 {n}", "stream": True}, stream=True),
+    Scenario("testing", "POST", "/api/test/",
+             lambda n: {"code": f"{SAMPLE_CODE}# {n}"}),
+    Scenario("testing_stream", "POST", "/api/test/",
+             lambda n: {"code": f"{SAMPLE_CODE}# {n}", "stream": True}, stream=True),
+    Scenario("agent_stream", "POST", "/api/agent/stream",
+             lambda n: {"role": "analyst", "input_text": f"设计一个任务看板 {n}", "mode": "single_chat"},
+             stream=True),
+    Scenario("agent_meeting", "POST", "/api/agent/meeting",
+             lambda n: {"topic": f"设计一个任务看板 {n}"}, stream=True),
+    Scenario("requirement_list", "GET", "/api/requirement/?limit=20"),
+    Scenario("requirement_create", "POST", "/api/requirement/",
+             lambda n: {"title": f"压测需求 {n}", "content": "压测数据", "priority": "低"}),
+    Scenario("user_login", "POST", "/api/user/login",
+             lambda n: {"email": f"bench-{n}@example.com", "password": "x"}, expect=(200, 401)),
+]}
+
+# 不依赖数据库的场景，默认只跑这些
+GENERATION_SCENARIOS = [name for name in SCENARIOS if not name.startswith(("requirement_", "user_"))]
+
+
+class Sample:
+    __slots__ = ("ok", "status", "latency", "ttft")
+
+    def __init__(self, ok: bool, status: int, latency: float, ttft: Optional[float]):
+        self.ok = ok
+        self.status = status
+        self.latency = latency
+        self.ttft = ttft
+
+
+def percentile(sorted_values: list[float], q: float) -> Optional[float]:
+    """最近秩法求分位数"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_ms(values: list[float]) -> Optional[dict]:
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "p50": round(percentile(values, 0.50) * 1000, 2),
+        "p95": round(percentile(values, 0.95) * 1000, 2),
+        "p99": round(percentile(values, 0.99) * 1000, 2),
+        "mean": round(sum(values) / len(values) * 1000, 2),
+        "max": round(values[-1] * 1000, 2),
+    }
+
+
+async def send(client: httpx.AsyncClient, scenario: Scenario, cacheable: bool) -> Sample:
+    nonce = "bench" if cacheable else uuid.uuid4().hex[:12]
+    started = time.perf_counter()
+    ttft = None
+    try:
+        async with client.stream(scenario.method, scenario.path, json=scenario.body(nonce)) as response:
+            ok = response.status_code in scenario.expect
+            if scenario.stream and ok:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue  # 心跳和 id 行
+                    payload = json.loads(line[5:])
+                    if "error" in payload:
+                        ok = False
+                    elif ttft is None and payload.get("content"):
+                        ttft = time.perf_counter() - started
+            else:
+                await response.aread()
+            return Sample(ok, response.status_code, time.perf_counter() - started, ttft)
+    except httpx.HTTPError:
+        return Sample(False, 0, time.perf_counter() - started, None)
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, concurrency: int,
+                       duration: float, requests: Optional[int], cacheable: bool,
+                       server_workers: int) -> dict:
+    samples: list[Sample] = []
+    deadline = time.perf_counter() + duration
+    remaining = [requests] if requests else None
+
+    async def worker():
+        while True:
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            elif time.perf_counter() >= deadline:
+                return
+            samples.append(await send(client, scenario, cacheable))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    ok = [s for s in samples if s.ok]
+    statuses: dict[str, int] = {}
+    for s in samples:
+        statuses[str(s.status)] = statuses.get(str(s.status), 0) + 1
+    result = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "error_rate": round((len(samples) - len(ok)) / len(samples), 4) if samples else 0.0,
+        "status_codes": statuses,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "latency_ms": summarize_ms([s.latency for s in ok]),
+        "ttft_ms": summarize_ms([s.ttft for s in ok if s.ttft is not None]),
+    }
+    if scenario.stream:
+        # 同时保持打开的平均流数 = 全部流的持续时间之和 / 墙钟时间
+        sustained = sum(s.latency for s in ok) / wall if wall else 0.0
+        result["sustained_streams"] = round(sustained, 2)
+        result["streams_per_worker"] = round(sustained / server_workers, 2)
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """对比基线，返回 p95 延迟/TTFT 变慢或错误率升高超过容忍度的项"""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for metric in ("latency_ms", "ttft_ms"):
+            if current.get(metric) and base.get(metric):
+                old, new = base[metric]["p95"], current[metric]["p95"]
+                if old and new > old * (1 + tolerance):
+                    regressions.append(f"{name} {metric}.p95 {old} -> {new}（+{(new / old - 1):.0%}）")
+        if current["error_rate"] > base["error_rate"] + tolerance / 10:
+            regressions.append(f"{name} error_rate {base['error_rate']} -> {current['error_rate']}")
+    return regressions
+
+
+async def run(args) -> dict:
+    names = args.scenarios or GENERATION_SCENARIOS
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"未知的场景：{', '.join(unknown)}；可选：{', '.join(SCENARIOS)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "target": args.target,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "requests": args.requests,
+            "server_workers": args.server_workers,
+            "cacheable": args.cacheable,
+        },
+        "scenarios": {},
+    }
+    async with httpx.AsyncClient(base_url=args.target, limits=limits, timeout=args.timeout) as client:
+        for name in names:
+            print(f"🚀 场景 {name}：并发 {args.concurrency}")
+            result = await run_scenario(client, SCENARIOS[name], args.concurrency, args.duration,
+                                        args.requests, args.cacheable, args.server_workers)
+            results["scenarios"][name] = result
+            latency = result["latency_ms"] or {}
+            ttft = result["ttft_ms"] or {}
+            print(f"   {result['requests']} 次请求，失败 {result['errors']}，{result['throughput_rps']} req/s，"
+                  f"p50/p95/p99 {latency.get('p50')}/{latency.get('p95')}/{latency.get('p99')} ms，"
+                  f"TTFT p95 {ttft.get('p95')} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后端接口并发压测")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="后端服务地址")
+    parser.add_argument("--scenarios", nargs="*", help=f"要运行的场景，默认只跑生成类场景；可选：{', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=20, help="每个场景的并发请求数")
+    parser.add_argument("--duration", type=float, default=20, help="每个场景的持续时间（秒）")
+    parser.add_argument("--requests", type=int, help="每个场景的请求总数，设置后忽略 --duration")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--server-workers", type=int, default=1, help="后端服务的进程数，用于计算每进程承载的流数")
+    parser.add_argument("--cacheable", action="store_true", help="使用固定输入（测缓存/合并命中），默认每个请求输入唯一")
+    parser.add_argument("--out", default="bench_results.json", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="基线结果 JSON 文件，用于回退对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的 p95 变慢比例")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"📄 结果已写入 {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ 相比基线出现性能回退：")
+            for line in regressions:
+                print("   " + line)
+            sys.exit(1)
+        print("✅ 未发现性能回退")
+
+
+if __name__ == "__main__":
+    main()
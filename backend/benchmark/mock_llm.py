@@ -0,0 +1,138 @@
+# @Function: 本地 OpenAI 兼容的模拟大模型服务，供离线压测使用
+# 按配置的首字延迟和生成速度流式返回 token，不消耗 DeepSeek 额度。
+# 用法（在 backend 目录下）：
+#   python -m benchmark.mock_llm --port 9100 --ttft 0.3 --tokens-per-second 40 --tokens 300
+# 后端启动时设置 LLM_BASE_URL=http://127.0.0.1:9100 即指向该服务。
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# 模拟输出的文本片段，包含架构生成解析依赖的段落标记
+SAMPLE_TEXT = (
+    "【架构设计】\n1. 系统架构概述：采用前后端分离的分层架构。\n2. 核心组件说明：网关、业务服务、数据访问层。\n"
+    "【数据库设计】\nCREATE TABLE users (id INT PRIMARY KEY, name VARCHAR(64));\n"
+    "用例描述：用户登录后创建需求。关键业务逻辑：需求状态流转。\n"
+)
+
+
+class MockSettings:
+    def __init__(self, ttft: float = 0.3, tokens_per_second: float = 40, tokens: int = 300,
+                 jitter: float = 0.1, chars_per_token: int = 2, error_rate: float = 0.0):
+        self.ttft = ttft  # 首个 token 前的延迟（秒）
+        self.tokens_per_second = tokens_per_second  # 每个流的生成速度
+        self.tokens = tokens  # 每次输出的 token 数
+        self.jitter = jitter  # 延迟的随机抖动比例
+        self.chars_per_token = chars_per_token  # 每个 token 对应的字符数
+        self.error_rate = error_rate  # 随机返回 500 的比例
+
+
+def _jittered(value: float, jitter: float) -> float:
+    return max(0.0, value * (1 + random.uniform(-jitter, jitter)))
+
+
+def _completion_text(settings: MockSettings) -> list[str]:
+    total = settings.tokens * settings.chars_per_token
+    text = (SAMPLE_TEXT * (total // len(SAMPLE_TEXT) + 1))[:total]
+    step = settings.chars_per_token
+    return [text[i:i + step] for i in range(0, total, step)]
+
+
+def _usage(prompt: str, completion_tokens: int) -> dict:
+    prompt_tokens = max(1, len(prompt) // 2)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_cache_hit_tokens": prompt_tokens // 2,
+        "prompt_cache_miss_tokens": prompt_tokens - prompt_tokens // 2,
+    }
+
+
+def create_app(settings: MockSettings) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+    stats = {"requests": 0, "streams": 0, "active": 0}
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    @app.post("/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        if settings.error_rate and random.random() < settings.error_rate:
+            return JSONResponse({"error": {"message": "mock upstream error"}}, status_code=500)
+
+        prompt = "".join(m.get("content") or "" for m in body.get("messages", []))
+        tokens = _completion_text(settings)
+        usage = _usage(prompt, len(tokens))
+        model = body.get("model", "mock")
+        created = int(time.time())
+        interval = 1 / settings.tokens_per_second if settings.tokens_per_second > 0 else 0
+
+        if not body.get("stream"):
+            await asyncio.sleep(_jittered(settings.ttft + interval * len(tokens), settings.jitter))
+            return {
+                "id": "mock-completion",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def generate():
+            stats["streams"] += 1
+            stats["active"] += 1
+            try:
+                await asyncio.sleep(_jittered(settings.ttft, settings.jitter))
+                for token in tokens:
+                    chunk = {
+                        "id": "mock-stream", "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                    if interval:
+                        await asyncio.sleep(_jittered(interval, settings.jitter))
+                if include_usage:
+                    chunk = {"id": "mock-stream", "object": "chat.completion.chunk", "created": created,
+                             "model": model, "choices": [], "usage": usage}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                stats["active"] -= 1
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容的模拟大模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft", type=float, default=0.3, help="首个 token 前的延迟（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=40, help="每个流的生成速度，0 表示不限速")
+    parser.add_argument("--tokens", type=int, default=300, help="每次输出的 token 数")
+    parser.add_argument("--jitter", type=float, default=0.1, help="延迟的随机抖动比例")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 500 的比例")
+    args = parser.parse_args()
+
+    settings = MockSettings(ttft=args.ttft, tokens_per_second=args.tokens_per_second, tokens=args.tokens,
+                            jitter=args.jitter, error_rate=args.error_rate)
+    print(f"🧪 模拟大模型服务启动：http://{args.host}:{args.port}（设置 LLM_BASE_URL 指向该地址）")
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
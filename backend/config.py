@@ -14,3 +14,157 @@ DB_USER = os.getenv("DB_USER", "root")
 DB_PASS = os.getenv("DB_PASS", "password")
 DB_NAME = os.getenv("DB_NAME", "softeng_platform")
 
+
+# 大模型（DeepSeek OpenAI兼容接口）配置
+LLM_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.deepseek.com")
+LLM_MODEL = os.getenv("LLM_MODEL", "deepseek-chat")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "500"))  # 连接池最大连接数
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "100"))  # 保持复用的空闲长连接数
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+
+# 多上游路由：逗号分隔的上游名，顺序即主备顺序；deepseek 使用上面的 LLM_* 配置，
+# ollama 使用 OLLAMA_*，其他名称 X 读取 LLM_PROVIDER_X_BASE_URL / _API_KEY / _MODEL
+LLM_PROVIDERS = [p.strip() for p in os.getenv("LLM_PROVIDERS", "deepseek").split(",") if p.strip()]
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:7b")
+# weighted 策略的权重，格式 "上游=权重,..."，未列出的为 1
+LLM_PROVIDER_WEIGHTS = {
+    name.strip(): float(weight)
+    for name, weight in (
+        item.split("=") for item in os.getenv("LLM_PROVIDER_WEIGHTS", "").split(",") if item.strip()
+    )
+}
+# 路由策略：fallback（主备）、hedged（对冲）、weighted（加权）；
+# 按接口单独设置的格式 "接口=策略,..."，接口为提示词模板名的前缀，如 "single_chat=hedged,requirement=weighted"
+LLM_ROUTING_POLICY = os.getenv("LLM_ROUTING_POLICY", "fallback")
+LLM_ROUTING_POLICIES = {
+    name.strip(): policy.strip()
+    for name, policy in (
+        item.split("=") for item in os.getenv("LLM_ROUTING_POLICIES", "").split(",") if item.strip()
+    )
+}
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "0.8"))  # 多久没有首字就向下一个上游发对冲请求（秒）
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "3"))  # 连续失败多少次暂停使用该上游
+LLM_CIRCUIT_COOLDOWN = float(os.getenv("LLM_CIRCUIT_COOLDOWN", "30"))  # 暂停时长（秒）
+
+
+def llm_provider_settings(name: str) -> dict:
+    """上游的连接配置：base_url、api_key、model（为空表示使用调用方指定的模型）"""
+    if name == "deepseek":
+        return {"base_url": LLM_BASE_URL, "api_key": LLM_API_KEY, "model": None}
+    if name == "ollama":
+        return {"base_url": OLLAMA_BASE_URL, "api_key": os.getenv("OLLAMA_API_KEY", "ollama"), "model": OLLAMA_MODEL}
+    prefix = f"LLM_PROVIDER_{name.upper()}_"
+    return {
+        "base_url": os.environ[prefix + "BASE_URL"],
+        "api_key": os.getenv(prefix + "API_KEY", "none"),
+        "model": os.getenv(prefix + "MODEL"),
+    }
+
+# SSE 流式输出配置（各路由可按需覆盖）
+SSE_MAX_CHARS = int(os.getenv("SSE_MAX_CHARS", "48"))  # 缓冲字符数达到该值立即发送
+SSE_MAX_DELAY = float(os.getenv("SSE_MAX_DELAY", "0.05"))  # 缓冲最长等待时间（秒）
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", "15"))  # 空闲心跳间隔（秒）
+
+# 可续传的流式生成：生成在后台独立运行，已发送的事件保存在环形缓冲中，断线后凭 Last-Event-ID 补发；
+# 只对请求头带 X-Resumable-Stream: true（或查询参数 resumable=true）的请求生效，其余请求断开即取消生成
+RESUMABLE_STREAMS = os.getenv("RESUMABLE_STREAMS", "true").lower() == "true"
+STREAM_BUFFER_EVENTS = int(os.getenv("STREAM_BUFFER_EVENTS", "2000"))  # 每个流最多保留的事件数
+STREAM_BUFFER_BYTES = int(os.getenv("STREAM_BUFFER_BYTES", str(1024 * 1024)))  # 每个流的事件缓冲上限（字节）
+STREAM_TTL = float(os.getenv("STREAM_TTL", "300"))  # 生成结束后保留多久供续传和查询结果（秒）
+STREAM_ABANDON_AFTER = float(os.getenv("STREAM_ABANDON_AFTER", "120"))  # 无人连接或查询超过该时长则取消生成（秒）
+STREAM_MAX_STREAMS = int(os.getenv("STREAM_MAX_STREAMS", "1000"))  # 同时保留的流数上限
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(64 * 1024 * 1024)))  # 所有流的缓冲和结果总上限（字节）
+
+# 生成结果缓存配置（内存 LRU + SQLite 磁盘两级）
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(os.path.dirname(__file__), "data", "llm_cache.sqlite3"))
+CACHE_TTL = int(os.getenv("CACHE_TTL", str(7 * 24 * 3600)))  # 缓存有效期（秒）
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))  # 内存层最大条目数
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # 内存层最大字节数
+CACHE_DISK_MAX_ENTRIES = int(os.getenv("CACHE_DISK_MAX_ENTRIES", "100000"))  # 磁盘层最大条目数
+
+# 语义近似缓存（默认关闭）：输入与以前的输入足够相似时直接复用以前的生成结果，如“用户登录模块”与“用户登录功能模块”
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", os.path.join(os.path.dirname(__file__), "data", "semantic_index.bin"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))  # 字符 n-gram 哈希到的向量维数
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))  # 索引容量，写满后覆盖最早的条目
+SEMANTIC_CACHE_TOP_K = int(os.getenv("SEMANTIC_CACHE_TOP_K", "3"))  # 每次查找返回的候选数
+# 启用语义缓存的接口及其余弦相似度阈值，格式 "接口=阈值,..."，接口为提示词模板名的前缀；未列出的接口不使用。
+# 默认值按 tests/test_semantic_cache.py 中的标注样例选取：需求主题只差“模块/功能/系统”等字样时命中，
+# 不同功能不命中；需求正文只有标点、空白、写法差异时命中，改动内容（哪怕几个字）不命中
+SEMANTIC_CACHE_THRESHOLDS = {
+    name.strip(): float(value)
+    for name, value in (
+        item.split("=") for item in os.getenv(
+            "SEMANTIC_CACHE_THRESHOLDS", "requirement=0.8,architecture=0.99"
+        ).split(",") if item.strip()
+    )
+}
+
+# 批量生成接口配置
+# 每个进行中的条目占用一个全局准入名额（ADMISSION_MAX_ACTIVE），单个请求的并发应远小于全局上限
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))  # 默认并发数
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))  # 单次请求允许的最大并发数
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))  # 单次请求最多条目数
+
+# 会话状态存储配置
+CONVERSATION_MAX = int(os.getenv("CONVERSATION_MAX", "1000"))  # 内存中最多保留的会话数
+CONVERSATION_TTL = int(os.getenv("CONVERSATION_TTL", str(2 * 3600)))  # 会话空闲过期时间（秒）
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "3000"))  # 历史上下文的 token 预算
+CONVERSATION_RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", "6"))  # 至少原样保留的最近轮数
+
+# 数据库连接池配置（同步与异步引擎共用）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # 获取连接的等待时间（秒）
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # 小于 MySQL wait_timeout，避免使用已被服务端断开的连接
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# 生成接口准入控制（全局 + 每个接口的并发上限和等待队列）
+ADMISSION_MAX_ACTIVE = int(os.getenv("ADMISSION_MAX_ACTIVE", "64"))  # 全局同时进行的生成数
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))  # 全局等待队列长度
+ADMISSION_ENDPOINT_ACTIVE = int(os.getenv("ADMISSION_ENDPOINT_ACTIVE", "32"))  # 每个接口默认并发上限
+ADMISSION_ENDPOINT_QUEUE = int(os.getenv("ADMISSION_ENDPOINT_QUEUE", "64"))  # 每个接口默认等待队列长度
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))  # 排队最长等待时间（秒）
+# 单独设置某些接口的上限，格式 "接口=并发:队列,..."，如 "agent_meeting=8:16,codegen_batch=4:8"
+ADMISSION_ENDPOINT_LIMITS = {
+    name.strip(): tuple(int(v) for v in limits.split(":"))
+    for name, limits in (
+        item.split("=") for item in os.getenv(
+            "ADMISSION_ENDPOINT_LIMITS", "agent_meeting=8:16,codegen_batch=4:8,test_batch=4:8"
+        ).split(",") if item.strip()
+    )
+}
+
+# 需求修订历史：每隔多少个修订保存一次完整快照（还原任一修订最多应用 N-1 次差异）
+REVISION_SNAPSHOT_INTERVAL = int(os.getenv("REVISION_SNAPSHOT_INTERVAL", "10"))
+
+# 登录认证配置
+# 访问令牌的签名密钥；未设置时首次启动随机生成并保存到 AUTH_SECRET_FILE，所有 worker 和重启后共用同一密钥
+AUTH_SECRET_KEY = os.getenv("AUTH_SECRET_KEY")
+AUTH_SECRET_FILE = os.getenv("AUTH_SECRET_FILE", os.path.join(os.path.dirname(__file__), "data", "auth_secret.key"))
+AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", str(12 * 3600)))  # 访问令牌有效期（秒）
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))  # 已验证令牌和用户信息的缓存时间（秒）
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "600000"))  # PBKDF2-SHA256 迭代次数
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))  # 计算密码哈希的专用线程数
+
+# 生成结果自动存档（异步批量写入 documents 表）
+DOCUMENT_WRITE_BATCH = int(os.getenv("DOCUMENT_WRITE_BATCH", "50"))  # 攒够多少条写一次
+DOCUMENT_WRITE_INTERVAL = float(os.getenv("DOCUMENT_WRITE_INTERVAL", "1.0"))  # 最早一条最多等待多久（秒）
+DOCUMENT_WRITE_QUEUE = int(os.getenv("DOCUMENT_WRITE_QUEUE", "1000"))  # 待写队列上限，满了生成请求等待入队
+
+# 后台任务队列
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # 同时执行的后台任务数
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "1000"))  # 排队任务上限
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "1000"))  # 保留的任务记录数（含已结束的）
+# 交互式生成数（占用 + 排队的准入名额）达到该值时，推测性任务暂不启动，已在运行的继续执行
+JOB_SPECULATIVE_MAX_LOAD = int(os.getenv("JOB_SPECULATIVE_MAX_LOAD", "8"))
+# 交互式生成数达到该值（默认全局并发上限，即再来的请求就要排队）时，运行中的推测性任务才让出并重新排队；
+# 让出会丢弃已经消耗的额度，不应低于 JOB_SPECULATIVE_MAX_LOAD
+JOB_SPECULATIVE_PREEMPT_LOAD = int(os.getenv("JOB_SPECULATIVE_PREEMPT_LOAD", str(ADMISSION_MAX_ACTIVE)))
+# 需求确认后预先生成架构设计，写入生成结果缓存
+SPECULATIVE_ARCHITECTURE = os.getenv("SPECULATIVE_ARCHITECTURE", "true").lower() == "true"
@@ -4,19 +4,78 @@
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
-from config import DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_NAME
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from utils.metrics import instrument_engine
+from config import (
+    DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_NAME,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+)
 
 # 构造 MySQL 连接字符串
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
+ASYNC_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
 
-# 创建 SQLAlchemy 引擎和会话工厂
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 连接池参数
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+# 引擎和会话工厂在第一次使用时才创建（导入数据库驱动、建立连接池），
+# 导入本模块不产生连接；预加载后 fork 多个 worker 时，各 worker 使用自己的连接池。
+# engine / SessionLocal / async_engine / AsyncSessionLocal 仍可直接 from db import
+SYNC_NAMES = ("engine", "SessionLocal")
+ASYNC_NAMES = ("async_engine", "AsyncSessionLocal")
+
+
+def _create_sync():
+    global engine, SessionLocal
+    engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # 记录语句执行耗时，见 /metrics 的 db_query_seconds
+    instrument_engine(engine)
+
+
+def _create_async():
+    # 异步引擎和会话工厂，供 async 路由使用，不占用线程池
+    global async_engine, AsyncSessionLocal
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_OPTIONS)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    instrument_engine(async_engine.sync_engine)
+
+
+def _lazy(name: str):
+    """返回引擎或会话工厂，还没有创建（也没有被替换）时先创建"""
+    if name not in globals():
+        (_create_sync if name in SYNC_NAMES else _create_async)()
+    return globals()[name]
+
+
+def __getattr__(name: str):
+    if name in SYNC_NAMES or name in ASYNC_NAMES:
+        return _lazy(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def dispose_engines():
+    """关闭已创建的连接池"""
+    if "async_engine" in globals():
+        await async_engine.dispose()
+    if "engine" in globals():
+        engine.dispose()
 
 # FastAPI 依赖项：获取数据库会话
 def get_db():
-    db: Session = SessionLocal()
+    db: Session = _lazy("SessionLocal")()
     try:
         yield db
     finally:
         db.close()
+
+# FastAPI 依赖项：获取异步数据库会话
+async def get_async_db():
+    async with _lazy("AsyncSessionLocal")() as db:
+        yield db
@@ -4,7 +4,10 @@ from models.base import Base
 # 导入所有模型，确保它们注册到 Base.metadata 中
 import models.user
 import models.requirement
+import models.requirement_revision
 import models.task
+import models.document
+import models.search
 
 def init():
     print("🔧 正在创建数据库表结构...")
@@ -1,6 +1,16 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routers import requirement, requirementgen, architecture, codegen, testing, agent
+from routers import user, requirement, requirementgen, architecture, codegen, testing, agent, document, search, jobs, streams
+from services.llm_gateway import llm_gateway
+from services.document_writer import document_writer
+from db import dispose_engines
+from utils.cache import generation_cache
+from utils.singleflight import single_flight
+from utils.semantic_cache import semantic_cache
+from utils.jobs import job_queue
+from utils.streams import stream_registry
+from utils.metrics import registry as metrics_registry
 
 app = FastAPI(title="AI开发助手API")
 
@@ -11,16 +21,62 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Stream-Id"],  # 浏览器端需要读取续传用的流 id
 )
 
 # 注册路由
+app.include_router(user.router, prefix="/api/user", tags=["用户管理"])
 app.include_router(requirement.router, prefix="/api/requirement", tags=["需求管理"])
 app.include_router(requirementgen.router, prefix="/api/requirementgen", tags=["需求生成"])
 app.include_router(architecture.router, prefix="/api/architecture", tags=["架构设计"])
 app.include_router(codegen.router, prefix="/api/codegen", tags=["代码生成"])
 app.include_router(testing.router, prefix="/api/test", tags=["测试生成"])
 app.include_router(agent.router, prefix="/api/agent", tags=["智能助手"])  # 添加agent路由
+app.include_router(document.router, prefix="/api/document", tags=["文档管理"])
+app.include_router(search.router, prefix="/api/search", tags=["全文检索"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["后台任务"])
+app.include_router(streams.router, prefix="/api/streams", tags=["流式续传"])
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    # 先停止后台任务和后台生成的流，它们还会用到大模型网关和数据库
+    await job_queue.aclose()
+    await stream_registry.aclose()
+
+@app.on_event("shutdown")
+async def close_llm_gateway():
+    # 关闭大模型网关的共享连接池
+    await llm_gateway.aclose()
+
+@app.on_event("shutdown")
+async def flush_document_writer():
+    # 先写完待存档的生成结果，再关闭数据库连接池
+    await document_writer.aclose()
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    await dispose_engines()
 
 @app.get("/")
 def read_root():
     return {"message": "欢迎使用AI开发助手API"}
+
+@app.get("/api/cache/stats", tags=["系统"])
+def cache_stats():
+    """生成结果缓存的命中/未命中统计、语义近似缓存命中情况、相同请求的合并情况，以及各提示词模板的上游上下文缓存命中率"""
+    return {
+        **generation_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "semantic": semantic_cache.stats(),
+        "prompt_usage": llm_gateway.usage_stats(),
+    }
+
+@app.get("/api/llm/providers", tags=["系统"])
+def llm_providers():
+    """各大模型上游的路由策略、首字耗时/完整耗时滑动平均、错误率和是否暂停使用"""
+    return llm_gateway.provider_stats()
+
+@app.get("/metrics", tags=["系统"], response_class=PlainTextResponse)
+def metrics():
+    """Prometheus 文本格式的指标：生成首字耗时/总耗时/生成速度/token 数、进行中的流、数据库查询耗时"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,100 @@
+# @Function: 把 documents 表从明文 content 列迁移到压缩存储（content_compressed 等列）
+# 旧库升级时在停服状态下运行一次：python migrate_documents.py
+# 可重复执行：已回填的行会跳过，中途失败后重新运行即可继续
+
+from sqlalchemy import inspect, text
+from db import engine
+from services.document import encode_content
+
+BATCH = 200  # 每批回填的行数
+
+# 新增的列，先允许为空，回填完成后再改为 NOT NULL
+NEW_COLUMNS = {
+    "mysql": {
+        "content_compressed": "LONGBLOB NULL",
+        "compression": "VARCHAR(16) NULL",
+        "size": "INTEGER NULL",
+        "compressed_size": "INTEGER NULL",
+        "content_hash": "VARCHAR(64) NULL",
+    },
+    "default": {
+        "content_compressed": "BLOB",
+        "compression": "VARCHAR(16)",
+        "size": "INTEGER",
+        "compressed_size": "INTEGER",
+        "content_hash": "VARCHAR(64)",
+    },
+}
+
+
+def _columns(conn) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns("documents")}
+
+
+def add_columns(conn):
+    existing = _columns(conn)
+    definitions = NEW_COLUMNS.get(conn.dialect.name, NEW_COLUMNS["default"])
+    for name, definition in definitions.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE documents ADD COLUMN {name} {definition}"))
+            print(f"➕ 已添加列 documents.{name}")
+    indexes = {index["name"] for index in inspect(conn).get_indexes("documents")}
+    if "ix_documents_task_id" not in indexes:
+        conn.execute(text("CREATE INDEX ix_documents_task_id ON documents (task_id)"))
+        print("➕ 已添加索引 ix_documents_task_id")
+
+
+def backfill(conn) -> int:
+    """按 id 分批压缩旧正文，返回回填的行数"""
+    done, last_id = 0, 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, content FROM documents WHERE content_compressed IS NULL AND id > :last_id "
+            "ORDER BY id LIMIT :batch"
+        ), {"last_id": last_id, "batch": BATCH}).all()
+        if not rows:
+            return done
+        for doc_id, content in rows:
+            conn.execute(text(
+                "UPDATE documents SET content_compressed = :content_compressed, compression = :compression, "
+                "size = :size, compressed_size = :compressed_size, content_hash = :content_hash WHERE id = :id"
+            ), {**encode_content(content or ""), "id": doc_id})
+        conn.commit()
+        done += len(rows)
+        last_id = rows[-1][0]
+        print(f"📦 已回填 {done} 篇文档")
+
+
+def finish(conn):
+    """删除旧的 content 列，MySQL 上把新列改为 NOT NULL"""
+    missing = conn.execute(text("SELECT COUNT(*) FROM documents WHERE content_compressed IS NULL")).scalar()
+    if missing:
+        raise RuntimeError(f"仍有 {missing} 篇文档未回填，未删除 content 列")
+    if conn.dialect.name == "mysql":
+        conn.execute(text(
+            "ALTER TABLE documents "
+            "MODIFY content_compressed LONGBLOB NOT NULL, MODIFY compression VARCHAR(16) NOT NULL, "
+            "MODIFY size INTEGER NOT NULL, MODIFY compressed_size INTEGER NOT NULL, "
+            "MODIFY content_hash VARCHAR(64) NOT NULL"
+        ))
+    # SQLite 3.35 起支持 DROP COLUMN；SQLite 上新列保持可空，由模型保证写入
+    conn.execute(text("ALTER TABLE documents DROP COLUMN content"))
+    conn.commit()
+    print("🗑️ 已删除旧列 documents.content")
+
+
+def migrate():
+    with engine.connect() as conn:
+        if "content" not in _columns(conn):
+            print("✅ documents 表已是压缩存储，无需迁移")
+            return
+        print("🔧 正在迁移 documents 表到压缩存储...")
+        add_columns(conn)
+        conn.commit()
+        backfill(conn)
+        finish(conn)
+    print("✅ 文档迁移完成！")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,7 +1,9 @@
 # @Author  : eco
 # @Date    ：2025/5/19 15:49
 # @Function: 定义文档模型
-from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from models.base import Base
 
@@ -11,9 +13,15 @@ class Document(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     doc_type = Column(Enum("code", "requirement", "test", "architecture", name="doc_type_enum"), nullable=False)
-    content = Column(Text, nullable=False)
 
-    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)  # 🔗 与任务关联
+    # 正文压缩后存储，默认不随查询加载，读取时按块解压流式返回
+    content_compressed = deferred(Column(LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=False))
+    compression = Column(String(16), nullable=False, default="zlib")  # 压缩算法
+    size = Column(Integer, nullable=False)  # 原文 UTF-8 字节数
+    compressed_size = Column(Integer, nullable=False)  # 压缩后字节数
+    content_hash = Column(String(64), nullable=False)  # 原文 SHA-256，用作 ETag
+
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False, index=True)  # 🔗 与任务关联
 
     created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
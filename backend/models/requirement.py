@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, Enum, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
 from models.base import Base
@@ -17,4 +17,12 @@ class Requirement(Base):
     creator_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, server_default=func.now())
 
+    # 列表接口按 (created_at, id) 倒序做游标分页，筛选条件在前的复合索引
+    __table_args__ = (
+        Index("ix_requirements_created_id", "created_at", "id"),
+        Index("ix_requirements_status_created_id", "status", "created_at", "id"),
+        Index("ix_requirements_priority_created_id", "priority", "created_at", "id"),
+        Index("ix_requirements_creator_created_id", "creator_id", "created_at", "id"),
+    )
+
     # Define relationships if needed
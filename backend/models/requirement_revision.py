@@ -0,0 +1,26 @@
+# @Function: 需求修订历史
+# 每隔若干个修订保存一次完整快照，其余修订只保存相对上一修订的差异，
+# 任一修订最多从最近的快照开始应用有限次差异即可还原。
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, LargeBinary, UniqueConstraint
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
+from sqlalchemy.sql import func
+from models.base import Base
+
+
+class RequirementRevision(Base):
+    __tablename__ = "requirement_revisions"
+
+    id = Column(Integer, primary_key=True)
+    requirement_id = Column(Integer, ForeignKey("requirements.id"), nullable=False)
+    revision = Column(Integer, nullable=False)  # 从 1 开始递增
+    kind = Column(Enum("snapshot", "delta", name="revision_kind_enum"), nullable=False)
+    payload = Column(LargeBinary().with_variant(MEDIUMBLOB, "mysql"), nullable=False)  # zlib 压缩的全文或差异
+    title = Column(String(200), nullable=False)
+    version = Column(String(20))  # 当时的版本号标签
+    size = Column(Integer, nullable=False)  # 该修订正文的字符数
+    content_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("requirement_id", "revision", name="uq_requirement_revisions_revision"),
+    )
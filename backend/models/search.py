@@ -0,0 +1,36 @@
+# @Function: 全文检索的倒排索引表
+# search_documents 记录每个被索引对象（需求 / 文档）的标题和词数，
+# search_postings 按词项记录出现在哪些对象中及词频，查询只按主键前缀查找，不扫描业务表。
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from models.base import Base
+
+
+class SearchDocument(Base):
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True)
+    source = Column(Enum("requirement", "document", name="search_source_enum"), nullable=False)
+    source_id = Column(Integer, nullable=False)
+    title = Column(String(255), nullable=False)
+    length = Column(Integer, nullable=False, default=0)  # 标题 + 正文的词项总数，用于 BM25 长度归一化
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("source", "source_id", name="uq_search_documents_source"),
+    )
+
+
+class SearchPosting(Base):
+    __tablename__ = "search_postings"
+
+    term = Column(String(32), primary_key=True)
+    doc_id = Column(Integer, ForeignKey("search_documents.id", ondelete="CASCADE"), primary_key=True)
+    title_tf = Column(Integer, nullable=False, default=0)  # 标题中的词频
+    content_tf = Column(Integer, nullable=False, default=0)  # 正文中的词频
+
+    __table_args__ = (
+        Index("ix_search_postings_doc_id", "doc_id"),  # 重建某个对象的索引时按 doc_id 删除
+        # 查询时每个词项按标题词频、正文词频从高到低只读前若干条，不读完高频词项的全部倒排
+        Index("ix_search_postings_term_impact", "term", "title_tf", "content_tf"),
+    )
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-import json
-import asyncio
+from typing import Optional
 from services.agent_service import agent_service
+from services.meeting_orchestrator import meeting_orchestrator
+from utils.sse import SSEConfig, sse_response
+from utils.admission import admission
 
 router = APIRouter()
 
+SSE_CONFIG = SSEConfig(max_chars=32, max_delay=0.04)  # 对话场景更看重打字感
+
 class AgentInput(BaseModel):
     role: str
     input_text: str
@@ -14,14 +17,19 @@ class AgentInput(BaseModel):
     context: str = None  # 可选的上下文信息
     conversation_id: str = None  # 可选的对话ID
 
-@router.post("/stream")
+class MeetingInput(BaseModel):
+    topic: str
+    context: str = None  # 可选的上下文信息
+    roles: Optional[list[str]] = None  # 参与的角色，默认四个角色全部参与
+
+@router.post("/stream", dependencies=[Depends(admission("agent_stream"))])
 async def stream_agent_response(input_data: AgentInput):
     """
     生成Agent的流式响应
     """
     try:
         # 使用AgentService生成流式响应
-        return StreamingResponse(
+        return sse_response(
             agent_service.generate_response_stream(
                 role=input_data.role,
                 input_text=input_data.input_text,
@@ -29,7 +37,27 @@ async def stream_agent_response(input_data: AgentInput):
                 context=input_data.context,
                 conversation_id=input_data.conversation_id
             ),
-            media_type="text/event-stream"
+            SSE_CONFIG,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/meeting", dependencies=[Depends(admission("agent_meeting"))])
+async def stream_meeting(input_data: MeetingInput):
+    """
+    服务端编排的会议室：四个角色流水线运行，输出复用到同一个流中
+
+    每帧为 {"role": ..., "content": ...}，另有 {"role": ..., "event": "start"/"end"}
+    和最终的 {"event": "done"} 事件
+    """
+    try:
+        return sse_response(
+            meeting_orchestrator.run(
+                topic=input_data.topic,
+                context=input_data.context,
+                roles=input_data.roles
+            ),
+            SSE_CONFIG,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
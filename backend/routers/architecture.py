@@ -1,23 +1,39 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException
 from schemas.architecture import ArchGenInput, ArchGenOutput
-from services.architecture_generator import generate_architecture, generate_architecture_stream
+from services.architecture_generator import (
+    generate_architecture, generate_architecture_stream, architecture_document, compose_architecture_events,
+)
+from services.document_writer import document_writer, document_title, persist_stream
+from utils.sse import SSEConfig, sse_response
+from utils.admission import admission
 
 router = APIRouter()
 
-@router.post("/", response_model=ArchGenOutput)
-def generate(input_data: ArchGenInput):
+SSE_CONFIG = SSEConfig(max_chars=64)
+
+@router.post("/", response_model=ArchGenOutput, dependencies=[Depends(admission("architecture"))])
+async def generate(input_data: ArchGenInput):
     try:
+        title = document_title("架构设计", input_data.requirement_text)
         if input_data.stream:
-            return StreamingResponse(
-                generate_architecture_stream(input_data.requirement_text),
-                media_type="text/event-stream"
+            events = generate_architecture_stream(input_data.requirement_text)
+            if input_data.task_id is not None:
+                events = persist_stream(events, input_data.task_id, "architecture", title,
+                                        compose_architecture_events)
+            return sse_response(
+                events,
+                SSE_CONFIG,
+                channel_field="section",
             )
         else:
-            architecture, db_schema = generate_architecture(input_data.requirement_text)
+            architecture, db_schema, ddl = await generate_architecture(input_data.requirement_text)
+            if input_data.task_id is not None:
+                await document_writer.submit(input_data.task_id, "architecture", title,
+                                             architecture_document(architecture, db_schema))
             return {
                 "architecture": architecture,
-                "database_design": db_schema
+                "database_design": db_schema,
+                "ddl": ddl
             }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"架构生成失败: {str(e)}")
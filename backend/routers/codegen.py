@@ -1,24 +1,59 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional, Union
 from pydantic import BaseModel
+from config import BATCH_MAX_ITEMS
 from services.code_generator import generate_module_code, generate_module_code_stream
+from utils.sse import SSEConfig, sse_response
+from utils.admission import admission
+from utils.batch import batch_response
+from services.document_writer import document_writer, document_title, persist_stream, persisting
 
 router = APIRouter()
 
+SSE_CONFIG = SSEConfig(max_chars=128, max_delay=0.08)  # 代码输出较长，合并更大的帧
+
 class CodeGenInput(BaseModel):
     module_description: str
     stream: bool = False
+    task_id: Optional[int] = None  # 传入时生成结果自动存档到该任务下
+
+class CodeGenBatchItem(BaseModel):
+    id: Optional[Union[str, int]] = None  # 条目标识，缺省时使用序号
+    module_description: str
 
-@router.post("/")
-def generate_code(input: CodeGenInput):
+class CodeGenBatchInput(BaseModel):
+    items: list[CodeGenBatchItem]
+    concurrency: Optional[int] = None  # 并发数，缺省使用配置值
+    task_id: Optional[int] = None  # 传入时每项结果自动存档到该任务下
+
+@router.post("/", dependencies=[Depends(admission("codegen"))])
+async def generate_code(input: CodeGenInput):
     try:
+        title = document_title("代码", input.module_description)
         if input.stream:
-            return StreamingResponse(
-                generate_module_code_stream(input.module_description),
-                media_type="text/event-stream"
-            )
+            deltas = generate_module_code_stream(input.module_description)
+            if input.task_id is not None:
+                deltas = persist_stream(deltas, input.task_id, "code", title)
+            return sse_response(deltas, SSE_CONFIG)
         else:
-            code_output = generate_module_code(input.module_description)
+            code_output = await generate_module_code(input.module_description)
+            if input.task_id is not None:
+                await document_writer.submit(input.task_id, "code", title, code_output)
             return {"code": code_output}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch", dependencies=[Depends(admission("codegen_batch"))])
+async def generate_code_batch(input: CodeGenBatchInput):
+    """
+    批量生成模块代码，结果以 NDJSON 按完成顺序流式返回
+    """
+    if not input.items:
+        raise HTTPException(status_code=400, detail="items 不能为空")
+    if len(input.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"单次最多 {BATCH_MAX_ITEMS} 项")
+    items = [(item.id if item.id is not None else i, item.module_description) for i, item in enumerate(input.items)]
+    worker = generate_module_code
+    if input.task_id is not None:
+        worker = persisting(worker, input.task_id, "code", "代码")
+    return batch_response(items, worker, "code", input.concurrency)
@@ -1,18 +1,61 @@
 # @Author  : eco
 # @Date    ：2025/5/19 15:55
 # @Function: 文档路由封装
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from db import get_db
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import get_async_db
 from schemas.document import DocumentCreate, DocumentOut
-from services.document import create_document, get_documents_by_task
+from services.document import create_document, get_documents_by_task, get_document, iter_document_content, \
+    DocumentCorrupted
 
 router = APIRouter()
 
 @router.post("/save", response_model=DocumentOut)
-def save_document(doc: DocumentCreate, db: Session = Depends(get_db)):
-    return create_document(db, doc)
+async def save_document(doc: DocumentCreate, db: AsyncSession = Depends(get_async_db)):
+    return await create_document(db, doc)
 
 @router.get("/by-task/{task_id}", response_model=list[DocumentOut])
-def get_docs_for_task(task_id: int, db: Session = Depends(get_db)):
-    return get_documents_by_task(db, task_id)
\ No newline at end of file
+async def get_docs_for_task(task_id: int, db: AsyncSession = Depends(get_async_db)):
+    """任务下的文档列表，只返回元数据"""
+    return await get_documents_by_task(db, task_id)
+
+@router.get("/{doc_id}", response_model=DocumentOut)
+async def get_doc(doc_id: int, db: AsyncSession = Depends(get_async_db)):
+    doc = await get_document(db, doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="文档不存在")
+    return doc
+
+@router.get("/{doc_id}/content")
+async def get_doc_content(doc_id: int,
+                          if_none_match: Optional[str] = Header(None),
+                          db: AsyncSession = Depends(get_async_db)):
+    """
+    流式返回文档正文，边从数据库读取边解压
+
+    校验失败时：第一块数据发出前返回 500；已开始发送的大文档中断连接，客户端收到的是不完整的响应
+    """
+    doc = await get_document(db, doc_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="文档不存在")
+    etag = f'"{doc.content_hash}"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    chunks = iter_document_content(db, doc)
+    try:
+        first = await anext(chunks, b"")
+    except DocumentCorrupted as e:
+        raise HTTPException(status_code=500, detail=f"{e}，请重新保存")
+
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type="text/plain; charset=utf-8",
+        headers={"ETag": etag, "X-Content-Size": str(doc.size)},
+    )
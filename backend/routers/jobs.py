@@ -0,0 +1,31 @@
+# @Function: 后台任务查询与取消
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Query
+from utils.jobs import job_queue
+
+router = APIRouter()
+
+JobStatus = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+
+@router.get("")
+def list_jobs(status: Optional[JobStatus] = None, limit: int = Query(50, ge=1, le=500)):
+    """最近的后台任务（新的在前），以及队列的运行情况"""
+    return {
+        **job_queue.stats(),
+        "items": [job.to_dict() for job in job_queue.list(status, limit)],
+    }
+
+@router.get("/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job.to_dict()
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: str):
+    """取消排队中或运行中的任务；已结束的任务原样返回"""
+    job = job_queue.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job.to_dict()
@@ -1,41 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.requirement import Requirement
 from schemas.requirement import *
-from db import get_db
+from db import get_async_db
+from utils.metrics import scoped
+from utils.auth import optional_user
+from services.auth_service import Principal
+from services import requirement_logic, requirement_revisions, requirement_transfer
 import traceback  # ✅ 用于输出详细错误信息
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(scoped("requirement"))])
 
 @router.post("/", response_model=RequirementOut)
-def create_requirement(req: RequirementCreate, db: Session = Depends(get_db)):
+async def create_requirement(req: RequirementCreate,
+                             principal: Optional[Principal] = Depends(optional_user),
+                             db: AsyncSession = Depends(get_async_db)):
     try:
         print("📥 正在创建新需求：", req.dict())
-        new_req = Requirement(**req.dict(), creator_id=1)  # 示例：默认用户1
-        db.add(new_req)
-        db.commit()
-        db.refresh(new_req)
-        return new_req
+        # 带了令牌时记为当前用户创建，否则沿用默认用户1
+        creator_id = principal.id if principal else 1
+        return await requirement_logic.create_requirement(db, req, creator_id=creator_id)
     except Exception as e:
         print("❌ 创建需求失败：", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="创建需求时服务器出错")
 
-@router.get("/", response_model=list[RequirementOut])
-def list_requirements(db: Session = Depends(get_db)):
+@router.get("/", response_model=RequirementPage)
+async def list_requirements(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    status: Optional[Literal["待评审", "已确认", "已冻结"]] = None,
+    priority: Optional[Literal["高", "中", "低"]] = None,
+    creator_id: Optional[int] = None,
+    created_from: Optional[datetime] = Query(None, description="创建时间起（含）"),
+    created_to: Optional[datetime] = Query(None, description="创建时间止（不含）"),
+    with_content: bool = Query(False, description="是否返回需求正文"),
+    db: AsyncSession = Depends(get_async_db),
+):
     try:
-        result = db.query(Requirement).all()
-        print(f"📋 获取到 {len(result)} 条需求")
-        return result
+        items, next_cursor = await requirement_logic.list_requirements_page(
+            db, limit=limit, cursor=cursor, status=status, priority=priority,
+            creator_id=creator_id, created_from=created_from, created_to=created_to,
+            with_content=with_content,
+        )
+        print(f"📋 获取到 {len(items)} 条需求")
+        return {"items": items, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print("❌ 查询需求列表失败：", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="获取需求列表失败")
 
+@router.get("/export")
+async def export_requirements(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="导出格式"),
+    status: Optional[Literal["待评审", "已确认", "已冻结"]] = None,
+    priority: Optional[Literal["高", "中", "低"]] = None,
+    creator_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """按 id 顺序流式导出需求，服务端游标逐批读取，不把全部数据读进内存"""
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"requirements-{datetime.now():%Y%m%d%H%M%S}.{format}"
+    return StreamingResponse(
+        requirement_transfer.export_requirements(db, format, status=status, priority=priority, creator_id=creator_id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.post("/import", response_model=RequirementImportReport)
+async def import_requirements(
+    request: Request,
+    format: Optional[Literal["ndjson", "csv"]] = Query(None, description="导入格式，默认按 Content-Type 判断"),
+    index: bool = Query(True, description="是否同时建立全文索引"),
+    principal: Optional[Principal] = Depends(optional_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    以请求体上传 NDJSON（每行一个需求对象）或带表头的 CSV，边接收边解析，分批写入
+
+    字段：title、content 必填，priority、status、version 可选；出错的行在 errors 中返回行号和原因
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    try:
+        return await requirement_transfer.import_requirements(
+            db, request.stream(), format, creator_id=principal.id if principal else 1, index=index)
+    except Exception as e:
+        print("❌ 导入需求失败：", e)
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="导入需求时服务器出错，已导入的批次不会回滚")
+
 @router.get("/{req_id}", response_model=RequirementOut)
-def get_requirement(req_id: int, db: Session = Depends(get_db)):
+async def get_requirement(req_id: int, db: AsyncSession = Depends(get_async_db)):
     try:
-        req = db.query(Requirement).get(req_id)
+        req = await db.get(Requirement, req_id)
         if not req:
             raise HTTPException(status_code=404, detail="未找到该需求")
         return req
@@ -47,17 +108,12 @@ def get_requirement(req_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="获取需求详情失败")
 
 @router.put("/{req_id}", response_model=RequirementOut)
-def update_requirement(req_id: int, req: RequirementUpdate, db: Session = Depends(get_db)):
+async def update_requirement(req_id: int, req: RequirementUpdate, db: AsyncSession = Depends(get_async_db)):
     try:
-        db_req = db.query(Requirement).get(req_id)
+        print(f"🔧 正在更新需求 {req_id}：", req.dict(exclude_unset=True))
+        db_req = await requirement_logic.update_requirement(db, req_id, req)
         if not db_req:
             raise HTTPException(status_code=404, detail="需求不存在")
-        updates = req.dict(exclude_unset=True)
-        print(f"🔧 正在更新需求 {req_id}：", updates)
-        for key, value in updates.items():
-            setattr(db_req, key, value)
-        db.commit()
-        db.refresh(db_req)
         return db_req
     except HTTPException:
         raise
@@ -65,3 +121,40 @@ def update_requirement(req_id: int, req: RequirementUpdate, db: Session = Depend
         print(f"❌ 更新需求 {req_id} 失败：", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="更新需求时服务器出错")
+
+@router.get("/{req_id}/revisions", response_model=list[RequirementRevisionOut])
+async def list_requirement_revisions(req_id: int, db: AsyncSession = Depends(get_async_db)):
+    revisions = await requirement_revisions.list_revisions(db, req_id)
+    if not revisions and not await db.get(Requirement, req_id):
+        raise HTTPException(status_code=404, detail="未找到该需求")
+    return revisions
+
+@router.get("/{req_id}/revisions/{revision}", response_model=RequirementRevisionContent)
+async def get_requirement_revision(req_id: int, revision: int, db: AsyncSession = Depends(get_async_db)):
+    try:
+        result = await requirement_revisions.get_revision(db, req_id, revision)
+    except Exception as e:
+        print(f"❌ 还原需求 {req_id} 的修订 {revision} 失败：", e)
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="读取修订内容失败")
+    if result is None:
+        raise HTTPException(status_code=404, detail="未找到该修订")
+    row, content = result
+    return {
+        "revision": row.revision, "kind": row.kind, "title": row.title, "version": row.version,
+        "size": row.size, "content_hash": row.content_hash, "created_at": row.created_at, "content": content,
+    }
+
+@router.get("/{req_id}/diff", response_model=RequirementDiff)
+async def diff_requirement_revisions(
+    req_id: int,
+    from_rev: int = Query(..., alias="from", ge=1, description="起始修订号"),
+    to_rev: int = Query(..., alias="to", ge=1, description="目标修订号"),
+    context: int = Query(3, ge=0, le=50, description="差异上下文行数"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    result = await requirement_revisions.diff_revisions(db, req_id, from_rev, to_rev, context)
+    if result is None:
+        raise HTTPException(status_code=404, detail="未找到该修订")
+    print(f"🔀 需求 {req_id} 修订 r{from_rev} → r{to_rev}：+{result['added']} -{result['removed']}")
+    return result
@@ -1,28 +1,36 @@
 # app/routers/requirement.py
 
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 from services.requirement_generator import generate_requirement, generate_requirement_stream
-import json
+from utils.sse import SSEConfig, sse_response
+from utils.admission import admission
+from services.document_writer import document_writer, document_title, persist_stream
 
 router = APIRouter()
 
+SSE_CONFIG = SSEConfig()
+
 class RequirementRequest(BaseModel):
     topic: str
     stream: bool = False
+    task_id: Optional[int] = None  # 传入时生成结果自动存档到该任务下
 
-@router.post("/", summary="生成模块需求")
+@router.post("/", summary="生成模块需求", dependencies=[Depends(admission("requirementgen"))])
 async def generate_module_requirement(request: RequirementRequest):
     try:
+        title = document_title("需求", request.topic)
         if request.stream:
-            return StreamingResponse(
-                generate_requirement_stream(request.topic),
-                media_type="text/event-stream"
-            )
+            deltas = generate_requirement_stream(request.topic)
+            if request.task_id is not None:
+                deltas = persist_stream(deltas, request.task_id, "requirement", title)
+            return sse_response(deltas, SSE_CONFIG)
         else:
             # 保留原有的非流式处理逻辑
-            result = generate_requirement(request.topic)
+            result = await generate_requirement(request.topic)
+            if request.task_id is not None:
+                await document_writer.submit(request.task_id, "requirement", title, result)
             return {"requirement": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Literal, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import get_async_db
+from schemas.search import SearchPage
+from services.search import search
+from utils.metrics import scoped
+import traceback
+
+router = APIRouter(dependencies=[Depends(scoped("search"))])
+
+@router.get("", response_model=SearchPage)
+async def search_all(
+    q: str = Query(..., min_length=1, max_length=200, description="搜索词"),
+    source: Optional[Literal["requirement", "document"]] = Query(None, description="只搜索需求或文档"),
+    page: int = Query(1, ge=1),
+    size: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """在需求和生成文档的标题、正文中全文检索，按相关度排序"""
+    try:
+        total, items = await search(db, q, source=source, page=page, size=size)
+        print(f"🔎 搜索“{q}”命中 {total} 条")
+        return {"total": total, "page": page, "size": size, "items": items}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print("❌ 搜索失败：", e)
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail="搜索时服务器出错")
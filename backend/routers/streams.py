@@ -0,0 +1,45 @@
+# @Function: 可续传流的重连与结果查询
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from utils.sse import resumable_response
+from utils.streams import stream_registry
+
+router = APIRouter()
+
+def _get_stream(stream_id: str):
+    stream = stream_registry.get(stream_id)
+    if not stream:
+        raise HTTPException(status_code=404, detail="流不存在或已过期")
+    return stream
+
+@router.get("")
+def stream_stats():
+    return stream_registry.stats()
+
+@router.get("/{stream_id}")
+async def resume_stream(stream_id: str,
+                        last_event_id: Optional[str] = Header(None),
+                        from_id: Optional[int] = Query(None, ge=0, description="不便设置请求头时用于代替 Last-Event-ID")):
+    """重新连接流式生成：补发 Last-Event-ID 之后的事件，再继续实时推送"""
+    stream = _get_stream(stream_id)
+    if from_id is None:
+        try:
+            from_id = int(last_event_id) if last_event_id else 0
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID 无效")
+    return resumable_response(stream, from_id)
+
+@router.get("/{stream_id}/result")
+async def stream_result(stream_id: str, wait: float = Query(0, ge=0, le=60, description="长轮询：最多等待生成结束的秒数")):
+    """查询生成结果；status 为 running 时 content 为目前已生成的部分"""
+    stream = _get_stream(stream_id)
+    if wait:
+        await stream.wait(wait)
+        stream.touch()
+    return stream.result()
+
+@router.delete("/{stream_id}")
+def cancel_stream(stream_id: str):
+    """取消后台生成，已连接的客户端收到已生成的部分后结束"""
+    _get_stream(stream_id)
+    return {"id": stream_id, "cancelled": stream_registry.cancel(stream_id) is not None}
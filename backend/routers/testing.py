@@ -1,24 +1,59 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional, Union
 from pydantic import BaseModel
+from config import BATCH_MAX_ITEMS
 from services.test_generator import generate_tests, generate_tests_stream
+from utils.sse import SSEConfig, sse_response
+from utils.admission import admission
+from utils.batch import batch_response
+from services.document_writer import document_writer, document_title, persist_stream, persisting
 
 router = APIRouter()
 
+SSE_CONFIG = SSEConfig(max_chars=128, max_delay=0.08)
+
 class TestGenInput(BaseModel):
     code: str
     stream: bool = False
+    task_id: Optional[int] = None  # 传入时生成结果自动存档到该任务下
+
+class TestGenBatchItem(BaseModel):
+    id: Optional[Union[str, int]] = None  # 条目标识，缺省时使用序号
+    code: str
 
-@router.post("/")
-def generate_test(input: TestGenInput):
+class TestGenBatchInput(BaseModel):
+    items: list[TestGenBatchItem]
+    concurrency: Optional[int] = None  # 并发数，缺省使用配置值
+    task_id: Optional[int] = None  # 传入时每项结果自动存档到该任务下
+
+@router.post("/", dependencies=[Depends(admission("test"))])
+async def generate_test(input: TestGenInput):
     try:
+        title = document_title("测试用例", input.code)
         if input.stream:
-            return StreamingResponse(
-                generate_tests_stream(input.code),
-                media_type="text/event-stream"
-            )
+            deltas = generate_tests_stream(input.code)
+            if input.task_id is not None:
+                deltas = persist_stream(deltas, input.task_id, "test", title)
+            return sse_response(deltas, SSE_CONFIG)
         else:
-            test_code = generate_tests(input.code)
+            test_code = await generate_tests(input.code)
+            if input.task_id is not None:
+                await document_writer.submit(input.task_id, "test", title, test_code)
             return {"test_code": test_code}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch", dependencies=[Depends(admission("test_batch"))])
+async def generate_test_batch(input: TestGenBatchInput):
+    """
+    批量生成测试用例，结果以 NDJSON 按完成顺序流式返回
+    """
+    if not input.items:
+        raise HTTPException(status_code=400, detail="items 不能为空")
+    if len(input.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"单次最多 {BATCH_MAX_ITEMS} 项")
+    items = [(item.id if item.id is not None else i, item.code) for i, item in enumerate(input.items)]
+    worker = generate_tests
+    if input.task_id is not None:
+        worker = persisting(worker, input.task_id, "test", "测试用例")
+    return batch_response(items, worker, "test_code", input.concurrency)
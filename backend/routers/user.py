@@ -1,28 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.user import User
-from schemas.user import UserCreate, UserLogin, UserOut
-from db import get_db
+from schemas.user import UserCreate, UserLogin, UserOut, LoginOut
+from db import get_async_db
+from utils.metrics import scoped
+from utils.auth import current_user
+from services.auth_service import (
+    Principal, ahash_password, averify_password, needs_rehash, create_access_token, get_user_cached,
+)
 import traceback
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(scoped("user"))])
 
 @router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         print(f"📥 正在注册新用户：{user.dict()}")
-        existing = db.query(User).filter(User.email == user.email).first()
+        existing = (await db.execute(select(User).where(User.email == user.email))).scalars().first()
         if existing:
             raise HTTPException(status_code=400, detail="邮箱已注册")
 
         new_user = User(
             username=user.username,
             email=user.email,
-            password_hash=user.password  # ✅ 仅示例，建议后续加密
+            password_hash=await ahash_password(user.password)  # 在专用线程池中计算慢哈希
         )
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         return new_user
 
     except HTTPException:
@@ -32,18 +38,24 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="服务器注册用户时出错")
 
-@router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
+@router.post("/login", response_model=LoginOut)
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
     try:
         print(f"🔐 用户尝试登录：{user.email}")
-        db_user = db.query(User).filter(User.email == user.email).first()
+        db_user = (await db.execute(select(User).where(User.email == user.email))).scalars().first()
         if not db_user:
             raise HTTPException(status_code=401, detail="邮箱不存在")
-        if db_user.password_hash != user.password:
+        if not await averify_password(user.password, db_user.password_hash):
             raise HTTPException(status_code=401, detail="密码错误")
+        if needs_rehash(db_user.password_hash):
+            # 早期明文保存或迭代次数偏低的密码，登录成功后升级
+            db_user.password_hash = await ahash_password(user.password)
+            await db.commit()
 
+        token, expires_in = create_access_token(db_user)
         print(f"✅ 用户 {db_user.username} 登录成功")
-        return {"msg": "登录成功", "user_id": db_user.id}
+        return {"msg": "登录成功", "user_id": db_user.id, "access_token": token,
+                "token_type": "bearer", "expires_in": expires_in}
 
     except HTTPException:
         raise
@@ -51,3 +63,11 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
         print("❌ 登录过程中出错：", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="服务器登录失败")
+
+@router.get("/me", response_model=UserOut)
+async def me(principal: Principal = Depends(current_user), db: AsyncSession = Depends(get_async_db)):
+    """当前登录用户的信息，短时间缓存，不是每次都查库"""
+    db_user = await get_user_cached(db, principal.id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    return db_user
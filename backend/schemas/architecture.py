@@ -1,11 +1,14 @@
 from pydantic import BaseModel
+from typing import Optional
 
 
 class ArchGenInput(BaseModel):
     requirement_text: str
     stream: bool = False
+    task_id: Optional[int] = None  # 传入时生成结果自动存档到该任务下
 
 
 class ArchGenOutput(BaseModel):
     architecture: str
     database_design: str
+    ddl: list[str] = []  # 从数据库设计中提取出的 DDL 语句
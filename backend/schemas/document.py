@@ -11,13 +11,16 @@ class DocumentCreate(BaseModel):
     task_id: int   # 与任务绑定
 
 class DocumentOut(BaseModel):
+    """文档元数据，不含正文；正文通过 /{doc_id}/content 流式读取"""
     id: int
     title: str
     doc_type: str
-    content: str
     task_id: int
+    size: int  # 原文字节数
+    compressed_size: int
+    content_hash: str
     created_at: datetime
     updated_at: datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
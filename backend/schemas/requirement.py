@@ -11,11 +11,11 @@ class RequirementCreate(BaseModel):
 
 
 class RequirementUpdate(BaseModel):
-    title: Optional[str]
-    content: Optional[str]
-    priority: Optional[Literal["高", "中", "低"]]
-    status: Optional[Literal["待评审", "已确认", "已冻结"]]
-    version: Optional[str]
+    title: Optional[str] = None
+    content: Optional[str] = None
+    priority: Optional[Literal["高", "中", "低"]] = None
+    status: Optional[Literal["待评审", "已确认", "已冻结"]] = None
+    version: Optional[str] = None
 
 
 class RequirementOut(BaseModel):
@@ -30,3 +30,61 @@ class RequirementOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class RequirementListItem(BaseModel):
+    id: int
+    title: str
+    content: Optional[str] = None  # 列表默认不返回正文
+    priority: str
+    status: str
+    version: str
+    creator_id: int
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class RequirementPage(BaseModel):
+    items: list[RequirementListItem]
+    next_cursor: Optional[str] = None  # 为空表示没有下一页
+
+
+class RequirementRevisionOut(BaseModel):
+    revision: int
+    kind: str  # snapshot 为完整快照，delta 为相对上一修订的差异
+    title: str
+    version: Optional[str] = None
+    size: int
+    content_hash: str
+    created_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+
+class RequirementRevisionContent(RequirementRevisionOut):
+    content: str
+
+
+class RequirementDiff(BaseModel):
+    from_revision: int
+    to_revision: int
+    title_changed: bool
+    added: int  # 新增行数
+    removed: int  # 删除行数
+    diff: str  # unified diff 格式
+
+
+class RequirementImportError(BaseModel):
+    line: int  # 出错记录的起始行号（从 1 开始，CSV 含表头行）
+    error: str
+
+
+class RequirementImportReport(BaseModel):
+    inserted: int
+    failed: int
+    indexed: int  # 新建全文索引的需求数
+    errors: list[RequirementImportError]
+    errors_truncated: bool  # 出错行过多时只返回前 1000 条
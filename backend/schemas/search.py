@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+from datetime import datetime
+
+
+class SearchHit(BaseModel):
+    source: Literal["requirement", "document"]
+    source_id: int
+    title: str
+    title_highlight: str  # 命中部分用 <em> 包裹，其余已做 HTML 转义
+    snippet: str
+    score: float
+    updated_at: Optional[datetime] = None
+
+
+class SearchPage(BaseModel):
+    total: int
+    page: int
+    size: int
+    items: list[SearchHit]
@@ -23,3 +23,11 @@ class UserOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class LoginOut(BaseModel):
+    msg: str
+    user_id: int
+    access_token: str  # 请求需要登录的接口时放在 Authorization: Bearer 头中
+    token_type: str = "bearer"
+    expires_in: int  # 令牌有效秒数
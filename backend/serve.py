@@ -0,0 +1,118 @@
+# @Function: 预加载 + 多进程启动器
+# 主进程只导入一次应用并监听端口，然后 fork 出 N 个 worker 共享同一个监听 socket；
+# 导入好的模块、路由、提示词模板等只读数据通过写时复制在 worker 之间共享，worker 重启不必重新导入。
+# 数据库连接池、大模型客户端、缓存文件等都在各 worker 第一次使用时创建，不会在进程之间共用连接。
+# 用法（在 backend 目录下）：
+#   python serve.py --host 0.0.0.0 --port 8000 --workers 4
+# 不支持 fork 的平台（Windows）或 --workers 1 时退化为单进程运行。
+import time
+
+BOOT = time.perf_counter()
+
+import argparse
+import gc
+import os
+import signal
+import sys
+
+import uvicorn
+
+CRASH_WINDOW = 5.0  # worker 启动后这么短时间内异常退出，视为启动失败，不再重启
+
+
+class WorkerServer(uvicorn.Server):
+    """启动完成时报告距离启动器开始运行的时间"""
+
+    def __init__(self, config: uvicorn.Config, index: int):
+        super().__init__(config)
+        self.index = index
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets)
+        print(f"✅ worker {self.index}（pid {os.getpid()}）就绪，距启动 {time.perf_counter() - BOOT:.2f}s", flush=True)
+
+
+def spawn(config: uvicorn.Config, sock, index: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # worker：恢复默认信号处理，由 uvicorn 接管 SIGINT/SIGTERM 并优雅退出
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            WorkerServer(config, index).run(sockets=[sock])
+        except BaseException as e:
+            print(f"❌ worker {index} 异常退出：{e}", flush=True)
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预加载应用并启动多个 worker")
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    config = uvicorn.Config(args.app, host=args.host, port=args.port, log_level=args.log_level)
+    started = time.perf_counter()
+    config.load()  # 导入应用，之后 fork 的 worker 直接使用
+    print(f"🚀 预加载 {args.app} 耗时 {time.perf_counter() - started:.2f}s", flush=True)
+
+    sock = config.bind_socket()
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        WorkerServer(config, 0).run(sockets=[sock])
+        return
+
+    # 预加载的对象移出垃圾回收跟踪，worker 做 GC 时不会写这些内存页，写时复制得以一直共享
+    gc.freeze()
+    workers: dict[int, tuple[int, float]] = {}  # pid -> (编号, 启动时刻)
+    for index in range(args.workers):
+        workers[spawn(config, sock, index)] = (index, time.monotonic())
+    print(f"🧩 已启动 {args.workers} 个 worker，监听 {args.host}:{args.port}", flush=True)
+
+    stopping = False
+    failed = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if pid not in workers:
+            continue
+        index, spawned_at = workers.pop(pid)
+        if stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if code != 0 and time.monotonic() - spawned_at < CRASH_WINDOW:
+            print(f"❌ worker {index} 启动后立即退出（状态 {code}），停止所有 worker", flush=True)
+            failed = True
+            stop(None, None)
+            continue
+        print(f"⚠️ worker {index}（pid {pid}）已退出（状态 {code}），重新启动", flush=True)
+        workers[spawn(config, sock, index)] = (index, time.monotonic())
+    print("👋 所有 worker 已退出", flush=True)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,187 @@
-import os
-from openai import OpenAI
-import json
-import asyncio
-
-# 初始化DeepSeek OpenAI兼容客户端
-client = OpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),  # 推荐设置环境变量
-    base_url="https://api.deepseek.com",  # DeepSeek API地址
+import re
+from typing import Optional
+from services.llm_gateway import llm_gateway
+from services.prompts import render_prompt
+
+ARCH_HEADER = "【架构设计】"
+DB_HEADER = "【数据库设计】"
+# 每个段落开始时先发出的标题文本，前端直接拼接 content 即可得到带标题、分隔的完整文档
+SECTION_HEADERS = {"architecture": f"{ARCH_HEADER}\n", "database_design": f"\n{DB_HEADER}\n"}
+DB_HEADER_PATTERN = re.compile(
+    r"【数据库设计】[ \t]*\n?"  # 约定的格式
+    r"|^[ \t]*(?:#+|\*\*)?[ \t]*(?:\d+[.、][ \t]*)?数据库设计[ \t]*(?:\*\*)?[ \t]*[:：]?[ \t]*\n",  # 模型改用标题行时
+    re.MULTILINE,
 )
+# DDL 语句从这里开始，到第一个分号结束
+DDL_START = re.compile(r"\b(?:CREATE|ALTER)\s+(?:TABLE|(?:UNIQUE\s+)?INDEX|VIEW)\b", re.IGNORECASE)
+# 未进入语句时只保留这么多末尾字符，语句开头跨越增量边界时仍能识别
+DDL_KEEP = 32
+# 标记可能跨越增量边界，末尾保留这么多字符等下一个增量再判断
+HOLDBACK = 48
+
+
+class ArchitectureStreamParser:
+    """
+    架构设计输出的增量解析器
+
+    每次 feed 一个增量，返回新产生的事件：
+    - ("architecture", 文本)：架构设计段落的增量，段落的第一个事件为标题 SECTION_HEADERS["architecture"]
+    - ("database_design", 文本)：数据库设计段落的增量，同样先发出标题
+    - {"event": "ddl", "ddl": 语句}：数据库设计中新提取出的完整 DDL 语句
+    """
+
+    def __init__(self):
+        self.section = "architecture"
+        self.architecture: list[str] = []
+        self.database_design: list[str] = []
+        self.ddl: list[str] = []
+        self._pending = ""
+        self._header_checked = False
+        self._ddl_scan = ""  # 数据库设计中尚未进入语句的末尾部分
+        self._ddl_parts: list[str] = []  # 进行中的 DDL 语句（已出现开头、尚无分号）
+        self._headed: set[str] = set()  # 已发出标题的段落
+
+    def feed(self, delta: str) -> list:
+        self._pending += delta
+        return self._drain(final=False)
+
+    def close(self) -> list:
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> list:
+        events = []
+        if self.section == "architecture":
+            if not self._header_checked:
+                head = self._pending.lstrip()
+                if head.startswith(ARCH_HEADER):
+                    self._pending = head[len(ARCH_HEADER):].lstrip("\n")
+                    self._header_checked = True
+                elif final or not ARCH_HEADER.startswith(head):
+                    self._header_checked = True
+                else:
+                    return events  # 可能是被截断的标题，等待更多内容
+
+            match = DB_HEADER_PATTERN.search(self._pending)
+            if match:
+                before = self._pending[:match.start()]
+                self._pending = self._pending[match.end():]
+                self._emit_architecture(before, events)
+                self._emit_header("architecture", events)  # 架构设计为空时也保留标题
+                self._emit_header("database_design", events)
+                self.section = "database_design"
+            else:
+                cut = len(self._pending) if final else self._safe_cut()
+                self._emit_architecture(self._pending[:cut], events)
+                self._pending = self._pending[cut:]
+                return events
+
+        if not self.database_design:
+            self._pending = self._pending.lstrip("\n")
+        if self._pending:
+            text, self._pending = self._pending, ""
+            self.database_design.append(text)
+            events.append(("database_design", text))
+            self._scan_ddl(text, events)
+        return events
+
+    def _scan_ddl(self, text: str, events: list):
+        """
+        从数据库设计的增量中提取完整 DDL 语句
+
+        只扫描新增文本和有限长度的末尾，不重新扫描整个段落，每次 feed 的开销与增量长度成正比
+        """
+        while text:
+            if self._ddl_parts:
+                end = text.find(";")
+                if end < 0:
+                    self._ddl_parts.append(text)
+                    return
+                self._ddl_parts.append(text[:end + 1])
+                statement = "".join(self._ddl_parts).strip()
+                self._ddl_parts = []
+                self.ddl.append(statement)
+                events.append({"event": "ddl", "ddl": statement})
+                text = text[end + 1:]
+                continue
 
-def call_llm(prompt: str, system_prompt: str = "你是一个资深的系统架构专家") -> str:
+            scan = self._ddl_scan + text
+            match = DDL_START.search(scan)
+            # 关键字恰好在末尾时可能还没写完（如 "CREATE INDEX" 之后还有 "ES"），等下一个增量
+            if match is None or match.end() == len(scan):
+                self._ddl_scan = scan[-DDL_KEEP:]
+                return
+            self._ddl_scan = ""
+            self._ddl_parts.append(scan[match.start():match.end()])
+            text = scan[match.end():]
+
+    def _safe_cut(self) -> int:
+        """不含可能被截断的标记的最长前缀长度"""
+        cut = max(0, len(self._pending) - HOLDBACK)
+        # 标题行需要整行判断，最后一行未结束且可能是标题时一并保留
+        line_start = self._pending.rfind("\n", 0, cut) + 1
+        if "数据库" in self._pending[line_start:] or "【" in self._pending[line_start:]:
+            cut = min(cut, line_start)
+        return cut
+
+    def _emit_header(self, section: str, events: list):
+        """段落标题只发给前端展示，不计入段落内容"""
+        if section not in self._headed:
+            self._headed.add(section)
+            events.append((section, SECTION_HEADERS[section]))
+
+    def _emit_architecture(self, text: str, events: list):
+        if "architecture" not in self._headed:
+            text = text.lstrip("\n")  # 标题后的换行可能落在下一个增量里，标题已自带换行
+        if text:
+            self._emit_header("architecture", events)
+            self.architecture.append(text)
+            events.append(("architecture", text))
+
+    def result(self) -> tuple[str, str, list[str]]:
+        return "".join(self.architecture).strip(), "".join(self.database_design).strip(), self.ddl
+
+def architecture_document(architecture: str, database_design: str) -> str:
+    """把两个段落拼回一份完整的架构设计文档，用于存档"""
+    return f"{ARCH_HEADER}\n{architecture}\n\n{DB_HEADER}\n{database_design}"
+
+def compose_architecture_events(events: list) -> str:
+    """把流式输出的分段事件拼成完整文档"""
+    sections = {"architecture": [], "database_design": []}
+    for event in events:
+        if isinstance(event, tuple):
+            section, text = event
+            if not sections[section] and text == SECTION_HEADERS[section]:
+                sections[section].append("")  # 段落标题由 architecture_document 统一添加
+                continue
+            sections[section].append(text)
+    return architecture_document("".join(sections["architecture"]).strip(),
+                                 "".join(sections["database_design"]).strip())
+
+async def call_llm(prompt: str, system_prompt: str = "你是一个资深的系统架构专家", tag: str = "architecture",
+                   semantic: Optional[str] = None) -> str:
     try:
-        completion = client.chat.completions.create(
-            model="deepseek-chat",  # 使用DeepSeek-V3模型
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt},
-            ],
-        )
-        return completion.choices[0].message.content.strip()
+        return await llm_gateway.complete(prompt, system_prompt, cache=True, share=True, tag=tag, semantic=semantic)
     except Exception as e:
         print("❌ 模型调用失败：", e)
         raise RuntimeError(f"模型调用失败：{e}")
     
-def generate_architecture(requirement_text: str) -> tuple[str, str]:
-    prompt = f"""你是系统架构专家，请根据以下软件需求生成架构建议和数据库设计DDL：
-需求描述：
-{requirement_text}
-
-请严格按照以下格式输出：
-【架构设计】
-...
-【数据库设计】
-...
-"""
-    result = call_llm(prompt)
-
-    if "数据库设计" in result:
-        parts = result.split("数据库设计")
-        return parts[0].replace("【架构设计】", "").strip(), parts[1].strip()
+async def generate_architecture(requirement_text: str) -> tuple[str, str, list[str]]:
+    """生成架构设计，返回 (架构设计, 数据库设计, DDL 语句列表)"""
+    system_prompt, prompt = render_prompt("architecture", input_text=requirement_text)
+    result = await call_llm(prompt, system_prompt, semantic=requirement_text)
 
-    return result.strip(), ""
+    parser = ArchitectureStreamParser()
+    parser.feed(result)
+    parser.close()
+    return parser.result()
 
 async def generate_architecture_stream(requirement_text: str):
-    """流式生成架构设计"""
-    prompt = f"""你是系统架构专家，请根据以下软件需求生成架构建议和数据库设计DDL：
-需求描述：
-{requirement_text}
-
-请严格按照以下格式输出：
-【架构设计】
-...
-【数据库设计】
-...
-"""
-    try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "你是一个资深的系统架构专家"},
-                {"role": "user", "content": prompt}
-            ],
-            stream=True  # 启用流式输出
-        )
-        
-        for chunk in response:
-            if chunk.choices and chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                yield f"data: {json.dumps({'content': content})}\n\n"
-                await asyncio.sleep(0.01)  # 小延迟，避免过快
-                
-    except Exception as e:
-        print(f"流式生成失败: {e}")
-        yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    """流式生成架构设计，产出 ArchitectureStreamParser 的分段事件"""
+    system_prompt, prompt = render_prompt("architecture", input_text=requirement_text)
+    parser = ArchitectureStreamParser()
+    async for content in llm_gateway.stream(prompt, system_prompt, cache=True, share=True, tag="architecture",
+                                            semantic=requirement_text):
+        for event in parser.feed(content):
+            yield event
+    for event in parser.close():
+        yield event
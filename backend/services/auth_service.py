@@ -1,23 +1,239 @@
-from sqlalchemy.orm import Session
+# @Function: 密码哈希与访问令牌
+# 密码用 PBKDF2-SHA256 加盐慢哈希，在专用线程池中计算，登录高峰不阻塞事件循环，也不占用默认线程池；
+# 登录成功签发 HMAC-SHA256 签名的无状态令牌（JWT 格式），校验只需验签，不查数据库。
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import (
+    AUTH_SECRET_KEY,
+    AUTH_SECRET_FILE,
+    AUTH_TOKEN_TTL,
+    AUTH_CACHE_TTL,
+    AUTH_CACHE_SIZE,
+    PASSWORD_HASH_ITERATIONS,
+    PASSWORD_HASH_WORKERS,
+)
 from models.user import User
-from schemas.user import UserCreate, UserLogin
-from fastapi import HTTPException
-
-def register_user(db: Session, user: UserCreate):
-    if db.query(User).filter(User.email == user.email).first():
-        raise HTTPException(status_code=400, detail="邮箱已被注册")
-    new_user = User(
-        username=user.username,
-        email=user.email,
-        password_hash=user.password  # ✅ 建议使用哈希，如 bcrypt
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
-
-def login_user(db: Session, user: UserLogin):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or db_user.password_hash != user.password:
-        raise HTTPException(status_code=401, detail="账号或密码错误")
-    return db_user
+
+HASH_ALGORITHM = "pbkdf2_sha256"
+
+
+class InvalidToken(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Principal:
+    """令牌中携带的调用者身份"""
+    id: int
+    username: str
+    role: str
+    expires_at: int
+
+
+class TTLCache:
+    """带过期时间、按条目数淘汰的 LRU，线程安全"""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_entries: int = AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._items: "OrderedDict[object, tuple[object, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        expires = time.monotonic() + min(self.ttl, ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._items[key] = (value, expires)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+# ---------- 密码哈希 ----------
+
+# 专用线程池：PBKDF2 计算期间释放 GIL，并发登录最多占用 PASSWORD_HASH_WORKERS 个线程
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password: str, iterations: int = PASSWORD_HASH_ITERATIONS) -> str:
+    """返回 pbkdf2_sha256$迭代次数$盐$哈希 格式的字符串"""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{HASH_ALGORITHM}${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """
+    校验密码；兼容早期以明文保存的密码
+
+    早期数据没有哈希前缀，按明文做定长比较，登录成功后由调用方升级为哈希
+    """
+    parts = stored.split("$")
+    if len(parts) != 4 or parts[0] != HASH_ALGORITHM:
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        iterations, salt, expected = int(parts[1]), _b64decode(parts[2]), _b64decode(parts[3])
+    except ValueError:  # 哈希格式损坏，按校验失败处理
+        return False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return hmac.compare_digest(digest, expected)
+
+
+def needs_rehash(stored: str) -> bool:
+    parts = stored.split("$")
+    if len(parts) != 4 or parts[0] != HASH_ALGORITHM:
+        return True
+    try:
+        return int(parts[1]) < PASSWORD_HASH_ITERATIONS
+    except ValueError:
+        return True
+
+
+async def ahash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, hash_password, password)
+
+
+async def averify_password(password: str, stored: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, verify_password, password, stored)
+
+
+# ---------- 访问令牌 ----------
+
+def _load_secret(path: str = AUTH_SECRET_FILE) -> bytes:
+    """
+    读取保存的签名密钥，不存在时随机生成并保存
+
+    先写临时文件再用 os.link 放到目标位置，多个 worker 同时启动时只有一个能创建成功，其余读取它写好的密钥
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(_b64encode(secrets.token_bytes(32)).encode("ascii"))
+    try:
+        os.link(tmp, path)
+        print(f"⚠️ 未设置 AUTH_SECRET_KEY，已生成签名密钥并保存到 {path}")
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(tmp)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+if AUTH_SECRET_KEY:
+    _secret = AUTH_SECRET_KEY.encode("utf-8")
+else:
+    _secret = _load_secret()
+
+_TOKEN_HEADER = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode("utf-8"))
+
+
+def _sign(signing_input: bytes) -> str:
+    return _b64encode(hmac.new(_secret, signing_input, hashlib.sha256).digest())
+
+
+def create_access_token(user: User, ttl: int = AUTH_TOKEN_TTL) -> tuple[str, int]:
+    """签发访问令牌，返回 (令牌, 有效秒数)"""
+    now = int(time.time())
+    payload = {"sub": str(user.id), "name": user.username, "role": user.role, "iat": now, "exp": now + ttl}
+    body = _b64encode(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    signing_input = f"{_TOKEN_HEADER}.{body}"
+    return f"{signing_input}.{_sign(signing_input.encode('ascii'))}", ttl
+
+
+# 已验证令牌 -> Principal，同一令牌的后续请求跳过验签和解析
+_token_cache = TTLCache()
+
+
+def decode_access_token(token: str) -> Principal:
+    """验签并解析令牌，无效或过期时抛出 InvalidToken"""
+    principal = _token_cache.get(token)
+    if principal is not None:
+        if principal.expires_at > time.time():
+            return principal
+        _token_cache.pop(token)
+        raise InvalidToken("令牌已过期")
+
+    try:
+        header, body, signature = token.split(".")
+        valid = header == _TOKEN_HEADER and hmac.compare_digest(
+            signature.encode("ascii"), _sign(f"{header}.{body}".encode("ascii")).encode("ascii"))
+    except ValueError:  # 段数不对或含非 ASCII 字符
+        raise InvalidToken("令牌格式错误")
+    if not valid:
+        raise InvalidToken("令牌签名无效")
+    try:
+        payload = json.loads(_b64decode(body))
+        principal = Principal(id=int(payload["sub"]), username=payload["name"], role=payload["role"],
+                              expires_at=int(payload["exp"]))
+    except (ValueError, KeyError, TypeError):
+        raise InvalidToken("令牌内容无效")
+    remaining = principal.expires_at - time.time()
+    if remaining <= 0:
+        raise InvalidToken("令牌已过期")
+    _token_cache.set(token, principal, ttl=remaining)
+    return principal
+
+
+# ---------- 用户信息缓存 ----------
+
+# 用户 id -> 用户记录，需要最新用户信息（如 /me）时使用，避免每次查库
+_user_cache = TTLCache()
+
+
+async def get_user_cached(db: AsyncSession, user_id: int) -> Optional[User]:
+    user = _user_cache.get(user_id)
+    if user is None:
+        user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
+        if user is not None:
+            db.expunge(user)  # 缓存的对象与会话解绑，可跨请求读取
+            _user_cache.set(user_id, user)
+    return user
+
+
+def invalidate_user(user_id: int):
+    """用户信息（如角色）变更后调用"""
+    _user_cache.pop(user_id)
@@ -0,0 +1,121 @@
+# @Function: 按 conversation_id 维护的服务端会话状态
+# 最近几轮对话原样保留，更早的轮次增量合并进摘要，使历史上下文保持在 token 预算内；
+# 空闲会话按 LRU 和 TTL 淘汰。
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from config import (
+    CONVERSATION_MAX,
+    CONVERSATION_TTL,
+    CONVERSATION_TOKEN_BUDGET,
+    CONVERSATION_RECENT_TURNS,
+)
+from services.llm_gateway import llm_gateway
+from services.prompts import render_prompt
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符约 1 个 token，其他字符约 4 个字符 1 个 token"""
+    cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+class Conversation:
+    def __init__(self):
+        self.summary = ""
+        self.summary_tokens = 0
+        self.turns: deque = deque()  # (发言人, 内容, token 数)
+        self.compacting: list = []  # 正在合并进摘要的轮次
+        self.compaction: Optional[asyncio.Task] = None
+        self.last_access = time.monotonic()
+
+    @property
+    def tokens(self) -> int:
+        return (self.summary_tokens
+                + sum(t[2] for t in self.compacting)
+                + sum(t[2] for t in self.turns))
+
+
+class ConversationStore:
+    def __init__(self,
+                 max_conversations: int = CONVERSATION_MAX,
+                 ttl: int = CONVERSATION_TTL,
+                 token_budget: int = CONVERSATION_TOKEN_BUDGET,
+                 recent_turns: int = CONVERSATION_RECENT_TURNS):
+        self.max_conversations = max_conversations
+        self.ttl = ttl
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+
+    def _evict(self):
+        """淘汰过期会话和超出数量上限的最久未使用会话"""
+        now = time.monotonic()
+        while self._conversations:
+            oldest_id, oldest = next(iter(self._conversations.items()))
+            if now - oldest.last_access < self.ttl and len(self._conversations) <= self.max_conversations:
+                break
+            del self._conversations[oldest_id]
+            if oldest.compaction:
+                oldest.compaction.cancel()
+
+    def _get(self, conversation_id: str, create: bool = False) -> Optional[Conversation]:
+        self._evict()
+        conv = self._conversations.get(conversation_id)
+        if conv is None:
+            if not create:
+                return None
+            conv = Conversation()
+            self._conversations[conversation_id] = conv
+        conv.last_access = time.monotonic()
+        self._conversations.move_to_end(conversation_id)
+        return conv
+
+    def build_context(self, conversation_id: str) -> str:
+        """返回摘要 + 最近对话组成的历史上下文"""
+        conv = self._get(conversation_id)
+        if conv is None:
+            return ""
+        parts = []
+        if conv.summary:
+            parts.append(f"【历史摘要】\n{conv.summary}")
+        recent = list(conv.compacting) + list(conv.turns)
+        if recent:
+            parts.append("【最近对话】\n" + "\n\n".join(f"{speaker}：{text}" for speaker, text, _ in recent))
+        return "\n\n".join(parts)
+
+    def append(self, conversation_id: str, speaker: str, text: str):
+        """记录一轮发言，超出预算时在后台把较早的轮次合并进摘要"""
+        if not text:
+            return
+        conv = self._get(conversation_id, create=True)
+        conv.turns.append((speaker, text, estimate_tokens(text)))
+        if conv.compaction is None and conv.tokens > self.token_budget and len(conv.turns) > self.recent_turns:
+            while len(conv.turns) > self.recent_turns and conv.tokens > self.token_budget:
+                # 先移入 compacting，摘要完成前仍原样出现在上下文中
+                conv.compacting.append(conv.turns.popleft())
+            if not conv.compacting:
+                return
+            conv.compaction = asyncio.create_task(self._compact(conversation_id, conv))
+
+    async def _compact(self, conversation_id: str, conv: Conversation):
+        turns = "\n\n".join(f"{speaker}：{text}" for speaker, text, _ in conv.compacting)
+        limit = max(self.token_budget // 3, 200)
+        system_prompt, prompt = render_prompt("conversation_summary", limit=limit,
+                                              summary=conv.summary or "（无）", input_text=turns)
+        try:
+            summary = await llm_gateway.complete(prompt, system_prompt, tag="conversation_summary")
+        except Exception as e:
+            # 摘要失败时退化为截断拼接，保证上下文仍在预算内
+            print(f"❌ 会话 {conversation_id} 摘要失败：", e)
+            summary = (conv.summary + "\n" + turns)[-limit:]
+        conv.summary = summary
+        conv.summary_tokens = estimate_tokens(summary)
+        conv.compacting = []
+        conv.compaction = None
+
+
+# 创建单例实例
+conversation_store = ConversationStore()
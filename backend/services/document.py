@@ -2,17 +2,107 @@
 # @Date    ：2025/5/19 15:56
 # @Function: 封装读取文档数据库操作的独立逻辑层，
 # 比如增删查改数据库，不处理路由、不返回响应，仅负责查询
+# 正文以 zlib 压缩存储；列表只查元数据，正文按块从数据库读取并增量解压，单个请求的内存占用与文档大小无关。
 
-from sqlalchemy.orm import Session
+import asyncio
+import hashlib
+import zlib
+from typing import AsyncIterator
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.document import Document
 from schemas.document import DocumentCreate
+from services.search import index_entry
+
+COMPRESSION = "zlib"
+COMPRESS_LEVEL = 6
+READ_CHUNK = 64 * 1024  # 每次从数据库读取的压缩数据字节数
+OUTPUT_CHUNK = 256 * 1024  # 每次解压输出的最大字节数
+INLINE_COMPRESS_BYTES = 64 * 1024  # 超过该大小的正文放到线程中压缩，避免阻塞事件循环
+
+
+class DocumentCorrupted(Exception):
+    pass
+
 
-def create_document(db: Session, doc: DocumentCreate):
-    db_doc = Document(**doc.dict())
+def encode_content(content: str) -> dict:
+    """压缩正文，返回 Document 的正文相关列"""
+    raw = content.encode("utf-8")
+    compressed = zlib.compress(raw, COMPRESS_LEVEL)
+    return {
+        "content_compressed": compressed,
+        "compression": COMPRESSION,
+        "size": len(raw),
+        "compressed_size": len(compressed),
+        "content_hash": hashlib.sha256(raw).hexdigest(),
+    }
+
+async def aencode_content(content: str) -> dict:
+    if len(content) > INLINE_COMPRESS_BYTES:
+        return await asyncio.to_thread(encode_content, content)
+    return encode_content(content)
+
+async def create_document(db: AsyncSession, doc: DocumentCreate):
+    fields = doc.dict()
+    content = fields.pop("content")
+    db_doc = Document(**fields, **(await aencode_content(content)))
     db.add(db_doc)
-    db.commit()
-    db.refresh(db_doc)
+    await db.flush()
+    await index_entry(db, "document", db_doc.id, db_doc.title, content)
+    await db.commit()
+    await db.refresh(db_doc)
     return db_doc
 
-def get_documents_by_task(db: Session, task_id: int):
-    return db.query(Document).filter(Document.task_id == task_id).all()
\ No newline at end of file
+async def get_documents_by_task(db: AsyncSession, task_id: int):
+    # content_compressed 为延迟加载列，这里只查询元数据
+    result = await db.execute(
+        select(Document).where(Document.task_id == task_id).order_by(Document.id)
+    )
+    return result.scalars().all()
+
+async def get_document(db: AsyncSession, doc_id: int):
+    return await db.get(Document, doc_id)
+
+async def iter_document_content(db: AsyncSession, doc: Document) -> AsyncIterator[bytes]:
+    """
+    按块读取压缩数据并增量解压，产出 UTF-8 字节
+
+    最后一块在校验通过后才产出：解压失败或 SHA-256 与 content_hash 不一致时抛出 DocumentCorrupted，
+    调用方拿不到完整的损坏内容（一个输出块以内的文档在产出任何数据前就会失败）
+    """
+    if doc.compression != COMPRESSION:
+        raise ValueError(f"不支持的压缩算法：{doc.compression}")
+    decompressor = zlib.decompressobj()
+    digest = hashlib.sha256()
+    held = b""  # 上一块解压结果，拿到下一块后再产出
+    offset = 1  # SUBSTR 从 1 开始计数
+    try:
+        while offset <= doc.compressed_size:
+            chunk = (await db.execute(
+                select(func.substr(Document.content_compressed, offset, READ_CHUNK)).where(Document.id == doc.id)
+            )).scalar()
+            if not chunk:
+                break
+            offset += len(chunk)
+            data = decompressor.decompress(chunk, OUTPUT_CHUNK)
+            while data:
+                digest.update(data)
+                if held:
+                    yield held
+                held = data
+                data = decompressor.decompress(decompressor.unconsumed_tail, OUTPUT_CHUNK)
+        data = decompressor.flush()
+    except zlib.error as e:
+        print(f"❌ 文档 {doc.id} 正文解压失败：{e}")
+        raise DocumentCorrupted(f"文档 {doc.id} 正文已损坏")
+    if data:
+        digest.update(data)
+        if held:
+            yield held
+        held = data
+    if digest.hexdigest() != doc.content_hash:
+        print(f"❌ 文档 {doc.id} 正文校验失败，内容可能已损坏")
+        raise DocumentCorrupted(f"文档 {doc.id} 正文已损坏")
+    if held:
+        yield held
@@ -0,0 +1,141 @@
+# @Function: 生成结果的异步批量存档（write-behind）
+# 生成接口带上 task_id 时，完整结果放入内存队列后立即返回，不等待数据库；
+# 后台任务攒够 DOCUMENT_WRITE_BATCH 条或最早一条等待满 DOCUMENT_WRITE_INTERVAL 秒时，
+# 在一个事务里写入整批文档和全文索引，一批只提交一次。某批提交失败时逐条重试，定位出错的文档。
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from config import DOCUMENT_WRITE_BATCH, DOCUMENT_WRITE_INTERVAL, DOCUMENT_WRITE_QUEUE
+from models.document import Document
+from schemas.document import DocumentCreate
+from services.document import aencode_content
+from services.search import index_entry
+from utils.metrics import document_writes, document_write_batch
+
+TITLE_CHARS = 60
+
+
+def document_title(label: str, source_text: str) -> str:
+    """用输入的第一行生成文档标题，如 “代码：用户注册接口”"""
+    first_line = next((line.strip() for line in source_text.splitlines() if line.strip()), "")
+    if len(first_line) > TITLE_CHARS:
+        first_line = first_line[:TITLE_CHARS] + "…"
+    return f"{label}：{first_line}"
+
+
+class DocumentWriter:
+    def __init__(self,
+                 batch_size: int = DOCUMENT_WRITE_BATCH,
+                 interval: float = DOCUMENT_WRITE_INTERVAL,
+                 max_queue: int = DOCUMENT_WRITE_QUEUE):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, task_id: int, doc_type: str, title: str, content: str):
+        """放入待写队列；只有队列已满时才会等待"""
+        self._ensure_started()
+        await self._queue.put(DocumentCreate(title=title[:255], doc_type=doc_type, content=content, task_id=task_id))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                print(f"❌ 文档批量存档失败，丢弃 {len(batch)} 条：{e}")
+                document_writes.inc("error", amount=len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    async def _write(db, docs: list[DocumentCreate]):
+        rows = []
+        for doc in docs:
+            fields = doc.dict()
+            content = fields.pop("content")
+            rows.append((Document(**fields, **(await aencode_content(content))), content))
+        db.add_all([row for row, _ in rows])
+        await db.flush()
+        for row, content in rows:
+            await index_entry(db, "document", row.id, row.title, content)
+        await db.commit()
+
+    async def _flush(self, batch: list[DocumentCreate]):
+        from db import AsyncSessionLocal  # 延迟导入，避免导入本模块时就创建数据库引擎
+
+        async with AsyncSessionLocal() as db:
+            try:
+                await self._write(db, batch)
+                document_writes.inc("ok", amount=len(batch))
+                document_write_batch.observe(len(batch))
+                print(f"🗄️ 已存档 {len(batch)} 份生成结果")
+                return
+            except Exception as e:
+                await db.rollback()
+                if len(batch) == 1:
+                    print(f"❌ 生成结果存档失败（任务 {batch[0].task_id}）：{e}")
+                    document_writes.inc("error")
+                    return
+                print(f"⚠️ 批量存档 {len(batch)} 份失败，逐条重试：{e}")
+        for doc in batch:
+            await self._flush([doc])
+
+    async def aclose(self):
+        """应用关闭时把队列中剩余的文档写完"""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.join()
+        self._task.cancel()
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "running": self._task is not None and not self._task.done()}
+
+
+# 创建单例实例
+document_writer = DocumentWriter()
+
+
+async def persist_stream(deltas: AsyncIterator, task_id: int, doc_type: str, title: str,
+                         compose: Optional[Callable[[list], str]] = None) -> AsyncIterator:
+    """
+    原样转发增量流，生成完整结束后把结果存档；中途出错或生成被取消时不存档
+
+    普通流式响应在客户端断开时取消生成，因此不存档；可续传流断开后仍在后台生成，结束后照常存档，
+    超过 STREAM_ABANDON_AFTER 无人续传而被放弃的不存档
+
+    compose 把收到的全部元素拼成正文，默认拼接其中的字符串增量
+    """
+    items = []
+    async for item in deltas:
+        items.append(item)
+        yield item
+    content = compose(items) if compose else "".join(item for item in items if isinstance(item, str))
+    if content.strip():
+        await document_writer.submit(task_id, doc_type, title, content)
+
+
+def persisting(worker: Callable[[str], Awaitable[Any]], task_id: int, doc_type: str, label: str,
+               to_content: Callable[[Any], str] = str) -> Callable[[str], Awaitable[Any]]:
+    """包装批量生成的单项函数，生成成功后把结果存档"""
+    async def run(text: str):
+        result = await worker(text)
+        await document_writer.submit(task_id, doc_type, document_title(label, text), to_content(result))
+        return result
+    return run
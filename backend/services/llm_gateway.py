@@ -0,0 +1,326 @@
+# @Function: 统一的大模型异步调用网关
+# 所有生成服务共用一个 HTTP 连接池（keep-alive），每个上游一个 AsyncOpenAI 客户端，
+# 流式调用全程异步，不会阻塞 uvicorn 的事件循环。
+# 每次上游调用记录 prompt token 和命中上游上下文缓存（前缀缓存）的 token 数，按提示词模板汇总。
+# 可配置多个上游（见 LLM_PROVIDERS），由 services.llm_router 按接口的路由策略选择、切换或对冲。
+# 连接池和客户端在第一次调用时才创建，openai SDK 也随之导入，不拖慢启动和 worker 重启。
+import time
+from typing import AsyncIterator, Optional
+
+from config import (
+    LLM_API_KEY,
+    LLM_BASE_URL,
+    LLM_MODEL,
+    LLM_TIMEOUT,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_PROVIDERS,
+    LLM_PROVIDER_WEIGHTS,
+    llm_provider_settings,
+)
+from services.llm_router import Provider, ProviderRouter
+from utils.cache import generation_cache, make_cache_key, replay_stream
+from utils.semantic_cache import semantic_cache
+from utils.singleflight import single_flight
+from utils.metrics import (
+    llm_labels,
+    llm_ttft,
+    llm_generation_seconds,
+    llm_tokens_per_second,
+    llm_prompt_tokens,
+    llm_completion_tokens,
+    llm_upstream_seconds,
+    llm_streams_in_flight,
+    llm_errors,
+)
+
+
+class LLMGateway:
+    """共享的异步大模型网关，封装连接池、多上游路由、非流式与流式调用"""
+
+    def __init__(self,
+                 api_key: Optional[str] = LLM_API_KEY,
+                 base_url: str = LLM_BASE_URL,
+                 model: str = LLM_MODEL,
+                 timeout: float = LLM_TIMEOUT,
+                 max_connections: int = LLM_MAX_CONNECTIONS,
+                 max_keepalive: int = LLM_MAX_KEEPALIVE,
+                 keepalive_expiry: float = LLM_KEEPALIVE_EXPIRY,
+                 providers: Optional[list[str]] = None):
+        self.model = model
+        self.timeout = timeout
+        self.limits = dict(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                           keepalive_expiry=keepalive_expiry)
+        self.http_client = None
+        # 路由和各上游的配置在启动时就解析，配置有误立即报错；客户端留到第一次调用时创建
+        names = providers or LLM_PROVIDERS
+        self._settings: dict[str, dict] = {}
+        upstreams = []
+        for name in names:
+            settings = llm_provider_settings(name)
+            if name == "deepseek":
+                # api_key/base_url 参数用于 deepseek 上游
+                settings.update(api_key=api_key, base_url=base_url)
+                if not api_key:
+                    print("⚠️ 未设置 DEEPSEEK_API_KEY，调用 deepseek 上游时会失败")
+            self._settings[name] = settings
+            upstreams.append(Provider(name, None, settings["model"], LLM_PROVIDER_WEIGHTS.get(name, 1.0)))
+        self.router = ProviderRouter(upstreams)
+        # 模板名 -> {"requests", "prompt_tokens", "cached_tokens", "completion_tokens"}
+        self.usage: dict[str, dict] = {}
+
+    def _connect(self):
+        """创建共享连接池和各上游客户端，只在第一次调用时执行"""
+        if self.http_client is not None:
+            return
+        import httpx
+        from openai import AsyncOpenAI
+
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(**self.limits),
+            timeout=httpx.Timeout(self.timeout, connect=10.0),
+        )
+        # 所有上游共用一个连接池；多个上游时由路由负责切换，客户端不再自行重试，失败后立即换下一个上游
+        retries = {"max_retries": 0} if len(self.router.providers) > 1 else {}
+        for provider in self.router.providers:
+            settings = self._settings[provider.name]
+            provider.client = AsyncOpenAI(api_key=settings["api_key"], base_url=settings["base_url"],
+                                          http_client=self.http_client, **retries)
+
+    @property
+    def client(self):
+        self._connect()
+        return self.router.providers[0].client
+
+    @staticmethod
+    def _cached_tokens(usage) -> int:
+        """DeepSeek 返回 prompt_cache_hit_tokens，OpenAI 兼容实现返回 prompt_tokens_details.cached_tokens"""
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+        if cached is None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", None) if details else None
+            if cached is None and isinstance(details, dict):
+                cached = details.get("cached_tokens")
+        if cached is None:
+            extra = getattr(usage, "model_extra", None) or {}
+            cached = extra.get("prompt_cache_hit_tokens")
+        return cached or 0
+
+    def _record_usage(self, tag: Optional[str], usage, decode_seconds: Optional[float] = None):
+        """记录一次上游调用的 token 用量，decode_seconds 为产出输出 token 所用时间"""
+        if usage is None:
+            return
+        prompt_tokens = usage.prompt_tokens or 0
+        completion_tokens = usage.completion_tokens or 0
+        cached = self._cached_tokens(usage)
+        labels = llm_labels(tag)
+        llm_prompt_tokens.observe(prompt_tokens, *labels)
+        llm_completion_tokens.observe(completion_tokens, *labels)
+        if decode_seconds and completion_tokens:
+            llm_tokens_per_second.observe(completion_tokens / decode_seconds, *labels)
+        stats = self.usage.setdefault(tag or "default", {
+            "requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0,
+        })
+        stats["requests"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_tokens"] += cached
+        stats["completion_tokens"] += completion_tokens
+        ratio = cached / prompt_tokens if prompt_tokens else 0
+        print(f"📊 [{tag or 'default'}] prompt {prompt_tokens} tokens，命中上下文缓存 {cached} tokens（{ratio:.0%}）")
+
+    def usage_stats(self) -> dict:
+        """按模板汇总的 token 用量与上下文缓存命中率"""
+        return {
+            tag: {**stats, "cache_hit_rate": round(stats["cached_tokens"] / stats["prompt_tokens"], 4)
+                  if stats["prompt_tokens"] else 0.0}
+            for tag, stats in self.usage.items()
+        }
+
+    @staticmethod
+    def build_messages(prompt: str, system_prompt: Optional[str] = None) -> list[dict]:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    @staticmethod
+    def _semantic_scope(tag: Optional[str], model: str, system_prompt: Optional[str], prompt: str,
+                        params: dict, semantic: Optional[str]) -> Optional[str]:
+        """
+        语义缓存的作用域：去掉输入文本后的提示词（即模板）与模型、参数的哈希
+
+        只有模板等其余部分完全相同时才比较输入文本的相似度；接口未启用语义缓存时返回 None
+        输入文本是模板的最后一个字段，只替换最后一次出现，模板正文或上下文中的相同文字不受影响
+        """
+        if not semantic or semantic_cache.threshold_for(tag) is None or semantic not in prompt:
+            return None
+        head, _, tail = prompt.rpartition(semantic)
+        return make_cache_key(model, system_prompt, f"{head}\0{tail}", {**params, "tag": tag})
+
+    @staticmethod
+    async def _semantic_get(tag: Optional[str], scope: str, text: str) -> Optional[str]:
+        """按相似度从高到低取第一个仍在生成结果缓存中的结果"""
+        for key, score in await semantic_cache.alookup(tag, scope, text):
+            cached = await generation_cache.aget(key)
+            if cached is not None:
+                print(f"🧲 [{tag or 'default'}] 语义缓存命中，相似度 {score:.3f}")
+                return cached
+        return None
+
+    async def complete(self, prompt: str, system_prompt: Optional[str] = None,
+                       model: Optional[str] = None, cache: bool = False, share: bool = False,
+                       tag: Optional[str] = None, semantic: Optional[str] = None, **params) -> str:
+        """
+        非流式调用，返回完整文本
+
+        - cache=True 时先查生成结果缓存，生成完成后写入缓存
+        - share=True 时相同输入的并发调用只向上游请求一次
+        - tag 为提示词模板名，用于按模板统计 token 用量
+        - semantic 为填入模板的原始输入，cache=True 且该接口启用语义缓存时，与以前相近的输入直接复用结果
+        """
+        model = model or self.model
+        labels = llm_labels(tag)
+        started = time.perf_counter()
+        key = make_cache_key(model, system_prompt, prompt, params) if cache or share else None
+        scope = self._semantic_scope(tag, model, system_prompt, prompt, params, semantic) if cache else None
+        if cache:
+            cached = await generation_cache.aget(key)
+            if cached is None and scope:
+                cached = await self._semantic_get(tag, scope, semantic)
+            if cached is not None:
+                llm_generation_seconds.observe(time.perf_counter() - started, *labels)
+                return cached
+
+        messages = self.build_messages(prompt, system_prompt)
+        self._connect()
+
+        def call(provider: Provider):
+            return provider.client.chat.completions.create(
+                model=provider.model_for(model),
+                messages=messages,
+                **params,
+            )
+
+        async def upstream() -> str:
+            upstream_started = time.perf_counter()
+            completion = await self.router.complete(tag, call)
+            elapsed = time.perf_counter() - upstream_started
+            llm_upstream_seconds.observe(elapsed, *labels, "complete")
+            self._record_usage(tag, completion.usage, elapsed)
+            result = (completion.choices[0].message.content or "").strip()
+            if cache:
+                await generation_cache.aset(key, result)
+                if scope:
+                    await semantic_cache.aadd(tag, scope, semantic, key)
+            return result
+
+        try:
+            result = await (single_flight.call(key, upstream) if share else upstream())
+        except Exception:
+            llm_errors.inc(*labels)
+            raise
+        llm_generation_seconds.observe(time.perf_counter() - started, *labels)
+        return result
+
+    async def stream(self, prompt: str, system_prompt: Optional[str] = None,
+                     model: Optional[str] = None, cache: bool = False, share: bool = False,
+                     tag: Optional[str] = None, semantic: Optional[str] = None, **params) -> AsyncIterator[str]:
+        """
+        流式调用，逐个产出增量文本
+
+        - cache=True 时缓存命中直接回放缓存结果，完整生成后写入缓存
+        - share=True 时相同输入的并发请求共享同一个上游流
+        - tag 为提示词模板名，用于按模板统计 token 用量
+        - semantic 为填入模板的原始输入，用法同 complete
+        """
+        model = model or self.model
+        labels = llm_labels(tag)
+        started = time.perf_counter()
+        key = make_cache_key(model, system_prompt, prompt, params) if cache or share else None
+        scope = self._semantic_scope(tag, model, system_prompt, prompt, params, semantic) if cache else None
+
+        def upstream() -> AsyncIterator[str]:
+            return self._stream_upstream(model, self.build_messages(prompt, system_prompt),
+                                         key if cache else None, tag, params,
+                                         (scope, semantic) if scope else None)
+
+        llm_streams_in_flight.inc(*labels)
+        first = True
+        try:
+            cached = await generation_cache.aget(key) if cache else None
+            if cached is None and scope:
+                cached = await self._semantic_get(tag, scope, semantic)
+            if cached is not None:
+                source = replay_stream(cached)
+            else:
+                source = single_flight.stream(key, upstream) if share else upstream()
+            async for content in source:
+                if first:
+                    llm_ttft.observe(time.perf_counter() - started, *labels)
+                    first = False
+                yield content
+            llm_generation_seconds.observe(time.perf_counter() - started, *labels)
+        except Exception:
+            llm_errors.inc(*labels)
+            raise
+        finally:
+            llm_streams_in_flight.dec(*labels)
+
+    async def _stream_upstream(self, model: str, messages: list[dict],
+                               cache_key: Optional[str], tag: Optional[str],
+                               params: dict, semantic: Optional[tuple[str, str]] = None) -> AsyncIterator[str]:
+        labels = llm_labels(tag)
+        started = time.perf_counter()
+        parts = []
+        self._connect()
+        source = self.router.stream(tag, lambda provider: self._stream_provider(provider, model, messages, tag, params))
+        try:
+            async for content in source:
+                parts.append(content)
+                yield content
+        finally:
+            await source.aclose()  # 提前退出时逐层关闭，直到上游响应
+        llm_upstream_seconds.observe(time.perf_counter() - started, *labels, "stream")
+        # 只缓存完整生成的结果
+        if cache_key:
+            await generation_cache.aset(cache_key, "".join(parts).strip())
+            if semantic:
+                await semantic_cache.aadd(tag, *semantic, cache_key)
+
+    async def _stream_provider(self, provider: Provider, model: str, messages: list[dict],
+                               tag: Optional[str], params: dict) -> AsyncIterator[str]:
+        """向单个上游发起流式请求"""
+        started = time.perf_counter()
+        first_token_at = None
+        response = await provider.client.chat.completions.create(
+            model=provider.model_for(model),
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},  # 最后一个 chunk 带上 usage
+            **params,
+        )
+        try:
+            async for chunk in response:
+                if chunk.usage:
+                    self._record_usage(tag, chunk.usage, time.perf_counter() - (first_token_at or started))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield content
+        finally:
+            # 提前退出（如客户端断开、对冲落败）时关闭上游响应，连接归还连接池
+            await response.close()
+
+    def provider_stats(self) -> dict:
+        return self.router.stats()
+
+    async def aclose(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+
+
+# 创建单例实例
+llm_gateway = LLMGateway()
@@ -0,0 +1,265 @@
+# @Function: 多上游大模型路由
+# 可同时接入多个 OpenAI 兼容的上游（DeepSeek、本地 Ollama 等），按接口选择路由策略：
+# - fallback：按配置顺序使用，首字之前失败则换下一个上游
+# - hedged：优先用首字最快的上游，LLM_HEDGE_DELAY 秒内没有首字就向下一个上游再发一次，
+#           先出首字的胜出，另一个立即取消（关闭上游连接，不再消耗 token）
+# - weighted：按权重随机选择，权重再除以各上游的延迟，越慢分到的请求越少；失败同样换下一个
+# 每个上游记录首字耗时和错误率的滑动平均，连续失败 LLM_CIRCUIT_FAILURES 次后暂停使用一段时间。
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from config import (
+    LLM_ROUTING_POLICY,
+    LLM_ROUTING_POLICIES,
+    LLM_HEDGE_DELAY,
+    LLM_CIRCUIT_FAILURES,
+    LLM_CIRCUIT_COOLDOWN,
+)
+from utils.metrics import llm_labels, tag_endpoint, llm_provider_ttft, llm_provider_requests, llm_hedges
+
+POLICIES = ("fallback", "hedged", "weighted")
+EWMA_ALPHA = 0.2
+
+
+class Provider:
+    """一个 OpenAI 兼容的上游及其延迟/健康状况"""
+
+    def __init__(self, name: str, client, model: Optional[str] = None, weight: float = 1.0):
+        self.name = name
+        self.client = client  # 可为空，由网关在第一次调用时创建
+        self.model = model  # 为空时使用调用方指定的模型
+        self.weight = weight
+        self.ttft: Optional[float] = None  # 流式首字耗时的滑动平均（秒）
+        self.latency: Optional[float] = None  # 非流式完整耗时的滑动平均（秒）
+        self.error_rate = 0.0
+        self.failures = 0  # 连续失败次数
+        self.open_until = 0.0  # 暂停使用直到该时刻
+
+    def model_for(self, model: str) -> str:
+        return self.model or model
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def score(self, kind: str) -> Optional[float]:
+        """越小越好；还没有延迟数据时返回 None"""
+        value = self.ttft if kind == "stream" else self.latency
+        return None if value is None else value * (1 + 4 * self.error_rate)
+
+    def record_success(self, kind: str, seconds: float):
+        if kind == "stream":
+            self.ttft = seconds if self.ttft is None else self.ttft * (1 - EWMA_ALPHA) + seconds * EWMA_ALPHA
+        else:
+            self.latency = seconds if self.latency is None else self.latency * (1 - EWMA_ALPHA) + seconds * EWMA_ALPHA
+        self.error_rate *= 1 - EWMA_ALPHA
+        self.failures = 0
+
+    def record_lower_bound(self, kind: str, seconds: float):
+        """
+        对冲落败被取消时，至少已等待了 seconds 秒，作为一次样本计入滑动平均（只会拉高）
+
+        否则变慢的上游没有新样本，延迟仍停留在以前的低值，会一直排在第一位
+        """
+        value = self.ttft if kind == "stream" else self.latency
+        if value is not None and seconds <= value:
+            return
+        value = seconds if value is None else value * (1 - EWMA_ALPHA) + seconds * EWMA_ALPHA
+        if kind == "stream":
+            self.ttft = value
+        else:
+            self.latency = value
+
+    def record_failure(self):
+        self.error_rate = self.error_rate * (1 - EWMA_ALPHA) + EWMA_ALPHA
+        self.failures += 1
+        if self.failures >= LLM_CIRCUIT_FAILURES:
+            self.open_until = time.monotonic() + LLM_CIRCUIT_COOLDOWN
+            print(f"⛔ 上游 {self.name} 连续失败 {self.failures} 次，暂停使用 {LLM_CIRCUIT_COOLDOWN:.0f} 秒")
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "weight": self.weight,
+            "ttft_ewma": round(self.ttft, 4) if self.ttft is not None else None,
+            "latency_ewma": round(self.latency, 4) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "available": self.available(),
+        }
+
+
+class ProviderRouter:
+    def __init__(self, providers: list[Provider],
+                 default_policy: str = LLM_ROUTING_POLICY,
+                 policies: Optional[dict[str, str]] = None,
+                 hedge_delay: float = LLM_HEDGE_DELAY):
+        if not providers:
+            raise ValueError("至少需要配置一个大模型上游")
+        self.providers = providers
+        self.default_policy = default_policy
+        self.policies = policies if policies is not None else LLM_ROUTING_POLICIES
+        self.hedge_delay = hedge_delay
+        for policy in [default_policy, *self.policies.values()]:
+            if policy not in POLICIES:
+                raise ValueError(f"未知的路由策略 {policy}，可选：{', '.join(POLICIES)}")
+
+    def policy_for(self, tag: Optional[str]) -> str:
+        return self.policies.get(tag_endpoint(tag), self.default_policy)
+
+    def plan(self, policy: str, kind: str) -> list[Provider]:
+        """按策略给出尝试顺序；暂停中的上游排在最后，全部暂停时仍会尝试"""
+        healthy = [p for p in self.providers if p.available()]
+        paused = [p for p in self.providers if not p.available()]
+        if policy == "hedged":
+            # 有延迟数据的按延迟升序，没有数据的按配置顺序排在后面
+            order = {p: i for i, p in enumerate(self.providers)}
+            healthy.sort(key=lambda p: (p.score(kind) is None, p.score(kind) or 0, order[p]))
+        elif policy == "weighted":
+            # 加权随机排序（Efraimidis-Spirakis）：权重除以延迟，越快越容易排在前面
+            def key(p: Provider) -> float:
+                weight = p.weight / max(p.score(kind) or 1.0, 0.05)
+                return random.random() ** (1 / weight) if weight > 0 else 0.0
+            healthy.sort(key=key, reverse=True)
+        return healthy + paused
+
+    @staticmethod
+    async def _timed(provider: Provider, kind: str, awaitable: Awaitable, finished: bool):
+        """等待上游的首字（或非流式的完整结果），记录耗时和成败"""
+        started = time.perf_counter()
+        try:
+            result = await awaitable
+        except asyncio.CancelledError:
+            llm_provider_requests.inc(provider.name, "cancelled")
+            raise
+        except Exception:
+            provider.record_failure()
+            llm_provider_requests.inc(provider.name, "error")
+            raise
+        elapsed = time.perf_counter() - started
+        provider.record_success(kind, elapsed)
+        llm_provider_ttft.observe(elapsed, provider.name)
+        if finished:
+            llm_provider_requests.inc(provider.name, "ok")
+        return result
+
+    async def _race(self, tag: Optional[str], kind: str, candidates: list[Provider],
+                    attempt: Callable[[Provider], Awaitable], delay: Optional[float],
+                    discard: Optional[Callable] = None) -> tuple[Provider, object]:
+        """
+        依次尝试候选上游，返回 (胜出的上游, 结果)
+
+        delay 为空时逐个尝试，失败才换下一个；否则 delay 秒内没有结果就并行发起下一个（只对冲一次），
+        先成功的胜出，其余的取消并把已等待的时间记为延迟下限；discard 用于清理同时完成但未被采用的结果
+        """
+        endpoint = llm_labels(tag)[0]
+        queue = list(candidates)
+        primary = queue[0]
+        running: dict[asyncio.Task, Provider] = {}
+        launched: dict[asyncio.Task, float] = {}
+
+        def launch():
+            provider = queue.pop(0)
+            task = asyncio.ensure_future(attempt(provider))
+            running[task] = provider
+            launched[task] = time.perf_counter()
+
+        launch()
+        hedged = False
+        last_error: Optional[BaseException] = None
+        try:
+            while running:
+                timeout = delay if queue and not hedged else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    print(f"🏁 [{endpoint}] {primary.name} {timeout:.2f}s 内无响应，向 {queue[0].name} 发起对冲请求")
+                    launch()
+                    continue
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is None:
+                        if hedged:
+                            llm_hedges.inc(endpoint, "primary" if provider is primary else "hedge")
+                            now = time.perf_counter()
+                            for loser, other in running.items():
+                                other.record_lower_bound(kind, now - launched[loser])
+                        return provider, task.result()
+                    last_error = task.exception()
+                    print(f"⚠️ 上游 {provider.name} 调用失败：{last_error}")
+                if not running and queue:
+                    launch()  # 当前都失败了，立即换下一个
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+            for task in running:
+                try:
+                    result = await task
+                except BaseException:
+                    continue
+                if discard is not None:
+                    await discard(result)
+
+    async def complete(self, tag: Optional[str], call: Callable[[Provider], Awaitable]):
+        """非流式调用：call(provider) 向指定上游发起请求"""
+        policy = self.policy_for(tag)
+        candidates = self.plan(policy, "complete")
+        delay = None
+        if policy == "hedged" and candidates[0].latency is not None:
+            # 非流式没有首字，按主上游平时完整耗时的 2 倍判断是否变慢；还没有数据时不对冲
+            delay = max(self.hedge_delay, candidates[0].latency * 2)
+
+        async def attempt(provider: Provider):
+            return await self._timed(provider, "complete", call(provider), finished=True)
+
+        _, result = await self._race(tag, "complete", candidates, attempt, delay)
+        return result
+
+    async def stream(self, tag: Optional[str],
+                     open_stream: Callable[[Provider], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """流式调用：open_stream(provider) 返回该上游的增量流；首字之后出错不再切换上游"""
+        policy = self.policy_for(tag)
+        candidates = self.plan(policy, "stream")
+
+        async def attempt(provider: Provider):
+            stream = open_stream(provider)
+
+            async def first_chunk():
+                try:
+                    return await stream.__anext__()
+                except StopAsyncIteration:
+                    return None
+
+            try:
+                first = await self._timed(provider, "stream", first_chunk(), finished=False)
+            except BaseException:
+                await stream.aclose()
+                raise
+            return stream, first
+
+        async def discard(result):
+            await result[0].aclose()
+
+        provider, (stream, first) = await self._race(
+            tag, "stream", candidates, attempt, self.hedge_delay if policy == "hedged" else None, discard)
+        try:
+            if first is not None:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+        except Exception:
+            provider.record_failure()
+            llm_provider_requests.inc(provider.name, "error")
+            raise
+        finally:
+            await stream.aclose()
+        llm_provider_requests.inc(provider.name, "ok")
+
+    def stats(self) -> dict:
+        return {
+            "default_policy": self.default_policy,
+            "policies": self.policies,
+            "hedge_delay": self.hedge_delay,
+            "providers": {p.name: p.stats() for p in self.providers},
+        }
@@ -0,0 +1,104 @@
+# @Function: 服务端流水线式会议室编排
+# 需求分析师 → 系统架构师 → 开发工程师 → 测试工程师 按流水线运行：
+# 下游角色在上游角色输出中其依赖的段落写完后立即开始，而不是等上游整段回答结束，
+# 所有角色的输出复用到同一个流中返回。
+import asyncio
+from typing import AsyncIterator, Optional, Union
+
+from services.agent_service import AgentService, ROLE_NAMES, agent_service
+
+MEETING_ROLES = ["analyst", "architect", "developer", "tester"]
+
+# 下游角色 -> (依赖的上游角色, 标记)
+# 上游输出中出现标记，说明标记之前依赖的段落已经完整，下游可以开始
+SECTION_TRIGGERS = {
+    "architect": ("analyst", "用例描述"),  # 分析师的“详细需求点”已写完
+    "developer": ("architect", "【数据库设计】"),  # 架构师的“架构设计”已写完
+    "tester": ("developer", "关键业务逻辑"),  # 开发的“核心数据结构/主要API接口”已写完
+}
+
+
+class MeetingOrchestrator:
+    """基于 AgentService 的会议室流水线编排"""
+
+    def __init__(self, agent: AgentService = agent_service, queue_size: int = 256):
+        self.agent = agent
+        self.queue_size = queue_size
+
+    @staticmethod
+    def _build_input(topic: str, role: str, outputs: dict[str, str], roles: list[str]) -> str:
+        """把会议主题和已开始角色的发言拼成当前角色的会议内容"""
+        lines = [f"用户：{topic}"]
+        for other in roles:
+            if other == role:
+                break
+            if outputs[other]:
+                lines.append(f"{ROLE_NAMES[other]}：{outputs[other]}")
+        return "\n\n".join(lines)
+
+    async def run(self, topic: str, context: Optional[str] = None,
+                  roles: Optional[list[str]] = None) -> AsyncIterator[Union[tuple, dict]]:
+        """
+        运行一次会议，产出多路复用的事件
+
+        - (role, 增量文本)：角色发言内容
+        - {"role": ..., "event": "start" | "end"}：角色开始/结束
+        - {"role": ..., "error": ...}：角色生成失败
+        """
+        roles = [r for r in MEETING_ROLES if r in roles] if roles else list(MEETING_ROLES)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        outputs = {role: "" for role in roles}
+        ready = {role: asyncio.Event() for role in roles}
+
+        # 没有上游依赖（或上游未参与本次会议）的角色立即开始
+        for role in roles:
+            upstream = SECTION_TRIGGERS.get(role, (None, None))[0]
+            if upstream not in ready:
+                ready[role].set()
+
+        downstream = {
+            upstream: (role, marker)
+            for role, (upstream, marker) in SECTION_TRIGGERS.items()
+            if role in ready and upstream in ready
+        }
+
+        async def run_role(role: str):
+            await ready[role].wait()
+            follower = downstream.get(role)
+            input_text = self._build_input(topic, role, outputs, roles)
+            await queue.put({"role": role, "event": "start"})
+            try:
+                async for delta in self.agent.generate_response_stream(
+                        role=role, input_text=input_text, mode="meeting_room", context=context):
+                    outputs[role] += delta
+                    await queue.put((role, delta))
+                    if follower and not ready[follower[0]].is_set():
+                        # 只在新增内容附近查找标记
+                        marker = follower[1]
+                        if marker in outputs[role][-(len(delta) + len(marker)):]:
+                            ready[follower[0]].set()
+            except Exception as e:
+                print(f"❌ 会议角色 {role} 生成失败：", e)
+                await queue.put({"role": role, "error": str(e)})
+            finally:
+                # 上游结束时仍未出现标记，则直接放行下游
+                if follower:
+                    ready[follower[0]].set()
+                await queue.put({"role": role, "event": "end"})
+
+        tasks = [asyncio.create_task(run_role(role)) for role in roles]
+        remaining = len(roles)
+        try:
+            while remaining:
+                item = await queue.get()
+                if isinstance(item, dict) and item.get("event") == "end":
+                    remaining -= 1
+                yield item
+            yield {"event": "done"}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+# 创建单例实例
+meeting_orchestrator = MeetingOrchestrator()
@@ -1,20 +1,138 @@
-from sqlalchemy.orm import Session
+import base64
+import hashlib
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.requirement import Requirement
 from schemas.requirement import *
+from services.search import index_entry
+from services.requirement_revisions import record_revision
+from services.architecture_generator import generate_architecture
+from config import SPECULATIVE_ARCHITECTURE
+from utils.jobs import job_queue, JobQueueFull, PRIORITY_SPECULATIVE
 
-def create_requirement(db: Session, req: RequirementCreate, creator_id: int):
+async def create_requirement(db: AsyncSession, req: RequirementCreate, creator_id: int):
     new_req = Requirement(**req.dict(), creator_id=creator_id)
     db.add(new_req)
-    db.commit()
-    db.refresh(new_req)
+    await db.flush()
+    await index_entry(db, "requirement", new_req.id, new_req.title, new_req.content)
+    await record_revision(db, new_req)
+    await db.commit()
+    await db.refresh(new_req)
     return new_req
 
-def update_requirement(db: Session, req_id: int, req: RequirementUpdate):
-    db_req = db.query(Requirement).get(req_id)
+async def update_requirement(db: AsyncSession, req_id: int, req: RequirementUpdate):
+    # 锁住需求行直到提交：并发编辑依次读取最新内容和修订号，不会算出相同的下一个修订号
+    db_req = (await db.execute(
+        select(Requirement).where(Requirement.id == req_id)
+        .with_for_update().execution_options(populate_existing=True)
+    )).scalar_one_or_none()
     if not db_req:
         return None
-    for key, value in req.dict(exclude_unset=True).items():
+    updates = req.dict(exclude_unset=True)
+    previous = {"title": db_req.title, "content": db_req.content, "version": db_req.version,
+                "status": db_req.status}
+    for key, value in updates.items():
         setattr(db_req, key, value)
-    db.commit()
-    db.refresh(db_req)
+    if db_req.title != previous["title"] or db_req.content != previous["content"]:
+        await index_entry(db, "requirement", db_req.id, db_req.title, db_req.content)
+        # 修订记录与需求更新在同一事务中提交
+        await record_revision(db, db_req, previous)
+    await db.commit()
+    await db.refresh(db_req)
+    if db_req.status == "已确认" and previous["status"] != "已确认":
+        schedule_speculative_architecture(db_req.id, db_req.content)
     return db_req
+
+
+def schedule_speculative_architecture(req_id: int, content: str):
+    """
+    需求确认后在后台预先生成架构设计，结果进入生成结果缓存
+
+    随后用同一需求正文调用 /api/architecture/ 时直接命中缓存；交互式负载高时任务暂缓或让出
+    """
+    if not SPECULATIVE_ARCHITECTURE or not content.strip():
+        return
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    async def run():
+        architecture, db_schema, ddl = await generate_architecture(content)
+        return {"requirement_id": req_id, "architecture_chars": len(architecture),
+                "database_design_chars": len(db_schema), "ddl_statements": len(ddl)}
+
+    try:
+        job_queue.submit("speculative_architecture", run, PRIORITY_SPECULATIVE,
+                         key=f"architecture:{req_id}:{digest}")
+    except JobQueueFull as e:
+        print(f"⚠️ 需求 {req_id} 的架构预生成未提交：{e}")
+
+
+# 列表不返回正文时只查询这些列，避免读取大字段 content
+SUMMARY_COLUMNS = (
+    Requirement.id,
+    Requirement.title,
+    Requirement.priority,
+    Requirement.status,
+    Requirement.version,
+    Requirement.creator_id,
+    Requirement.created_at,
+)
+
+
+def encode_cursor(created_at: datetime, req_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{req_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """解析游标，格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, req_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(req_id)
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
+async def list_requirements_page(db: AsyncSession,
+                           limit: int = 20,
+                           cursor: Optional[str] = None,
+                           status: Optional[str] = None,
+                           priority: Optional[str] = None,
+                           creator_id: Optional[int] = None,
+                           created_from: Optional[datetime] = None,
+                           created_to: Optional[datetime] = None,
+                           with_content: bool = False):
+    """
+    按 (created_at, id) 倒序的游标分页查询需求
+
+    返回 (当前页记录, 下一页游标)，不统计总数
+    """
+    query = select(Requirement) if with_content else select(*SUMMARY_COLUMNS)
+    if status:
+        query = query.where(Requirement.status == status)
+    if priority:
+        query = query.where(Requirement.priority == priority)
+    if creator_id is not None:
+        query = query.where(Requirement.creator_id == creator_id)
+    if created_from:
+        query = query.where(Requirement.created_at >= created_from)
+    if created_to:
+        query = query.where(Requirement.created_at < created_to)
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(or_(
+            Requirement.created_at < cursor_created_at,
+            and_(Requirement.created_at == cursor_created_at, Requirement.id < cursor_id),
+        ))
+
+    # 多取一条用于判断是否还有下一页
+    query = query.order_by(Requirement.created_at.desc(), Requirement.id.desc()).limit(limit + 1)
+    result = await db.execute(query)
+    rows = result.scalars().all() if with_content else result.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
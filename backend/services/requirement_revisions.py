@@ -0,0 +1,157 @@
+# @Function: 需求修订历史的存储与还原
+# 修订按行做差异：delta 记录“从上一修订复制第 i1~i2 行”和“插入新文本”两种操作，
+# 每 REVISION_SNAPSHOT_INTERVAL 个修订存一次完整快照；差异比快照还大时也直接存快照。
+# 还原任一修订时从不晚于它的最近快照开始，最多应用 REVISION_SNAPSHOT_INTERVAL - 1 次差异。
+import difflib
+import hashlib
+import json
+import zlib
+from typing import Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import REVISION_SNAPSHOT_INTERVAL
+from models.requirement import Requirement
+from models.requirement_revision import RequirementRevision
+
+
+def make_delta(old: str, new: str) -> list:
+    """生成把 old 变成 new 的行级差异操作"""
+    a = old.splitlines(keepends=True)
+    b = new.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(["c", i1, i2])
+        elif tag in ("replace", "insert"):
+            ops.append(["i", "".join(b[j1:j2])])
+    return ops
+
+
+def apply_delta(base: str, ops: list) -> str:
+    lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == "c":
+            parts.extend(lines[op[1]:op[2]])
+        else:
+            parts.append(op[1])
+    return "".join(parts)
+
+
+def _pack(value) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def _unpack(payload: bytes):
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+async def _latest(db: AsyncSession, requirement_id: int) -> tuple[int, int]:
+    """返回 (最新修订号, 最近快照修订号)，没有修订时均为 0"""
+    latest, last_snapshot = (await db.execute(
+        select(
+            func.max(RequirementRevision.revision),
+            func.max(case((RequirementRevision.kind == "snapshot", RequirementRevision.revision))),
+        ).where(RequirementRevision.requirement_id == requirement_id)
+    )).one()
+    return latest or 0, last_snapshot or 0
+
+
+def _revision(requirement_id: int, revision: int, title: str, content: str, version: Optional[str],
+              previous: Optional[str], force_snapshot: bool) -> RequirementRevision:
+    snapshot = _pack(content)
+    kind, payload = "snapshot", snapshot
+    if previous is not None and not force_snapshot:
+        delta = _pack(make_delta(previous, content))
+        if len(delta) < len(snapshot):
+            kind, payload = "delta", delta
+    return RequirementRevision(
+        requirement_id=requirement_id, revision=revision, kind=kind, payload=payload,
+        title=title, version=version, size=len(content),
+        content_hash=hashlib.sha256(content.encode("utf-8")).hexdigest(),
+    )
+
+
+async def record_revision(db: AsyncSession, req: Requirement, previous: Optional[dict] = None) -> int:
+    """
+    为需求的当前内容记录一个新修订，不提交事务，返回修订号
+
+    previous 为更新前的 {"title", "content", "version"}；
+    对上线前就存在、还没有修订记录的需求，先把更新前的内容记为第 1 个修订
+    """
+    latest, last_snapshot = await _latest(db, req.id)
+    if latest == 0 and previous is not None:
+        db.add(_revision(req.id, 1, previous["title"], previous["content"], previous.get("version"),
+                         None, True))
+        latest = last_snapshot = 1
+
+    revision = latest + 1
+    base = previous["content"] if previous is not None else None
+    db.add(_revision(req.id, revision, req.title, req.content, req.version, base,
+                     revision - last_snapshot >= REVISION_SNAPSHOT_INTERVAL))
+    return revision
+
+
+async def list_revisions(db: AsyncSession, requirement_id: int) -> list:
+    result = await db.execute(
+        select(RequirementRevision.revision, RequirementRevision.kind, RequirementRevision.title,
+               RequirementRevision.version, RequirementRevision.size, RequirementRevision.content_hash,
+               RequirementRevision.created_at)
+        .where(RequirementRevision.requirement_id == requirement_id)
+        .order_by(RequirementRevision.revision.desc())
+    )
+    return result.all()
+
+
+async def get_revision(db: AsyncSession, requirement_id: int, revision: int) -> Optional[tuple]:
+    """还原指定修订，返回 (修订记录, 正文)；修订不存在时返回 None"""
+    snapshot_revision = (await db.execute(
+        select(func.max(RequirementRevision.revision)).where(
+            RequirementRevision.requirement_id == requirement_id,
+            RequirementRevision.kind == "snapshot",
+            RequirementRevision.revision <= revision,
+        )
+    )).scalar()
+    if snapshot_revision is None:
+        return None
+
+    rows = (await db.execute(
+        select(RequirementRevision).where(
+            RequirementRevision.requirement_id == requirement_id,
+            RequirementRevision.revision.between(snapshot_revision, revision),
+        ).order_by(RequirementRevision.revision)
+    )).scalars().all()
+    if not rows or rows[-1].revision != revision:
+        return None
+
+    content = _unpack(rows[0].payload)
+    for row in rows[1:]:
+        content = _unpack(row.payload) if row.kind == "snapshot" else apply_delta(content, _unpack(row.payload))
+    return rows[-1], content
+
+
+async def diff_revisions(db: AsyncSession, requirement_id: int, from_revision: int, to_revision: int,
+                         context: int = 3) -> Optional[dict]:
+    """在服务端比较两个修订，只返回统一格式的差异文本和增删行数"""
+    old = await get_revision(db, requirement_id, from_revision)
+    new = await get_revision(db, requirement_id, to_revision)
+    if old is None or new is None:
+        return None
+    lines = list(difflib.unified_diff(
+        old[1].splitlines(keepends=True), new[1].splitlines(keepends=True),
+        fromfile=f"r{from_revision}", tofile=f"r{to_revision}", n=context,
+    ))
+    added = sum(1 for line in lines if line.startswith("+") and not line.startswith("+++"))
+    removed = sum(1 for line in lines if line.startswith("-") and not line.startswith("---"))
+    # 末行没有换行符时补上，保证差异文本逐行可读
+    diff = "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+    return {
+        "from_revision": from_revision,
+        "to_revision": to_revision,
+        "title_changed": old[0].title != new[0].title,
+        "added": added,
+        "removed": removed,
+        "diff": diff,
+    }
@@ -0,0 +1,257 @@
+# @Function: 需求的批量导出与导入
+# 导出：用服务端游标（stream_results）逐批读取，按 NDJSON 或 CSV 编码后攒成约 64KB 的块写出，
+# 内存占用与数据量无关。
+# 导入：边接收请求体边解码、切行、解析，每 IMPORT_BATCH 行校验后用一条多行 INSERT 写入并提交；
+# 某一批写入失败时逐行重试，定位出错的行，其余行照常写入。
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.requirement import Requirement
+from models.search import SearchDocument
+from schemas.requirement import RequirementCreate
+from services.search import index_entry
+
+EXPORT_COLUMNS = ("id", "title", "content", "priority", "status", "version", "creator_id", "created_at")
+IMPORT_FIELDS = ("title", "content", "priority", "status", "version")
+EXPORT_BATCH = 1000  # 服务端游标每次取回的行数
+EXPORT_CHUNK_BYTES = 64 * 1024
+IMPORT_BATCH = 1000  # 每条多行 INSERT 写入的行数
+MAX_REPORTED_ERRORS = 1000
+STATUSES = ("待评审", "已确认", "已冻结")
+
+
+# ---------- 导出 ----------
+
+def _export_query(status: Optional[str] = None, priority: Optional[str] = None, creator_id: Optional[int] = None):
+    columns = [getattr(Requirement, name) for name in EXPORT_COLUMNS]
+    query = select(*columns).order_by(Requirement.id)
+    if status:
+        query = query.where(Requirement.status == status)
+    if priority:
+        query = query.where(Requirement.priority == priority)
+    if creator_id is not None:
+        query = query.where(Requirement.creator_id == creator_id)
+    return query.execution_options(yield_per=EXPORT_BATCH)
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def export_requirements(db: AsyncSession, fmt: str = "ndjson", **filters) -> AsyncIterator[bytes]:
+    """按 id 顺序流式导出需求，fmt 为 ndjson 或 csv"""
+    result = await db.stream(_export_query(**filters))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer is not None:
+        buffer.write("\ufeff")  # BOM，Excel 打开中文 CSV 不乱码
+        writer.writerow(EXPORT_COLUMNS)
+
+    count = 0
+    try:
+        async for rows in result.partitions():
+            for row in rows:
+                values = [_export_value(v) for v in row]
+                if writer is not None:
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, values)), ensure_ascii=False))
+                    buffer.write("\n")
+                count += 1
+                if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+        print(f"📤 已导出 {count} 条需求（{fmt}）")
+    finally:
+        await result.close()
+
+
+# ---------- 导入 ----------
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    把字节流增量解码并切分成行（保留换行符），自动去掉 UTF-8 BOM
+
+    只按 LF 切分：正文里的 U+2028 等字符在 NDJSON 中不转义，不能像 str.splitlines 那样当作换行
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()  # 最后一段可能不完整，留到下一块
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, Optional[dict], Optional[str]]]:
+    line_no = 0
+    async for line in _iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"JSON 格式错误：{e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "每行必须是一个 JSON 对象"
+            continue
+        yield line_no, record, None
+
+
+async def _iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, Optional[dict], Optional[str]]]:
+    """
+    增量解析 CSV，首行为表头
+
+    引号内的字段可以跨行：累计到引号数为偶数时才算一条完整记录，行号为记录的起始行
+    """
+    header = None
+    record_lines: list[str] = []
+    quotes = 0
+    line_no = start_line = 0
+    async for line in _iter_lines(chunks):
+        line_no += 1
+        if not record_lines:
+            start_line = line_no
+        record_lines.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+
+        text = "".join(record_lines)
+        record_lines, quotes = [], 0
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader(io.StringIO(text)))
+        except csv.Error as e:
+            yield start_line, None, f"CSV 格式错误：{e}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start_line, None, f"列数为 {len(values)}，与表头的 {len(header)} 列不一致"
+            continue
+        yield start_line, dict(zip(header, values)), None
+
+    if record_lines:
+        yield start_line, None, "CSV 格式错误：引号未闭合"
+
+
+def _validate(record: dict, creator_id: int) -> dict:
+    """校验一行数据并转换成 requirements 表的一行，校验失败抛出 ValueError"""
+    data = {k: v for k, v in record.items() if k in IMPORT_FIELDS and v not in (None, "")}
+    try:
+        req = RequirementCreate(**data)
+    except ValidationError as e:
+        raise ValueError("；".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    if len(req.title) > 200:
+        raise ValueError("title: 标题不能超过 200 个字符")
+    if req.version and len(req.version) > 20:
+        raise ValueError("version: 版本号不能超过 20 个字符")
+    status = data.get("status", "待评审")
+    if status not in STATUSES:
+        raise ValueError(f"status: 必须是 {'、'.join(STATUSES)} 之一")
+    return {**req.dict(), "status": status, "creator_id": creator_id}
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.indexed = 0
+        self.errors: list[dict] = []
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "indexed": self.indexed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def _index_new_rows(db: AsyncSession, after_id: int) -> int:
+    """为 after_id 之后还没有进索引的需求建立全文索引（正常创建的需求已在创建时建好）"""
+    rows = (await db.execute(
+        select(Requirement.id, Requirement.title, Requirement.content)
+        .outerjoin(SearchDocument, (SearchDocument.source == "requirement") & (SearchDocument.source_id == Requirement.id))
+        .where(Requirement.id > after_id, SearchDocument.id.is_(None))
+        .order_by(Requirement.id)
+    )).all()
+    for rid, title, content in rows:
+        await index_entry(db, "requirement", rid, title, content)
+    await db.commit()
+    return len(rows)
+
+
+async def _write_batch(db: AsyncSession, batch: list[tuple[int, dict]], report: ImportReport, index: bool):
+    after_id = (await db.execute(select(func.max(Requirement.id)))).scalar() or 0
+    try:
+        await db.execute(insert(Requirement), [row for _, row in batch])
+        await db.commit()
+        report.inserted += len(batch)
+    except Exception as e:
+        await db.rollback()
+        print(f"⚠️ 批量写入 {len(batch)} 行失败，逐行重试：{e}")
+        for line, row in batch:
+            try:
+                await db.execute(insert(Requirement), [row])
+                await db.commit()
+                report.inserted += 1
+            except Exception as row_error:
+                await db.rollback()
+                report.error(line, f"写入失败：{getattr(row_error, 'orig', row_error)}")
+    if index:
+        report.indexed += await _index_new_rows(db, after_id)
+
+
+async def import_requirements(db: AsyncSession, chunks: AsyncIterator[bytes], fmt: str = "ndjson",
+                              creator_id: int = 1, index: bool = True) -> dict:
+    """
+    从字节流导入需求，返回导入报告
+
+    每批单独提交，中途失败时已提交的批次保留；出错的行记录行号和原因，不影响其他行。
+    index=False 时跳过全文索引，之后可运行 python -m services.search 重建
+    """
+    records = _iter_csv(chunks) if fmt == "csv" else _iter_ndjson(chunks)
+    report = ImportReport()
+    batch: list[tuple[int, dict]] = []
+    async for line, record, error in records:
+        if error is None:
+            try:
+                batch.append((line, _validate(record, creator_id)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            report.error(line, error)
+            continue
+        if len(batch) >= IMPORT_BATCH:
+            await _write_batch(db, batch, report, index)
+            batch = []
+    if batch:
+        await _write_batch(db, batch, report, index)
+    print(f"📥 导入需求完成：成功 {report.inserted} 条，失败 {report.failed} 条")
+    return report.to_dict()
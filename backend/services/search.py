@@ -0,0 +1,307 @@
+# @Function: 需求与生成文档的全文检索
+# 中文按相邻二字（bigram）切分、英文数字按单词切分，写入 search_postings 倒排表；
+# 需求/文档创建或更新时在同一事务里增量更新索引，只改动词频有变化的词项。
+# 查询按词项查倒排表，每个词项只读词频最高的若干条，BM25 打分排序，分页后只为当前页读取正文生成高亮摘要。
+import asyncio
+import html
+import math
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.document import Document
+from models.requirement import Requirement
+from models.search import SearchDocument, SearchPosting
+
+CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"  # 中日韩统一表意文字及扩展 A、兼容区
+TOKEN_PATTERN = re.compile(rf"[a-z0-9_]+|[{CJK}]+")
+MAX_TERM_LENGTH = 32
+MAX_QUERY_TERMS = 32
+THREAD_TOKENIZE_CHARS = 50_000  # 超过该长度的正文放到线程中切词
+WRITE_BATCH = 1000
+
+# BM25 参数；标题中的词频按 TITLE_WEIGHT 倍计入
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 3
+MIN_MATCH_RATIO = 0.7  # 至少命中查询词项的比例
+MAX_POSTINGS_PER_TERM = 2000  # 每个查询词项最多读取的倒排条目（按标题、正文词频从高到低）
+SNIPPET_CHARS = 120
+SNIPPET_SCAN_BYTES = 256 * 1024  # 生成文档摘要时最多解压的正文字节数
+STATS_TTL = 60  # 文档总数/平均长度、高频词项文档频率的缓存时间（秒）
+DOC_FREQ_CACHE_SIZE = 10_000
+
+
+def normalize(text: str) -> str:
+    # NFKC 把全角字母数字转成半角；不改变中文字符
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(text: str) -> list[str]:
+    """中文连续片段切成相邻二字，单个汉字保留为一字；英文数字按单词切分"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(normalize(text or "")):
+        run = match.group()
+        if run[0].isascii():
+            if len(run) >= 2 or run.isdigit():
+                tokens.append(run[:MAX_TERM_LENGTH])
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def query_terms(q: str) -> list[str]:
+    """
+    查询词项：去重并截断到 MAX_QUERY_TERMS
+
+    单个汉字只在孤立出现时才被索引，连续中文里的字只以二字词项出现，查询单字会漏掉绝大多数结果，因此不参与查询
+    """
+    terms = [term for term in tokenize(q) if len(term) >= 2 or term.isascii()]
+    return list(dict.fromkeys(terms))[:MAX_QUERY_TERMS]
+
+
+async def _atokenize(text: str) -> list[str]:
+    if len(text) > THREAD_TOKENIZE_CHARS:
+        return await asyncio.to_thread(tokenize, text)
+    return tokenize(text)
+
+
+# ---------- 增量索引 ----------
+
+async def index_entry(db: AsyncSession, source: str, source_id: int, title: str, content: str):
+    """
+    新建或更新一个对象的索引，不提交事务，由调用方与业务数据一起提交
+
+    只删除不再出现的词项、更新词频变化的词项、插入新增词项
+    """
+    title_tf = Counter(tokenize(title))
+    content_tf = Counter(await _atokenize(content))
+    new = {term: (title_tf.get(term, 0), content_tf.get(term, 0)) for term in title_tf.keys() | content_tf.keys()}
+    length = sum(title_tf.values()) + sum(content_tf.values())
+
+    entry = (await db.execute(
+        select(SearchDocument).where(SearchDocument.source == source, SearchDocument.source_id == source_id)
+    )).scalar_one_or_none()
+    if entry is None:
+        entry = SearchDocument(source=source, source_id=source_id, title=title[:255], length=length)
+        db.add(entry)
+        await db.flush()
+        old = {}
+    else:
+        entry.title = title[:255]
+        entry.length = length
+        old = {
+            term: (title_count, content_count)
+            for term, title_count, content_count in (await db.execute(
+                select(SearchPosting.term, SearchPosting.title_tf, SearchPosting.content_tf)
+                .where(SearchPosting.doc_id == entry.id)
+            )).all()
+        }
+
+    removed = [term for term in old if term not in new]
+    added = [{"term": t, "doc_id": entry.id, "title_tf": tf[0], "content_tf": tf[1]}
+             for t, tf in new.items() if t not in old]
+    changed = [{"term": t, "doc_id": entry.id, "title_tf": tf[0], "content_tf": tf[1]}
+               for t, tf in new.items() if t in old and old[t] != tf]
+
+    for i in range(0, len(removed), WRITE_BATCH):
+        await db.execute(delete(SearchPosting).where(
+            SearchPosting.doc_id == entry.id, SearchPosting.term.in_(removed[i:i + WRITE_BATCH])))
+    for i in range(0, len(added), WRITE_BATCH):
+        await db.execute(insert(SearchPosting), added[i:i + WRITE_BATCH])
+    if changed:
+        await db.execute(update(SearchPosting), changed)  # 按主键批量更新
+    print(f"🔎 已更新索引 {source}#{source_id}：新增 {len(added)}，更新 {len(changed)}，删除 {len(removed)} 个词项")
+
+
+# ---------- 查询 ----------
+
+_stats_cache: dict = {"expires": 0.0, "total": 0, "avg_length": 1.0}
+_doc_freq_cache: dict[tuple, tuple[float, int]] = {}  # (词项, 来源) -> (过期时刻, 文档频率)
+
+
+async def _corpus_stats(db: AsyncSession) -> tuple[int, float]:
+    """被索引对象总数和平均长度，短时间缓存，只读 search_documents"""
+    now = time.monotonic()
+    if now >= _stats_cache["expires"]:
+        total, avg_length = (await db.execute(
+            select(func.count(SearchDocument.id), func.avg(SearchDocument.length))
+        )).one()
+        _stats_cache.update(expires=now + STATS_TTL, total=total or 0, avg_length=float(avg_length or 1) or 1.0)
+    return _stats_cache["total"], _stats_cache["avg_length"]
+
+
+def _postings_query(columns, term: str, source: Optional[str]):
+    query = select(*columns).where(SearchPosting.term == term)
+    if source:
+        query = query.join(SearchDocument, SearchDocument.id == SearchPosting.doc_id) \
+            .where(SearchDocument.source == source)
+    return query
+
+
+async def _term_postings(db: AsyncSession, term: str, source: Optional[str]) -> list:
+    """词项的倒排条目，沿 (term, title_tf, content_tf) 索引从高到低读取，最多 MAX_POSTINGS_PER_TERM 条"""
+    query = _postings_query((SearchPosting.doc_id, SearchPosting.title_tf, SearchPosting.content_tf), term, source) \
+        .order_by(SearchPosting.title_tf.desc(), SearchPosting.content_tf.desc()) \
+        .limit(MAX_POSTINGS_PER_TERM)
+    return (await db.execute(query)).all()
+
+
+async def _term_doc_freq(db: AsyncSession, term: str, source: Optional[str]) -> int:
+    """高频词项的文档频率，只在索引上计数，短时间缓存"""
+    now = time.monotonic()
+    cached = _doc_freq_cache.get((term, source))
+    if cached is None or now >= cached[0]:
+        count = (await db.execute(_postings_query((func.count(),), term, source))).scalar_one()
+        if len(_doc_freq_cache) >= DOC_FREQ_CACHE_SIZE:
+            _doc_freq_cache.clear()
+        cached = _doc_freq_cache[(term, source)] = (now + STATS_TTL, count)
+    return cached[1]
+
+
+def highlight(text: str, terms: list[str], width: int = SNIPPET_CHARS) -> str:
+    """截取命中最集中的片段，命中部分用 <em> 包裹，其余内容做 HTML 转义"""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        lowered = text
+    marks = bytearray(len(text))
+    for term in terms:
+        start = lowered.find(term)
+        while start != -1:
+            marks[start:start + len(term)] = b"\x01" * len(term)
+            start = lowered.find(term, start + 1)
+
+    first = marks.find(1)
+    if len(text) <= width or first == -1:
+        begin = 0
+    else:
+        begin = max(0, min(first - width // 4, len(text) - width))
+    end = min(len(text), begin + width)
+
+    parts = ["…"] if begin > 0 else []
+    i = begin
+    while i < end:
+        j = i
+        while j < end and marks[j] == marks[i]:
+            j += 1
+        segment = html.escape(text[i:j])
+        parts.append(f"<em>{segment}</em>" if marks[i] else segment)
+        i = j
+    if end < len(text):
+        parts.append("…")
+    return "".join(parts).replace("\n", " ")
+
+
+async def _load_texts(db: AsyncSession, hits: list[dict]) -> dict[tuple, str]:
+    """只为当前页的结果读取正文"""
+    # 延迟导入：services.document 创建文档时会调用本模块的 index_entry
+    from services.document import get_document, iter_document_content
+
+    texts = {}
+    requirement_ids = [h["source_id"] for h in hits if h["source"] == "requirement"]
+    if requirement_ids:
+        rows = await db.execute(select(Requirement.id, Requirement.content).where(Requirement.id.in_(requirement_ids)))
+        texts.update({("requirement", rid): content for rid, content in rows.all()})
+    for hit in hits:
+        if hit["source"] != "document":
+            continue
+        doc = await get_document(db, hit["source_id"])
+        if doc is None:
+            continue
+        # 只解压开头一段用于摘要，内存占用与文档大小无关
+        chunks, size = [], 0
+        async for chunk in iter_document_content(db, doc):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= SNIPPET_SCAN_BYTES:
+                break
+        texts[("document", doc.id)] = b"".join(chunks)[:SNIPPET_SCAN_BYTES].decode("utf-8", errors="ignore")
+    return texts
+
+
+async def search(db: AsyncSession, q: str, source: Optional[str] = None,
+                 page: int = 1, size: int = 10) -> tuple[int, list[dict]]:
+    """
+    全文检索，返回 (命中总数, 当前页结果)
+
+    每个词项最多取 MAX_POSTINGS_PER_TERM 个候选，高频词项的命中总数因此是下限
+    查询词少于两个汉字（或两个字母）时抛出 ValueError
+    """
+    terms = query_terms(q)
+    if not terms:
+        raise ValueError("搜索词过短，请至少输入两个汉字或两个字母")
+
+    doc_freq: dict[str, int] = {}
+    matched: dict[int, dict[str, int]] = {}
+    for term in terms:
+        postings = await _term_postings(db, term, source)
+        # 达到上限说明是高频词项，文档频率另行统计（有缓存），未达到时读到的就是全部
+        doc_freq[term] = await _term_doc_freq(db, term, source) if len(postings) >= MAX_POSTINGS_PER_TERM \
+            else len(postings)
+        for doc_id, title_tf, content_tf in postings:
+            matched.setdefault(doc_id, {})[term] = content_tf + TITLE_WEIGHT * title_tf
+
+    min_match = max(1, math.ceil(len(terms) * MIN_MATCH_RATIO))
+    candidates = [doc_id for doc_id, tfs in matched.items() if len(tfs) >= min_match]
+    if not candidates:
+        return 0, []
+
+    entries = {}
+    for i in range(0, len(candidates), WRITE_BATCH):
+        rows = await db.execute(select(SearchDocument).where(SearchDocument.id.in_(candidates[i:i + WRITE_BATCH])))
+        entries.update({entry.id: entry for entry in rows.scalars()})
+
+    total_docs, avg_length = await _corpus_stats(db)
+    total_docs = max(total_docs, len(entries))
+    idf = {term: math.log(1 + (total_docs - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    scored = []
+    for doc_id, entry in entries.items():
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * entry.length / avg_length)
+        score = sum(idf[term] * tf * (BM25_K1 + 1) / (tf + norm) for term, tf in matched[doc_id].items())
+        scored.append((score, doc_id))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+
+    page_hits = [
+        {"source": entries[doc_id].source, "source_id": entries[doc_id].source_id,
+         "title": entries[doc_id].title, "score": round(score, 4), "updated_at": entries[doc_id].updated_at}
+        for score, doc_id in scored[(page - 1) * size:page * size]
+    ]
+    texts = await _load_texts(db, page_hits)
+    for hit in page_hits:
+        hit["title_highlight"] = highlight(hit["title"], terms, width=255)
+        hit["snippet"] = highlight(texts.get((hit["source"], hit["source_id"]), ""), terms)
+    return len(scored), page_hits
+
+
+async def rebuild_index(db: AsyncSession):
+    """为已有的需求和文档重建索引（首次上线或索引表被清空时使用）"""
+    from services.document import get_document, iter_document_content
+
+    for rid, title, content in (await db.execute(select(Requirement.id, Requirement.title, Requirement.content))).all():
+        await index_entry(db, "requirement", rid, title, content)
+        await db.commit()
+
+    for doc_id in (await db.execute(select(Document.id))).scalars().all():
+        doc = await get_document(db, doc_id)
+        content = b"".join([chunk async for chunk in iter_document_content(db, doc)]).decode("utf-8")
+        await index_entry(db, "document", doc.id, doc.title, content)
+        await db.commit()
+
+
+if __name__ == "__main__":
+    from db import AsyncSessionLocal
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await rebuild_index(db)
+        print("✅ 全文索引重建完成")
+
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+import time
+
+from services.architecture_generator import ArchitectureStreamParser, architecture_document, compose_architecture_events
+
+DDL = [
+    "CREATE TABLE users (\n  id BIGINT PRIMARY KEY,\n  name VARCHAR(64)\n);",
+    "CREATE UNIQUE INDEX idx_users_name ON users (name);",
+    "ALTER TABLE users ADD COLUMN email VARCHAR(128);",
+]
+
+
+def feed_in_deltas(text: str, size: int) -> ArchitectureStreamParser:
+    parser = ArchitectureStreamParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    parser.close()
+    return parser
+
+
+def test_ddl_split_across_deltas():
+    text = "【架构设计】\n分层架构。\n【数据库设计】\n用户表说明。\n" + "\n说明文字。\n".join(DDL) + "\n结束。"
+    for size in (1, 2, 3, 7, len(text)):
+        architecture, database_design, ddl = feed_in_deltas(text, size).result()
+        assert architecture == "分层架构。"
+        assert ddl == DDL
+        assert database_design.startswith("用户表说明。")
+
+
+def test_long_database_section_is_linear():
+    # 大量说明文字和一条迟迟没有分号的语句：每次 feed 只应扫描新增部分
+    prose = "表结构说明，字段含义与约束。" * 4000
+    body = "CREATE TABLE logs (\n" + "  col VARCHAR(32),\n" * 3000 + "  id BIGINT\n);"
+    text = "【架构设计】\n概述。\n【数据库设计】\n" + prose + body + prose + DDL[1]
+    assert len(text) > 96_000
+
+    started = time.perf_counter()
+    parser = feed_in_deltas(text, 3)
+    elapsed = time.perf_counter() - started
+
+    _, _, ddl = parser.result()
+    assert ddl == [body, DDL[1]]
+    assert len(parser._ddl_scan) <= 32
+    assert elapsed < 5
+
+
+def test_section_events_carry_headers():
+    text = "【架构设计】\n分层架构。\n【数据库设计】\n" + DDL[0]
+    events = []
+    parser = ArchitectureStreamParser()
+    for i in range(0, len(text), 4):
+        events.extend(parser.feed(text[i:i + 4]))
+    events.extend(parser.close())
+
+    # 前端只拼接 content：标题和段落分隔都要在增量文本里
+    shown = "".join(event[1] for event in events if isinstance(event, tuple))
+    assert shown.startswith("【架构设计】\n分层架构。\n")
+    assert shown.replace("\n", "") == "【架构设计】分层架构。【数据库设计】" + DDL[0].replace("\n", "")
+    assert compose_architecture_events(events) == architecture_document("分层架构。", DDL[0])
+    assert parser.result()[:2] == ("分层架构。", DDL[0])
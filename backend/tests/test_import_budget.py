@@ -0,0 +1,18 @@
+import os
+import statistics
+
+from benchmark.import_budget import LAZY_MODULES, measure
+
+# 导入 main 的耗时预算（毫秒），取多次运行的中位数比较；CI 机器较慢时可用环境变量放宽
+BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+RUNS = 3
+
+
+def test_import_main_within_budget_without_lazy_modules():
+    totals = []
+    for _ in range(RUNS):
+        total, _, loaded = measure("main", LAZY_MODULES)
+        assert not loaded, f"以下模块应按需导入，却在导入 main 时被加载：{', '.join(loaded)}"
+        totals.append(total)
+    median = statistics.median(totals)
+    assert median <= BUDGET_MS, f"导入 main 中位数 {median:.0f} ms，超出预算 {BUDGET_MS:.0f} ms"
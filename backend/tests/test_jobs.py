@@ -0,0 +1,39 @@
+import asyncio
+
+from config import JOB_SPECULATIVE_PREEMPT_LOAD
+from utils.jobs import JobQueue, PRIORITY_SPECULATIVE
+
+
+async def run_speculative(load: int) -> dict:
+    """按默认阈值运行：任务提交后交互式负载变为 load，运行期间不断有交互式请求放行，返回任务状态"""
+    current = [0]
+    queue = JobQueue(workers=1, load=lambda: current[0])
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    job = queue.submit("speculative", work, PRIORITY_SPECULATIVE)
+    await asyncio.sleep(0)  # 空闲时启动
+    current[0] = load
+    try:
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+            queue.on_interactive()
+        await asyncio.sleep(0.1)
+        return job.to_dict()
+    finally:
+        await queue.aclose()
+
+
+def test_speculative_job_finishes_under_light_interactive_load():
+    job = asyncio.run(run_speculative(load=2))
+    assert job["status"] == "succeeded"
+    assert job["result"] == "done"
+    assert job["preemptions"] == 0
+
+
+def test_speculative_job_yields_when_admission_is_saturated():
+    job = asyncio.run(run_speculative(load=JOB_SPECULATIVE_PREEMPT_LOAD))
+    assert job["status"] == "queued"  # 让出后负载仍高，等待重新启动
+    assert job["preemptions"] == 1
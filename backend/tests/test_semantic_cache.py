@@ -0,0 +1,114 @@
+import pytest
+
+from config import SEMANTIC_CACHE_THRESHOLDS
+from utils.semantic_cache import SemanticCache, normalize
+
+SCOPE = "0" * 16
+KEY = "f" * 64
+
+# 与被查找的条目作用域相同的其他历史输入，让文档频率接近实际使用
+FILLER = (
+    "订单管理模块 支付结算功能 商品搜索与推荐 库存预警模块 用户权限管理 消息通知中心 数据报表导出 日志审计功能 "
+    "优惠券发放模块 购物车功能 物流跟踪模块 评论与评分功能 会员积分体系 客服工单系统 文件上传下载 多语言切换功能 "
+    "短信验证码模块 第三方登录接入 个人资料编辑 密码找回功能 角色与菜单配置 系统参数设置 定时任务调度 接口限流模块 "
+    "退款售后流程 发票开具功能 供应商管理 采购审批流程 合同管理模块 员工考勤打卡 薪资计算功能 招聘流程管理 "
+    "知识库检索 在线问答社区 视频点播模块 直播弹幕功能 活动报名模块 问卷调查功能 地图定位服务 设备监控告警 "
+    "数据备份恢复 首页轮播配置 文章发布审核 标签分类管理 站内信模块 黑名单管理 操作日志查询 数据字典维护"
+).split()
+
+# (已缓存的输入, 新输入, 是否应当复用)
+REQUIREMENT_PAIRS = [
+    ("用户登录模块", "用户登录功能模块", True),
+    ("用户登录模块", "用户登录功能", True),
+    ("用户登录模块", "用户 登录 模块", True),
+    ("用户注册模块", "用户注册功能模块", True),
+    ("订单支付功能", "订单支付模块", True),
+    ("购物车模块", "购物车功能模块", True),
+    ("后台用户管理", "后台用户管理模块", True),
+    ("订单管理系统", "订单管理", True),
+    ("商品搜索功能", "商品搜索", True),
+    ("用户登录模块", "用户退出模块", False),
+    ("用户登录模块", "用户注册模块", False),
+    ("用户注册模块", "用户注销模块", False),
+    ("用户登录模块", "用户登录与注销模块", False),
+    ("用户登录模块", "管理员登录日志", False),
+    ("订单支付功能", "订单退款功能", False),
+    ("商品评论模块", "商品收藏模块", False),
+    ("文件上传功能", "文件下载功能", False),
+    ("购物车模块", "购物车结算模块", False),
+    ("后台用户管理", "前台用户管理", False),
+    ("商品搜索功能", "商品推荐功能", False),
+    ("订单管理系统", "订单查询", False),
+    ("订单金额>1000元需审批", "订单金额<1000元需审批", False),
+    ("折扣≥50%的商品", "折扣≤50%的商品", False),
+    ("库存+1", "库存-1", False),
+]
+
+LOGIN = ("用户登录模块：用户可以通过邮箱和密码登录系统，登录失败三次后锁定账户十分钟。支持记住登录状态七天，"
+         "登录成功后跳转到首页。管理员可以在后台解锁被锁定的账户，并查看登录日志。")
+ORDER = ("订单管理模块：用户可以查看自己的历史订单，按状态筛选订单。支持取消未支付的订单，已支付订单可以申请退款。"
+         "管理员可以在后台查看全部订单，并导出订单报表。")
+REGISTER = ("用户注册模块：用户可以通过邮箱和密码注册账户，注册后需要验证邮箱。密码长度不少于八位，注册成功后跳转到首页。"
+            "管理员可以在后台禁用违规账户，并查看注册日志。")
+
+# 需求正文中几个字的改动可能就是不同的需求（“可以退款”与“不能退款”），字面相似度无法区分，只复用写法不同的输入
+ARCHITECTURE_PAIRS = [
+    (LOGIN, LOGIN.replace("，", ",").replace("。", "."), True),
+    (LOGIN, " ".join(LOGIN), True),
+    (LOGIN, LOGIN.replace("用户登录模块：", "用户登录功能："), True),
+    (LOGIN, REGISTER, False),
+    (ORDER, LOGIN, False),
+    (LOGIN, LOGIN.replace("十分钟", "15分钟"), False),
+    (LOGIN, LOGIN.replace("邮箱和密码", "手机号和验证码"), False),
+    (LOGIN, LOGIN + "登录页需要适配移动端。", False),
+    (ORDER, ORDER.replace("已支付订单可以申请退款", "已支付订单不能退款"), False),
+    (ORDER + "订单金额>1000元时需要经理审批。", ORDER + "订单金额<1000元时需要经理审批。", False),
+    (ORDER + "订单金额>1000元时需要经理审批。", ORDER + "订单金额>=1000元时需要经理审批。", False),
+]
+
+
+def similarity(path, tag: str, cached: str, query: str, filler: bool) -> float:
+    cache = SemanticCache(path=str(path), dim=1024, capacity=256, top_k=256, thresholds={tag: -1.0}, enabled=True)
+    if filler:
+        for i, text in enumerate(FILLER):
+            cache.add(tag, SCOPE, text, f"{i + 1:064x}")
+    cache.add(tag, SCOPE, cached, KEY)
+    return dict(cache.lookup(tag, SCOPE, query)).get(KEY, 0.0)
+
+
+@pytest.mark.parametrize("filler", [False, True], ids=["single-entry", "populated"])
+@pytest.mark.parametrize("tag,pairs", [("requirement", REQUIREMENT_PAIRS), ("architecture", ARCHITECTURE_PAIRS)])
+def test_default_thresholds_separate_labelled_pairs(tmp_path, tag, pairs, filler):
+    threshold = SEMANTIC_CACHE_THRESHOLDS[tag]
+    wrong = []
+    for i, (cached, query, same) in enumerate(pairs):
+        score = similarity(tmp_path / f"{i}.bin", tag, cached, query, filler)
+        if (score >= threshold) != same:
+            wrong.append((cached[:12], query[:12], round(score, 3)))
+    assert not wrong, f"{tag} 阈值 {threshold} 下判断错误：{wrong}"
+
+
+def test_lookup_is_scoped(tmp_path):
+    cache = SemanticCache(path=str(tmp_path / "index.bin"), dim=1024, capacity=16, top_k=3,
+                          thresholds={"requirement": 0.8}, enabled=True)
+    cache.add("requirement", SCOPE, "用户登录模块", KEY)
+    assert cache.lookup("requirement", SCOPE, "用户登录功能") == [(KEY, pytest.approx(1.0))]
+    assert cache.lookup("requirement", "1" * 16, "用户登录功能") == []
+
+
+def test_normalize_keeps_operators_and_body_wording():
+    assert normalize("订单金额＞1000元") == "订单金额>1000元"
+    assert normalize("订单金额>1000元") != normalize("订单金额<1000元")
+    assert normalize("满 100 减 20%") == "满100减20%"
+    # 通用字样只从主题（标题）中去掉
+    assert normalize("用户可以登录系统") == "用户可以登录系统"
+    assert normalize("用户登录模块：用户可以登录系统") == "用户登录用户可以登录系统"
+    assert normalize("用户登录模块", title=True) == "用户登录"
+
+
+def test_operator_only_difference_does_not_match(tmp_path):
+    cache = SemanticCache(path=str(tmp_path / "index.bin"), dim=1024, capacity=16, top_k=3,
+                          thresholds={"requirement": 0.5}, enabled=True)
+    cache.add("requirement", SCOPE, "订单金额>1000元需审批", KEY)
+    assert cache.lookup("requirement", SCOPE, "订单金额 > 1000 元需审批") == [(KEY, pytest.approx(1.0))]
+    assert cache.lookup("requirement", SCOPE, "订单金额<1000元需审批") == []
@@ -0,0 +1,205 @@
+# @Function: 生成接口的准入控制
+# 全局和每个接口各有一个并发上限和有界等待队列：未满时立即放行，
+# 满了先排队等待空位，队列也满（或等待超时）时直接返回 429 并带上 Retry-After，
+# 突发流量下服务按可预期的方式降级，而不是把压力全部转给上游。
+import asyncio
+import math
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+from config import (
+    ADMISSION_MAX_ACTIVE,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_ENDPOINT_ACTIVE,
+    ADMISSION_ENDPOINT_QUEUE,
+    ADMISSION_ENDPOINT_LIMITS,
+    ADMISSION_QUEUE_TIMEOUT,
+)
+from utils.metrics import admission_active, admission_queued, admission_rejected
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, gate: str, retry_after: int):
+        super().__init__(f"{gate} 并发已满")
+        self.gate = gate
+        self.retry_after = retry_after
+
+
+class _Gate:
+    """一个并发上限 + 有界 FIFO 等待队列"""
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiters: deque = deque()
+        self.hold_time = 1.0  # 每个名额平均占用时长（秒）的滑动平均，用于估算 Retry-After
+
+    def retry_after(self) -> int:
+        """按排在前面的请求数和平均占用时长估算多久后可能有空位"""
+        estimate = self.hold_time * (len(self.waiters) + 1) / max(self.limit, 1)
+        return min(60, max(1, math.ceil(estimate)))
+
+    def _update_metrics(self):
+        admission_active.set(self.active, self.name)
+        admission_queued.set(len(self.waiters), self.name)
+
+    async def acquire(self, timeout: float):
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            self._update_metrics()
+            return
+        if len(self.waiters) >= self.max_queue:
+            admission_rejected.inc(self.name)
+            raise AdmissionRejected(self.name, self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self._update_metrics()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            admission_rejected.inc(self.name)
+            raise AdmissionRejected(self.name, self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 名额已经转交过来，请求却被取消了，归还名额
+                self.release()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            self._update_metrics()
+
+    def release(self, held: Optional[float] = None):
+        if held is not None:
+            self.hold_time = self.hold_time * 0.9 + held * 0.1
+        # 名额直接转交给队首仍在等待的请求
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_metrics()
+                return
+        self.active -= 1
+        self._update_metrics()
+
+
+class Ticket:
+    """一次准入得到的名额，release 可重复调用"""
+
+    def __init__(self, gates: list[_Gate]):
+        self.gates = gates
+        self.started = time.monotonic()
+
+    def transfer(self) -> "Ticket":
+        """把名额转交给新的 Ticket（如客户端断开后仍在后台运行的生成），原 Ticket 之后的 release 不再生效"""
+        ticket = Ticket(self.gates)
+        ticket.started = self.started
+        self.gates = []
+        return ticket
+
+    def release(self):
+        held = time.monotonic() - self.started
+        gates, self.gates = self.gates, []
+        for gate in reversed(gates):
+            gate.release(held)
+
+
+class AdmissionController:
+    def __init__(self,
+                 max_active: int = ADMISSION_MAX_ACTIVE,
+                 max_queue: int = ADMISSION_MAX_QUEUE,
+                 endpoint_active: int = ADMISSION_ENDPOINT_ACTIVE,
+                 endpoint_queue: int = ADMISSION_ENDPOINT_QUEUE,
+                 endpoint_limits: Optional[dict[str, tuple[int, int]]] = None,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.global_gate = _Gate("global", max_active, max_queue)
+        self.endpoint_active = endpoint_active
+        self.endpoint_queue = endpoint_queue
+        self.endpoint_limits = endpoint_limits if endpoint_limits is not None else ADMISSION_ENDPOINT_LIMITS
+        self.queue_timeout = queue_timeout
+        self._gates: dict[str, _Gate] = {}
+        self.on_admit: list = []  # 每次放行后调用的回调，如让出推测性后台任务
+
+    def _gate(self, endpoint: str) -> _Gate:
+        gate = self._gates.get(endpoint)
+        if gate is None:
+            limit, max_queue = self.endpoint_limits.get(endpoint, (self.endpoint_active, self.endpoint_queue))
+            gate = self._gates[endpoint] = _Gate(endpoint, limit, max_queue)
+        return gate
+
+    async def acquire(self, endpoint: str) -> Ticket:
+        """先占接口名额再占全局名额，任一被拒绝都抛出 AdmissionRejected"""
+        deadline = time.monotonic() + self.queue_timeout
+        gate = self._gate(endpoint)
+        await gate.acquire(self.queue_timeout)
+        try:
+            await self.global_gate.acquire(max(0.0, deadline - time.monotonic()))
+        except BaseException:
+            gate.release()
+            raise
+        for callback in self.on_admit:
+            callback()
+        return Ticket([gate, self.global_gate])
+
+    async def acquire_global(self) -> Ticket:
+        """只占一个全局名额，用于一个请求内的多个并发生成（如批量接口的每个条目）"""
+        await self.global_gate.acquire(self.queue_timeout)
+        for callback in self.on_admit:
+            callback()
+        return Ticket([self.global_gate])
+
+    def load(self) -> int:
+        """进行中和排队中的生成请求数"""
+        return self.global_gate.active + len(self.global_gate.waiters)
+
+    def stats(self) -> dict:
+        gates = [self.global_gate, *self._gates.values()]
+        return {g.name: {"active": g.active, "queued": len(g.waiters), "limit": g.limit} for g in gates}
+
+
+# 创建单例实例
+admission_controller = AdmissionController()
+
+# 当前请求占用的名额，可续传流在后台继续生成时接管它
+current_ticket: ContextVar[Optional[Ticket]] = ContextVar("current_ticket", default=None)
+# 当前请求是否要求可续传（请求头 X-Resumable-Stream: true 或查询参数 resumable=true）
+resumable_requested: ContextVar[bool] = ContextVar("resumable_requested", default=False)
+RESUMABLE_HEADER = "X-Resumable-Stream"
+
+
+def _wants_resumable(request: Request) -> bool:
+    value = request.headers.get(RESUMABLE_HEADER) or request.query_params.get("resumable") or ""
+    return value.lower() in ("1", "true")
+
+
+def admission(endpoint: str):
+    """
+    路由依赖：请求占用 endpoint 和全局的生成名额，响应（包括流式响应）结束后释放；
+    名额被可续传流接管时，改为后台生成结束后释放
+
+    名额已满且等待队列也满时返回 429，Retry-After 为估算的等待秒数
+    """
+    async def dependency(request: Request):
+        try:
+            ticket = await admission_controller.acquire(endpoint)
+        except AdmissionRejected as e:
+            print(f"🚦 {endpoint} 请求被拒绝：{e}")
+            raise HTTPException(
+                status_code=429,
+                detail="当前生成请求过多，请稍后重试",
+                headers={"Retry-After": str(e.retry_after)},
+            )
+        current_ticket.set(ticket)
+        resumable_requested.set(_wants_resumable(request))
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+    return dependency
@@ -0,0 +1,36 @@
+# @Function: 认证相关的路由依赖
+# 从 Authorization: Bearer 头读取访问令牌，只验签不查数据库。
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from services.auth_service import InvalidToken, Principal, decode_access_token
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> Optional[Principal]:
+    """带了令牌就校验并返回调用者，没带返回 None；令牌无效时返回 401"""
+    if credentials is None:
+        return None
+    try:
+        return decode_access_token(credentials.credentials)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+def current_user(principal: Optional[Principal] = Depends(optional_user)) -> Principal:
+    """必须登录的接口使用"""
+    if principal is None:
+        raise HTTPException(status_code=401, detail="请先登录", headers={"WWW-Authenticate": "Bearer"})
+    return principal
+
+
+def require_roles(*roles: str):
+    """限定角色的接口使用，如 Depends(require_roles("管理员", "产品经理"))"""
+    def dependency(principal: Principal = Depends(current_user)) -> Principal:
+        if principal.role not in roles:
+            raise HTTPException(status_code=403, detail="没有权限执行该操作")
+        return principal
+    return dependency
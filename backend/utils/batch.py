@@ -0,0 +1,73 @@
+# @Function: 批量生成的有界并发执行与 NDJSON 流式返回
+# 多个条目在并发上限内同时生成，按完成顺序逐行返回结果，
+# 整体耗时接近最慢的单个条目，而不是所有条目之和。
+# 每个进行中的条目另占一个全局准入名额，批量请求不能绕过全局并发上限。
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+
+from config import BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY
+from utils.admission import AdmissionRejected, admission_controller
+from utils.sse import DisconnectAwareResponse
+
+
+def resolve_concurrency(requested: Optional[int]) -> int:
+    """请求中的并发数限制在 [1, BATCH_MAX_CONCURRENCY] 之间"""
+    if not requested:
+        return BATCH_CONCURRENCY
+    return max(1, min(requested, BATCH_MAX_CONCURRENCY))
+
+
+async def run_batch(items: list[tuple[Any, str]],
+                    worker: Callable[[str], Awaitable[str]],
+                    result_field: str,
+                    concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[str]:
+    """
+    并发执行批量生成，按完成顺序产出 NDJSON 行
+
+    items 为 (条目 id, 输入文本) 列表；每行包含 id、index 以及 result_field 或 error，
+    最后一行为汇总 {"done": true, "total": ..., "failed": ...}
+    每个条目生成期间占用一个全局准入名额，等待超时的条目以 error 返回
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int, item_id: Any, text: str) -> dict:
+        async with semaphore:
+            try:
+                ticket = await admission_controller.acquire_global()
+            except AdmissionRejected:
+                print(f"🚦 批量生成第 {index} 项未获得名额")
+                return {"id": item_id, "index": index, "error": "当前生成请求过多，请稍后重试"}
+            try:
+                return {"id": item_id, "index": index, result_field: await worker(text)}
+            except Exception as e:
+                print(f"❌ 批量生成第 {index} 项失败：", e)
+                return {"id": item_id, "index": index, "error": str(e)}
+            finally:
+                ticket.release()
+
+    tasks = [asyncio.create_task(run_one(i, item_id, text)) for i, (item_id, text) in enumerate(items)]
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            if "error" in line:
+                failed += 1
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True, "total": len(items), "failed": failed}) + "\n"
+    finally:
+        # 客户端断开时取消尚未完成的条目
+        for task in tasks:
+            task.cancel()
+
+
+def batch_response(items: list[tuple[Any, str]],
+                   worker: Callable[[str], Awaitable[str]],
+                   result_field: str,
+                   concurrency: Optional[int] = None) -> DisconnectAwareResponse:
+    return DisconnectAwareResponse(
+        run_batch(items, worker, result_field, resolve_concurrency(concurrency)),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+    )
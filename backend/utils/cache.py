@@ -0,0 +1,201 @@
+# @Function: 生成结果的内容寻址两级缓存
+# 键为 (模型, 系统提示词, 用户提示词, 参数) 的 SHA-256，
+# 第一级为带 TTL、按条目数和字节数淘汰的内存 LRU，第二级为 SQLite 磁盘缓存。
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import (
+    CACHE_ENABLED,
+    CACHE_DB_PATH,
+    CACHE_TTL,
+    CACHE_MAX_ENTRIES,
+    CACHE_MAX_BYTES,
+    CACHE_DISK_MAX_ENTRIES,
+)
+
+
+def make_cache_key(model: str, system_prompt: Optional[str], prompt: str, params: Optional[dict] = None) -> str:
+    """根据生成请求的全部输入计算缓存键"""
+    payload = json.dumps(
+        [model, system_prompt or "", prompt, params or {}],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """内存 LRU + SQLite 两级缓存"""
+
+    def __init__(self,
+                 db_path: Optional[str] = CACHE_DB_PATH,
+                 ttl: int = CACHE_TTL,
+                 max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES,
+                 disk_max_entries: int = CACHE_DISK_MAX_ENTRIES,
+                 enabled: bool = CACHE_ENABLED):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_max_entries = disk_max_entries
+
+        self._memory: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes_since_trim = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db_path = db_path if enabled else None  # 磁盘层在第一次读写时才打开，导入时不产生文件句柄
+
+    # ---------- 内存层 ----------
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        item = self._memory.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at < time.time():
+            self._memory_pop(key)
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_put(self, key: str, value: str, expires_at: float):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._memory:
+            self._memory_pop(key)
+        self._memory[key] = (value, expires_at)
+        self._memory_bytes += size
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            oldest = next(iter(self._memory))
+            self._memory_pop(oldest)
+
+    def _memory_pop(self, key: str):
+        value, _ = self._memory.pop(key)
+        self._memory_bytes -= len(value.encode("utf-8"))
+
+    # ---------- 磁盘层 ----------
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and self.db_path:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS generation_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_generation_cache_expires ON generation_cache (expires_at)")
+            self._db.execute("DELETE FROM generation_cache WHERE expires_at < ?", (time.time(),))
+        return self._db
+
+    def _disk_get(self, key: str) -> Optional[tuple[str, float]]:
+        if self._disk() is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, expires_at FROM generation_cache WHERE key = ? AND expires_at >= ?",
+            (key, time.time()),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _disk_put(self, key: str, value: str, expires_at: float):
+        if self._disk() is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO generation_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at),
+        )
+        self._writes_since_trim += 1
+        if self._writes_since_trim >= 1000:
+            self._writes_since_trim = 0
+            self._disk_trim()
+
+    def _disk_trim(self):
+        """清理过期条目，并在超出容量时删除最早过期的条目"""
+        self._db.execute("DELETE FROM generation_cache WHERE expires_at < ?", (time.time(),))
+        count = self._db.execute("SELECT COUNT(*) FROM generation_cache").fetchone()[0]
+        if count > self.disk_max_entries:
+            self._db.execute(
+                "DELETE FROM generation_cache WHERE key IN ("
+                "SELECT key FROM generation_cache ORDER BY expires_at LIMIT ?)",
+                (count - self.disk_max_entries,),
+            )
+
+    # ---------- 对外接口 ----------
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._memory_get(key)
+            if value is not None:
+                self.memory_hits += 1
+                return value
+            item = self._disk_get(key)
+            if item is not None:
+                self.disk_hits += 1
+                self._memory_put(key, item[0], item[1])  # 提升到内存层
+                return item[0]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        if not self.enabled or not value:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._memory_put(key, value, expires_at)
+            self._disk_put(key, value, expires_at)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """异步读取：内存命中直接返回，否则在线程池中查磁盘层"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._memory_get(key)
+            if value is not None:
+                self.memory_hits += 1
+                return value
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str):
+        await asyncio.to_thread(self.set, key, value)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+        }
+
+
+async def replay_stream(text: str, chunk_size: int = 32):
+    """把缓存命中的完整结果按块回放成流，供 stream=True 的接口使用"""
+    for i in range(0, len(text), chunk_size):
+        yield text[i:i + chunk_size]
+        await asyncio.sleep(0)  # 让出事件循环
+
+
+# 创建单例实例
+generation_cache = GenerationCache()
@@ -0,0 +1,267 @@
+# @Function: 进程内的后台任务队列
+# 固定数量的 worker 按优先级（数值越小越先执行）、同优先级先进先出地执行任务；
+# 推测性任务（PRIORITY_SPECULATIVE）只在交互式生成负载低于 JOB_SPECULATIVE_MAX_LOAD 时启动，负载高时暂缓启动；
+# 已在运行的推测性任务继续执行，只有负载达到 JOB_SPECULATIVE_PREEMPT_LOAD（准入已满）时才取消并重新排队，让出上游的并发和额度。
+import asyncio
+import heapq
+import itertools
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from config import JOB_WORKERS, JOB_MAX_QUEUE, JOB_HISTORY, JOB_SPECULATIVE_MAX_LOAD, JOB_SPECULATIVE_PREEMPT_LOAD
+from utils.admission import admission_controller
+from utils.metrics import jobs_finished, jobs_preempted, jobs_queued
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_SPECULATIVE = 9
+SPECULATIVE_RECHECK = 0.5  # 推测性任务因负载暂缓时，多久重新检查一次（秒）
+MAX_RESULT_BYTES = 16 * 1024  # 超过该大小的结果不保存在任务记录中
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, name: str, factory: Callable[[], Awaitable[Any]], priority: int, key: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.factory = factory  # 每次执行调用一次，被让出后重新执行时会再次调用
+        self.priority = priority
+        self.key = key
+        self.status = "queued"  # queued / running / succeeded / failed / cancelled
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.preemptions = 0
+        self.task: Optional[asyncio.Task] = None
+        self._preempted = False
+
+    @property
+    def speculative(self) -> bool:
+        return self.priority >= PRIORITY_SPECULATIVE
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "priority": self.priority,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "preemptions": self.preemptions,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    def __init__(self,
+                 workers: int = JOB_WORKERS,
+                 max_queue: int = JOB_MAX_QUEUE,
+                 history: int = JOB_HISTORY,
+                 speculative_max_load: int = JOB_SPECULATIVE_MAX_LOAD,
+                 speculative_preempt_load: int = JOB_SPECULATIVE_PREEMPT_LOAD,
+                 load: Callable[[], int] = admission_controller.load):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.history = history
+        self.speculative_max_load = speculative_max_load
+        self.speculative_preempt_load = max(speculative_preempt_load, speculative_max_load)
+        self.load = load  # 当前交互式生成负载
+        self._heap: list[tuple[int, int, Job]] = []
+        self._seq = itertools.count()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._keys: dict[str, Job] = {}  # 排队或运行中的任务，按去重键索引
+        self._running: set[Job] = set()
+        self._queued = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker_tasks: list[asyncio.Task] = []
+
+    # ---------- 提交与调度 ----------
+
+    def submit(self, name: str, factory: Callable[[], Awaitable[Any]],
+               priority: int = PRIORITY_NORMAL, key: Optional[str] = None) -> Job:
+        """
+        提交任务，factory 为无参的协程函数
+
+        key 相同的任务还在排队或运行时直接返回已有任务；队列已满时抛出 JobQueueFull
+        """
+        if key is not None and key in self._keys:
+            return self._keys[key]
+        if self._queued >= self.max_queue:
+            raise JobQueueFull(f"后台任务队列已满（{self.max_queue}）")
+        job = Job(name, factory, priority, key)
+        self._jobs[job.id] = job
+        if key is not None:
+            self._keys[key] = job
+        self._push(job)
+        self._trim_history()
+        self._ensure_workers()
+        return job
+
+    def _push(self, job: Job):
+        job.status = "queued"
+        heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+        self._queued += 1
+        jobs_queued.set(self._queued)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _trim_history(self):
+        while len(self._jobs) > self.history:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in ("queued", "running"):
+                break  # 未结束的任务不清理
+            del self._jobs[oldest_id]
+
+    def _ensure_workers(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._worker_tasks = [t for t in self._worker_tasks if not t.done()]
+        while len(self._worker_tasks) < self.workers:
+            self._worker_tasks.append(asyncio.create_task(self._worker()))
+
+    def _overloaded(self) -> bool:
+        """负载过高，推测性任务暂不启动"""
+        return self.load() >= self.speculative_max_load
+
+    def _saturated(self) -> bool:
+        """负载达到让出阈值，运行中的推测性任务需要让出"""
+        return self.load() >= self.speculative_preempt_load
+
+    def _next(self) -> Optional[Job]:
+        """取出下一个可执行的任务；队首是推测性任务且负载过高时返回 None"""
+        while self._heap:
+            job = self._heap[0][2]
+            if job.status != "queued":  # 排队期间被取消
+                heapq.heappop(self._heap)
+                continue
+            if job.speculative and self._overloaded():
+                return None
+            heapq.heappop(self._heap)
+            self._queued -= 1
+            jobs_queued.set(self._queued)
+            return job
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._next()
+            if job is None:
+                self._wakeup.clear()
+                # 只有推测性任务在等负载下降时才需要定时重查
+                timeout = SPECULATIVE_RECHECK if self._heap else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        job._preempted = False
+        self._running.add(job)
+        job.task = asyncio.ensure_future(job.factory())
+        try:
+            # 用 wait 而不是直接 await：worker 被取消（应用关闭）时单独处理任务
+            await asyncio.wait({job.task})
+        except asyncio.CancelledError:
+            job.task.cancel()
+            raise
+        finally:
+            self._running.discard(job)
+
+        if job.task.cancelled():
+            if job._preempted:
+                job.preemptions += 1
+                jobs_preempted.inc(job.name)
+                print(f"⏸️ 推测性任务 {job.name} 让出给交互式请求，重新排队")
+                self._push(job)
+                return
+            self._finish(job, "cancelled")
+        elif job.task.exception() is not None:
+            job.error = str(job.task.exception())
+            print(f"❌ 后台任务 {job.name} 失败：{job.error}")
+            self._finish(job, "failed")
+        else:
+            result = job.task.result()
+            try:
+                if len(json.dumps(result, ensure_ascii=False, default=str)) <= MAX_RESULT_BYTES:
+                    job.result = result
+            except (TypeError, ValueError):
+                pass
+            self._finish(job, "succeeded")
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        job.factory = None
+        if job.key is not None and self._keys.get(job.key) is job:
+            del self._keys[job.key]
+        jobs_finished.inc(job.name, status)
+
+    # ---------- 让出、取消与查询 ----------
+
+    def on_interactive(self):
+        """交互式请求放行后调用：负载达到让出阈值时取消运行中的推测性任务，稍后重新执行"""
+        if not self._saturated():
+            return
+        for job in list(self._running):
+            if job.speculative and not job._preempted:
+                job._preempted = True
+                job.task.cancel()
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status == "queued":
+            self._queued -= 1
+            jobs_queued.set(self._queued)
+            self._finish(job, "cancelled")  # 堆中的条目在取出时跳过
+        elif job.status == "running":
+            job._preempted = False
+            job.task.cancel()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> list[Job]:
+        jobs = [job for job in reversed(self._jobs.values()) if status is None or job.status == status]
+        return jobs[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queued,
+            "running": len(self._running),
+            "interactive_load": self.load(),
+            "speculative_paused": self._overloaded(),
+            "speculative_preempting": self._saturated(),
+        }
+
+    async def aclose(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        for task in self._worker_tasks:
+            try:
+                await task
+            except BaseException:
+                pass
+        self._worker_tasks = []
+
+
+# 创建单例实例
+job_queue = JobQueue()
+admission_controller.on_admit.append(job_queue.on_interactive)
@@ -0,0 +1,255 @@
+# @Function: 进程内指标采集，以 Prometheus 文本格式导出
+# 采集路径不加锁：事件循环单线程执行，每个标签组合的计数桶创建后只做整数自增，
+# 导出时再汇总格式化，热路径只有一次 bisect 和几次加法。
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+
+# 耗时类指标的默认分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# 生成速度分桶（tokens/秒）
+RATE_BUCKETS = (1, 5, 10, 20, 30, 50, 75, 100, 150, 250, 500)
+# token 数分桶
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+# 当前请求所属的路由，供数据库查询耗时打标签
+metrics_scope: ContextVar[str] = ContextVar("metrics_scope", default="other")
+
+
+def _escape(value) -> str:
+    """按 Prometheus 文本格式转义标签值：反斜杠、双引号、换行"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+
+    def _child(self, labels: tuple):
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children.setdefault(labels, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return [0.0]
+
+    def inc(self, *labels, amount: float = 1):
+        self._child(labels)[0] += amount
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(child[0])}"
+                for labels, child in list(self._children.items())]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, *labels):
+        self._child(labels)[0] = value
+
+    def dec(self, *labels, amount: float = 1):
+        self._child(labels)[0] -= amount
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        # 各桶的非累计计数（最后一个为 +Inf），以及 sum
+        return [[0] * (len(self.buckets) + 1), 0.0]
+
+    def observe(self, value: float, *labels):
+        child = self._child(labels)
+        child[0][bisect_left(self.buckets, value)] += 1
+        child[1] += value
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for labels, (counts, total) in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), list(counts)):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+# ---------- 大模型生成 ----------
+
+LLM_LABELS = ("endpoint", "role")
+
+llm_ttft = registry.register(Histogram(
+    "llm_time_to_first_token_seconds", "从发起生成到产出第一个增量的耗时", LLM_LABELS))
+llm_generation_seconds = registry.register(Histogram(
+    "llm_generation_seconds", "一次生成的总耗时", LLM_LABELS))
+llm_tokens_per_second = registry.register(Histogram(
+    "llm_output_tokens_per_second", "上游生成速度（首个增量之后的输出 token/秒）", LLM_LABELS, RATE_BUCKETS))
+llm_prompt_tokens = registry.register(Histogram(
+    "llm_prompt_tokens", "单次上游调用的 prompt token 数", LLM_LABELS, TOKEN_BUCKETS))
+llm_completion_tokens = registry.register(Histogram(
+    "llm_completion_tokens", "单次上游调用的输出 token 数", LLM_LABELS, TOKEN_BUCKETS))
+llm_upstream_seconds = registry.register(Histogram(
+    "llm_upstream_request_seconds", "上游请求耗时（流式为响应完整结束）", LLM_LABELS + ("kind",)))
+llm_streams_in_flight = registry.register(Gauge(
+    "llm_streams_in_flight", "进行中的流式生成数", LLM_LABELS))
+llm_errors = registry.register(Counter(
+    "llm_errors_total", "生成失败次数", LLM_LABELS))
+llm_provider_ttft = registry.register(Histogram(
+    "llm_provider_first_token_seconds", "各上游的首字耗时（非流式为完整响应耗时）", ("provider",)))
+llm_provider_requests = registry.register(Counter(
+    "llm_provider_requests_total", "各上游的请求数，outcome 为 ok/error/cancelled", ("provider", "outcome")))
+llm_hedges = registry.register(Counter(
+    "llm_hedged_requests_total", "发出的对冲请求数，winner 为最终采用的结果来自 primary 还是 hedge", ("endpoint", "winner")))
+
+semantic_cache_lookups = registry.register(Counter(
+    "semantic_cache_lookups_total", "语义近似缓存查找次数，result 为 hit/miss", ("endpoint", "result")))
+
+# ---------- 准入控制与断开 ----------
+
+admission_active = registry.register(Gauge(
+    "admission_active", "占用中的生成名额", ("gate",)))
+admission_queued = registry.register(Gauge(
+    "admission_queued", "排队等待名额的请求数", ("gate",)))
+admission_rejected = registry.register(Counter(
+    "admission_rejected_total", "因名额和队列已满被拒绝（429）的请求数", ("gate",)))
+client_disconnects = registry.register(Counter(
+    "stream_client_disconnects_total", "流式响应中途客户端断开的次数"))
+stream_resumes = registry.register(Counter(
+    "stream_resumes_total", "凭 Last-Event-ID 重新连接的次数", ("replay",)))
+streams_finished = registry.register(Counter(
+    "streams_finished_total", "结束的可续传流，status 为 succeeded/failed/cancelled/abandoned", ("status",)))
+stream_buffer_bytes = registry.register(Gauge(
+    "stream_buffer_bytes", "可续传流的事件缓冲和结果占用的内存（字节）"))
+
+# ---------- 后台任务 ----------
+
+jobs_finished = registry.register(Counter(
+    "jobs_finished_total", "结束的后台任务数，status 为 succeeded/failed/cancelled", ("name", "status")))
+jobs_preempted = registry.register(Counter(
+    "jobs_preempted_total", "因交互式请求增多而让出并重新排队的推测性任务数", ("name",)))
+jobs_queued = registry.register(Gauge(
+    "jobs_queued", "排队中的后台任务数"))
+
+# ---------- 数据库 ----------
+
+document_writes = registry.register(Counter(
+    "document_writes_total", "生成结果自动存档的条数，outcome 为 ok/error", ("outcome",)))
+document_write_batch = registry.register(Histogram(
+    "document_write_batch_size", "每次提交写入的文档条数", (), (1, 2, 5, 10, 20, 50, 100, 200)))
+
+db_query_seconds = registry.register(Histogram(
+    "db_query_seconds", "数据库语句执行耗时", ("router", "operation")))
+
+
+# 已知的 endpoint 和 role，由提示词模板注册表登记；其他取值记为 other，标签组合数有上限
+_llm_endpoints: set[str] = {"default"}
+_llm_roles: set[str] = {"", "other"}
+
+
+def register_llm_tags(names: Iterable[str]):
+    """登记提示词模板名，模板名拆出的 endpoint 和 role 才会原样作为标签"""
+    for name in names:
+        endpoint, _, role = name.partition(".")
+        _llm_endpoints.add(endpoint)
+        _llm_roles.add(role)
+
+
+def tag_endpoint(tag: Optional[str]) -> str:
+    """提示词模板名中的 endpoint，不做登记检查，供按接口取配置（路由策略、语义缓存阈值）使用"""
+    return tag.partition(".")[0] if tag else "default"
+
+
+def llm_labels(tag: Optional[str]) -> tuple[str, str]:
+    """
+    提示词模板名拆成 (endpoint, role)，如 meeting_room.architect -> ("meeting_room", "architect")
+
+    未登记的 endpoint 或 role 记为 other，只用作指标标签
+    """
+    if not tag:
+        return "default", ""
+    endpoint, _, role = tag.partition(".")
+    return (endpoint if endpoint in _llm_endpoints else "other",
+            role if role in _llm_roles else "other")
+
+
+def scoped(router: str):
+    """路由级依赖：把当前请求的数据库查询耗时归到 router 下"""
+    async def set_scope():
+        metrics_scope.set(router)
+    return set_scope
+
+
+def instrument_engine(sync_engine):
+    """在引擎上挂载语句计时事件，异步引擎传入 async_engine.sync_engine"""
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else "OTHER"
+        db_query_seconds.observe(elapsed, metrics_scope.get(), operation)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+        if starts:
+            starts.pop()
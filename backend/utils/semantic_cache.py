@@ -0,0 +1,268 @@
+# @Function: 语义近似缓存
+# 精确缓存按完整输入的哈希命中，“用户登录模块”和“用户登录功能模块”这样的近似输入会错过。
+# 这里把输入文本规范化（去掉标点、空白，主题中的“模块/功能/系统”等通用字样）后向量化
+# （字符 1~3-gram 哈希到固定维数，TF-IDF 加权，纯 NumPy、只用 CPU），
+# 与以前的输入做余弦相似度 top-k 查找，超过接口阈值时复用对应的精确缓存条目。
+# 向量索引保存在定长的内存映射文件中，多个 worker 进程共享同一份页缓存，不各自加载副本；
+# 追加条目时持有文件写锁、查找时持有共享锁，写满后覆盖最早的条目。结果本身仍在生成结果缓存中，过期后语义命中也随之失效。
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from typing import Optional
+
+from config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_PATH,
+    SEMANTIC_CACHE_DIM,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_TOP_K,
+    SEMANTIC_CACHE_THRESHOLDS,
+)
+from utils.metrics import llm_labels, tag_endpoint, semantic_cache_lookups
+
+try:
+    import fcntl  # 跨进程文件锁；不支持的平台上只在进程内加锁
+except ImportError:
+    fcntl = None
+
+NGRAM_SIZES = (1, 2, 3)  # 三元组让只差一两个字的不同功能（如“前台/后台”“可以/不能”）拉开距离
+# 主题（标题）里常见的通用字样，不区分功能，去掉后“用户登录模块”与“用户登录功能”视为相同；
+# 正文中的同样字样可能有实际含义（“用户可以登录系统”），不去掉
+GENERIC_WORDS = re.compile("功能模块|子系统|功能|模块|系统")
+# 输入整段就是主题的接口；其他接口只把正文开头 TITLE_MAX_CHARS 个字符内第一个冒号之前的部分当作标题
+TITLE_ENDPOINTS = ("requirement",)
+TITLE_MAX_CHARS = 32
+# 标点中表示数量或运算的字符保留（符号类的 < > = + ¥ 等本来就保留）
+KEPT_PUNCTUATION = set("%‰‱#*/-")
+# 数字和运算、比较符号组成输入的“数值签名”，并入作用域：“金额>1000”与“金额<1000”只差一个字符，
+# 字面相似度很高，但签名不同，不会互相命中
+NUMERIC_MARKS = set("%‰‱")
+HEADER_SLOTS = 8  # 文件头：魔数、版本、维数、容量、已写入条目数（int64）
+MAGIC = 0x53454D43  # "SEMC"
+VERSION = 3  # 向量化方式变化时递增，旧索引自动重建
+KEY_BYTES = 32  # 精确缓存键（SHA-256）
+
+
+def _strip_punctuation(text: str) -> str:
+    return "".join(ch for ch in text if ch in KEPT_PUNCTUATION or not unicodedata.category(ch).startswith("P"))
+
+
+def normalize(text: str, title: bool = False) -> str:
+    """
+    全角转半角、小写，去掉空白和标点，避免写法差异影响相似度；运算和比较符号保留
+
+    title=True 时整段是主题，去掉其中的通用字样；否则只处理开头冒号之前的标题部分，正文保持原样
+    """
+    text = "".join(ch for ch in unicodedata.normalize("NFKC", text).lower() if not ch.isspace())
+    if title:
+        head, body = text, ""
+    else:
+        colon = text.find(":", 0, TITLE_MAX_CHARS + 1)
+        head, body = (text[:colon], text[colon + 1:]) if colon >= 0 else ("", text)
+    return GENERIC_WORDS.sub("", _strip_punctuation(head)) + _strip_punctuation(body)
+
+
+def numeric_signature(text: str) -> str:
+    """按出现顺序取出数字和运算、比较符号"""
+    return "".join(ch for ch in unicodedata.normalize("NFKC", text)
+                   if ch.isdigit() or ch in NUMERIC_MARKS or unicodedata.category(ch) == "Sm")
+
+
+class SemanticCache:
+    """
+    文件布局（顺序存放）：
+    header int64[8] | vectors float32[容量, 维数] | df int32[维数] | scopes uint64[容量] | keys uint8[容量, 32]
+
+    vectors 保存未归一化的次线性词频，IDF 在查询时按当前文档频率 df 计算，索引增长后旧条目的权重也随之更新
+    """
+
+    def __init__(self,
+                 path: str = SEMANTIC_CACHE_PATH,
+                 dim: int = SEMANTIC_CACHE_DIM,
+                 capacity: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 top_k: int = SEMANTIC_CACHE_TOP_K,
+                 thresholds: Optional[dict[str, float]] = None,
+                 enabled: bool = SEMANTIC_CACHE_ENABLED):
+        self.path = path
+        self.dim = dim
+        self.capacity = capacity
+        self.top_k = top_k
+        self.thresholds = thresholds if thresholds is not None else SEMANTIC_CACHE_THRESHOLDS
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._file = None  # 内存映射和文件锁用的文件句柄，第一次使用时打开
+        self.hits = 0
+        self.misses = 0
+
+    def threshold_for(self, tag: Optional[str]) -> Optional[float]:
+        """接口的相似度阈值；未启用或该接口未配置时返回 None"""
+        if not self.enabled:
+            return None
+        return self.thresholds.get(tag_endpoint(tag))
+
+    # ---------- 向量化 ----------
+
+    def vectorize(self, text: str, title: bool = False):
+        """字符 n-gram 哈希到 dim 维，返回次线性词频 1 + log(tf)；title 见 normalize"""
+        import numpy as np
+
+        text = normalize(text, title)
+        features = [zlib.crc32(f"{n}:{text[i:i + n]}".encode("utf-8")) % self.dim
+                    for n in NGRAM_SIZES for i in range(len(text) - n + 1)]
+        counts = np.bincount(np.asarray(features, dtype=np.int64), minlength=self.dim).astype(np.float32)
+        nonzero = counts > 0
+        counts[nonzero] = 1 + np.log(counts[nonzero])
+        return counts
+
+    # ---------- 内存映射文件 ----------
+
+    def _open(self):
+        import numpy as np
+
+        vectors_bytes = self.capacity * self.dim * 4
+        size = HEADER_SLOTS * 8 + vectors_bytes + self.dim * 4 + self.capacity * 8 + self.capacity * KEY_BYTES
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a+b")
+        with self._file_lock():
+            header = np.fromfile(self.path, dtype=np.int64, count=HEADER_SLOTS) if os.path.getsize(self.path) else None
+            expected = [MAGIC, VERSION, self.dim, self.capacity]
+            if header is None or len(header) < 4 or list(header[:4]) != expected:
+                if header is not None:
+                    print("⚠️ 语义缓存索引的版本、维数或容量与当前配置不一致，重建索引")
+                self._file.truncate(0)
+                self._file.truncate(size)
+                np.memmap(self._file, dtype=np.int64, mode="r+", shape=(HEADER_SLOTS,))[:4] = expected
+        offset = 0
+
+        def view(dtype, shape):
+            nonlocal offset
+            array = np.memmap(self._file, dtype=dtype, mode="r+", offset=offset, shape=shape)
+            offset += array.nbytes
+            return array
+
+        self._header = view(np.int64, (HEADER_SLOTS,))
+        self._vectors = view(np.float32, (self.capacity, self.dim))
+        self._df = view(np.int32, (self.dim,))
+        self._scopes = view(np.uint64, (self.capacity,))
+        self._keys = view(np.uint8, (self.capacity, KEY_BYTES))
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """跨进程的文件锁（写入时独占，查找时共享），与进程内的 _lock 配合使用"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _ensure_open(self):
+        if self._file is None:
+            self._open()
+
+    @staticmethod
+    def _scope_id(scope: str, text: str) -> int:
+        """
+        作用域（模型、系统提示词、模板等）取 64 位，只在相同作用域内比较相似度
+
+        输入的数值签名也并入作用域，数字或运算符号不同的输入不比较
+        """
+        scope_id = int(scope[:16], 16)
+        signature = numeric_signature(text)
+        if signature:
+            scope_id ^= int.from_bytes(hashlib.blake2b(signature.encode("utf-8"), digest_size=8).digest(), "big")
+        return scope_id
+
+    # ---------- 查找与写入 ----------
+
+    def lookup(self, tag: Optional[str], scope: str, text: str) -> list[tuple[str, float]]:
+        """返回相似度不低于接口阈值的 (精确缓存键, 相似度)，按相似度降序，最多 top_k 个"""
+        import numpy as np
+
+        threshold = self.threshold_for(tag)
+        if threshold is None:
+            return []
+        endpoint = llm_labels(tag)[0]
+        query = self.vectorize(text, tag_endpoint(tag) in TITLE_ENDPOINTS)
+        with self._lock:
+            self._ensure_open()
+            # 共享锁：写满后其他进程会覆盖最早的条目，不加锁可能读到旧的键配新的向量
+            with self._file_lock(shared=True):
+                n = min(int(self._header[4]), self.capacity)
+                in_scope = self._scopes[:n] == np.uint64(self._scope_id(scope, text))
+                if not in_scope.any():
+                    candidates = []
+                else:
+                    # 平滑 IDF 的平方作为权重：cos(q·idf, v·idf) = v·(q·w) / (‖v·idf‖‖q·idf‖)，w = idf²
+                    # 直接在映射的数组上做矩阵向量乘，不复制索引
+                    idf = np.log((1 + n) / (1 + self._df.astype(np.float32))) + 1
+                    weights = idf * idf
+                    vectors = self._vectors[:n]
+                    norms = np.sqrt(np.einsum("ij,ij,j->i", vectors, vectors, weights)) \
+                        * np.sqrt((query * query) @ weights)
+                    scores = (vectors @ (query * weights)) / np.maximum(norms, 1e-12)
+                    scores[~in_scope] = -1.0
+                    k = min(self.top_k, n)
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    top = top[np.argsort(-scores[top])]
+                    candidates = [(bytes(self._keys[i]).hex(), float(scores[i]))
+                                  for i in top if scores[i] >= threshold]
+        if candidates:
+            self.hits += 1
+        else:
+            self.misses += 1
+        semantic_cache_lookups.inc(endpoint, "hit" if candidates else "miss")
+        return candidates
+
+    def add(self, tag: Optional[str], scope: str, text: str, key: str):
+        """记录输入文本与其精确缓存键"""
+        if self.threshold_for(tag) is None:
+            return
+        import numpy as np
+
+        vector = self.vectorize(text, tag_endpoint(tag) in TITLE_ENDPOINTS)
+        with self._lock:
+            self._ensure_open()
+            with self._file_lock():
+                count = int(self._header[4])
+                slot = count % self.capacity
+                if count >= self.capacity:
+                    self._df -= (self._vectors[slot] > 0)  # 覆盖最早的条目，先扣除它的文档频率
+                self._vectors[slot] = vector
+                self._df += (vector > 0)
+                self._scopes[slot] = self._scope_id(scope, text)
+                self._keys[slot] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+                # 条目写完再增加计数，其他进程读到的计数范围内都是完整条目
+                self._header[4] = count + 1
+
+    async def alookup(self, tag: Optional[str], scope: str, text: str) -> list[tuple[str, float]]:
+        if self.threshold_for(tag) is None:
+            return []
+        return await asyncio.to_thread(self.lookup, tag, scope, text)
+
+    async def aadd(self, tag: Optional[str], scope: str, text: str, key: str):
+        if self.threshold_for(tag) is None:
+            return
+        await asyncio.to_thread(self.add, tag, scope, text, key)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "thresholds": self.thresholds if self.enabled else {},
+            "entries": min(int(self._header[4]), self.capacity) if self._file is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# 创建单例实例
+semantic_cache = SemanticCache()
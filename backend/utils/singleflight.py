@@ -0,0 +1,112 @@
+# @Function: 相同生成请求的单飞（single-flight）合并
+# 同一时刻相同输入的生成只向上游发起一次：第一个请求创建上游流，
+# 后续相同请求作为订阅者挂上去，先收到已生成的前缀，再接收实时增量。
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+
+class _Flight:
+    """一次进行中的上游生成，缓存已产出的增量供多个订阅者读取"""
+
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self.waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def publish(self):
+        """唤醒所有等待新数据的订阅者"""
+        waiter, self.waiter = self.waiter, asyncio.get_running_loop().create_future()
+        waiter.set_result(None)
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+        self._calls: dict[str, list] = {}  # key -> [上游任务, 等待者数]
+        self.started = 0
+        self.coalesced = 0
+
+    async def _run(self, key: str, flight: _Flight, source: AsyncIterator[str]):
+        try:
+            async for chunk in source:
+                flight.chunks.append(chunk)
+                flight.publish()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.publish()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """订阅 key 对应的上游流，不存在时用 factory 创建"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            # 上游在独立任务中运行，发起者断开不会影响其他订阅者
+            flight.task = asyncio.create_task(self._run(key, flight, factory()))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.waiter
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # 所有订阅者都已离开，取消上游生成
+                flight.task.cancel()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    async def call(self, key: str, factory: Callable[[], Awaitable[str]]) -> str:
+        """
+        非流式调用的合并：相同 key 的并发调用共享同一个结果
+
+        上游在独立任务中运行，发起者被取消不影响其他等待者；所有等待者都离开后才取消上游
+        """
+        entry = self._calls.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            entry = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._calls.pop(key) if self._calls.get(key) is entry else None)
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+                if self._calls.get(key) is entry:
+                    del self._calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights) + len(self._calls),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+
+# 创建单例实例
+single_flight = SingleFlight()
@@ -0,0 +1,243 @@
+# @Function: SSE 流式输出编码器
+# 将服务层产出的增量文本按大小/时间阈值合并成帧，附带事件 id，
+# 空闲时发送心跳注释，避免逐 token 写出和固定延迟。
+# 客户端断开时立即取消流，连带取消上游生成，不再继续消耗 token 和连接。
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Union
+
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from config import SSE_MAX_CHARS, SSE_MAX_DELAY, SSE_HEARTBEAT, RESUMABLE_STREAMS
+from utils.metrics import client_disconnects
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # 关闭 Nginx 代理缓冲
+}
+
+
+@dataclass(frozen=True)
+class SSEConfig:
+    max_chars: int = SSE_MAX_CHARS  # 缓冲达到该字符数立即发送
+    max_delay: float = SSE_MAX_DELAY  # 缓冲中最早的增量最多等待多久
+    heartbeat: float = SSE_HEARTBEAT  # 无数据时的心跳间隔
+
+
+DEFAULT_SSE_CONFIG = SSEConfig()
+
+
+def format_event(data: dict, event_id: Optional[int] = None, event: Optional[str] = None) -> str:
+    """编码一帧 SSE 事件"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_events(deltas: AsyncIterator[Union[str, tuple, dict]],
+                     config: SSEConfig = DEFAULT_SSE_CONFIG,
+                     start_id: int = 0,
+                     channel_field: str = "role") -> AsyncIterator[list[tuple[int, dict]]]:
+    """
+    合并增量文本，按发送时机产出一批 (事件 id, 数据)
+
+    - 首个增量立即发送，保证首字延迟
+    - 之后缓冲达到 max_chars 或最早的增量等待超过 max_delay 时发送
+    - 空闲超过 heartbeat 秒产出空列表，由调用方发送心跳
+    - 上游抛出异常时产出 {"error": ...} 事件后结束
+
+    上游可以产出三种元素：
+    - str：普通增量文本，编码为 {"content": ...}
+    - (channel, str)：多路复用的增量，按 channel 分别合并，编码为 {channel_field: channel, "content": ...}
+    - dict：控制事件，先发送已缓冲的内容，再原样立即发送
+    """
+    iterator = deltas.__aiter__()
+    event_id = start_id
+    buffers: dict[Optional[str], list[str]] = {}
+    buffered = 0
+    buffer_since = 0.0
+    last_write = time.monotonic()
+    seen: set = set()
+    pending: Optional[asyncio.Future] = None
+
+    def event(data: dict) -> tuple[int, dict]:
+        nonlocal event_id
+        event_id += 1
+        return event_id, data
+
+    def flush() -> list[tuple[int, dict]]:
+        nonlocal buffered
+        events = []
+        for channel, parts in buffers.items():
+            data = {"content": "".join(parts)}
+            if channel is not None:
+                data = {channel_field: channel, **data}
+            events.append(event(data))
+        buffers.clear()
+        buffered = 0
+        return events
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+
+            now = time.monotonic()
+            if buffers:
+                timeout = max(0.0, buffer_since + config.max_delay - now)
+            else:
+                timeout = max(0.0, last_write + config.heartbeat - now)
+
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # 超时：有缓冲则发送，否则发心跳
+                yield flush()
+                last_write = time.monotonic()
+                continue
+
+            task, pending = pending, None
+            try:
+                item = task.result()
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                print(f"流式生成失败: {e}")
+                yield flush() + [event({"error": str(e)})]
+                return
+
+            if isinstance(item, dict):
+                yield flush() + [event(item)]
+                last_write = time.monotonic()
+                continue
+
+            channel, delta = item if isinstance(item, tuple) else (None, item)
+            if not delta:
+                continue
+            if not buffers:
+                buffer_since = time.monotonic()
+            buffers.setdefault(channel, []).append(delta)
+            buffered += len(delta)
+            if channel not in seen or buffered >= config.max_chars:
+                seen.add(channel)
+                yield flush()
+                last_write = time.monotonic()
+
+        if buffers:
+            yield flush()
+    finally:
+        # 客户端断开等提前退出时，取消挂起的读取并关闭上游生成器
+        if pending is not None and not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except BaseException:
+                pass
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def sse_stream(deltas: AsyncIterator[Union[str, tuple, dict]],
+                     config: SSEConfig = DEFAULT_SSE_CONFIG,
+                     start_id: int = 0,
+                     channel_field: str = "role") -> AsyncIterator[str]:
+    """合并增量文本并编码为 SSE 帧，空闲时发送 ": ping" 心跳注释，规则见 sse_events"""
+    events = sse_events(deltas, config, start_id, channel_field)
+    try:
+        async for batch in events:
+            yield "".join(format_event(data, event_id) for event_id, data in batch) if batch else ": ping\n\n"
+    finally:
+        await events.aclose()
+
+
+class DisconnectAwareResponse(StreamingResponse):
+    """
+    始终并行监听 http.disconnect 的流式响应
+
+    ASGI 2.4 下 Starlette 只在写出失败时才发现客户端断开，等待首字或排队期间会一直占着上游；
+    这里收到断开消息就取消输出任务并关闭生成器，生成器的 finally 负责取消上游请求。
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stream = asyncio.ensure_future(self.stream_response(send))
+        listener = asyncio.ensure_future(self.listen_for_disconnect(receive))
+        try:
+            done, _ = await asyncio.wait({stream, listener}, return_when=asyncio.FIRST_COMPLETED)
+            if stream in done:
+                try:
+                    stream.result()
+                except OSError:
+                    self._on_disconnect()
+                return
+            self._on_disconnect()
+            stream.cancel()
+            try:
+                await stream
+            except BaseException:
+                pass
+            # 生成器可能停在 yield 处没有收到取消，显式关闭
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        finally:
+            for task in (stream, listener):
+                if not task.done():
+                    task.cancel()
+        if self.background is not None:
+            await self.background()
+
+    disconnect_message = "🔌 客户端已断开，取消生成"
+
+    def _on_disconnect(self):
+        client_disconnects.inc()
+        print(self.disconnect_message)
+
+
+class ResumableResponse(DisconnectAwareResponse):
+    """订阅后台生成的流式响应：客户端断开只结束本次订阅，生成继续进行，可凭 Last-Event-ID 续传"""
+
+    disconnect_message = "🔌 客户端已断开，生成在后台继续，可凭 Last-Event-ID 续传"
+
+
+def sse_response(deltas: AsyncIterator[Union[str, tuple, dict]],
+                 config: SSEConfig = DEFAULT_SSE_CONFIG,
+                 channel_field: str = "role") -> StreamingResponse:
+    """
+    把增量文本流包装成 text/event-stream 响应
+
+    默认客户端断开即取消生成；开启 RESUMABLE_STREAMS 且请求声明可续传（X-Resumable-Stream: true）时，
+    生成在后台独立运行，响应头 X-Stream-Id 为续传用的流 id；
+    请求占用的准入名额由后台生成接管，客户端断开后仍计入并发，直到生成结束或被放弃；
+    可续传流的数量或内存已达上限时退回普通流式响应
+    """
+    from utils.admission import current_ticket, resumable_requested
+
+    if RESUMABLE_STREAMS and resumable_requested.get():
+        from utils.streams import stream_registry  # 延迟导入，utils.streams 依赖本模块
+
+        stream = stream_registry.start(deltas, config, channel_field, ticket=current_ticket.get())
+        if stream is not None:
+            return resumable_response(stream, 0, config.heartbeat)
+    return DisconnectAwareResponse(
+        sse_stream(deltas, config, channel_field=channel_field),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+def resumable_response(stream, last_event_id: int = 0, heartbeat: float = SSE_HEARTBEAT) -> StreamingResponse:
+    """订阅可续传流，从 last_event_id 之后的事件开始推送"""
+    from utils.streams import stream_registry
+
+    return ResumableResponse(
+        stream_registry.subscribe(stream, last_event_id, heartbeat),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Stream-Id": stream.id},
+    )
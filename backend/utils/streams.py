@@ -0,0 +1,267 @@
+# @Function: 可续传的流式生成
+# 每个流式生成作为独立的后台任务运行，不随客户端连接结束；编码好的 SSE 事件保存在有界环形缓冲中。
+# 断线的客户端带上 Last-Event-ID 重新连接 /api/streams/{id}，只补发缺失的事件后继续实时推送；
+# 不消费事件流的调用方可轮询或长轮询 /api/streams/{id}/result 取完整结果。
+# 生成结束 STREAM_TTL 秒后清理；无人连接也无人查询超过 STREAM_ABANDON_AFTER 秒的生成会被取消，不再消耗 token。
+import asyncio
+import itertools
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Optional, Union
+
+from config import (
+    STREAM_BUFFER_EVENTS,
+    STREAM_BUFFER_BYTES,
+    STREAM_TTL,
+    STREAM_ABANDON_AFTER,
+    STREAM_MAX_STREAMS,
+    STREAM_MAX_BYTES,
+)
+from utils.admission import Ticket
+from utils.metrics import stream_resumes, streams_finished, stream_buffer_bytes
+from utils.sse import SSEConfig, sse_events, format_event
+
+
+class ResumableStream:
+    def __init__(self, channel_field: str, max_events: int, max_bytes: int):
+        self.id = uuid.uuid4().hex
+        self.channel_field = channel_field
+        self.max_bytes = max_bytes
+        self.status = "running"  # running / succeeded / failed / cancelled
+        self.events: deque[tuple[int, str, int]] = deque(maxlen=max_events)  # (事件 id, SSE 帧, 字节数)
+        self.buffer_bytes = 0
+        self.last_id = 0
+        # 完整结果：普通增量、各 channel 的增量、控制事件
+        self.content: list[str] = []
+        self.channels: dict[str, list[str]] = {}
+        self.controls: list[dict] = []
+        self.result_bytes = 0
+        self.error: Optional[str] = None
+        self.subscribers = 0
+        self.last_access = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        self._finished = asyncio.Event()
+
+    @property
+    def size(self) -> int:
+        return self.buffer_bytes + self.result_bytes
+
+    @property
+    def first_id(self) -> int:
+        """缓冲中最早的事件 id；更早的事件已被淘汰"""
+        return self.events[0][0] if self.events else self.last_id + 1
+
+    def touch(self):
+        self.last_access = time.monotonic()
+
+    def append(self, batch: list[tuple[int, dict]]) -> int:
+        """写入一批事件，返回占用内存的变化量（字节）"""
+        before = self.size
+        for event_id, data in batch:
+            frame = format_event(data, event_id)
+            size = len(frame.encode("utf-8"))
+            if len(self.events) == self.events.maxlen:
+                self.buffer_bytes -= self.events[0][2]
+            self.events.append((event_id, frame, size))
+            self.buffer_bytes += size
+            while self.buffer_bytes > self.max_bytes and len(self.events) > 1:
+                self.buffer_bytes -= self.events.popleft()[2]
+            self.last_id = event_id
+            self._collect(data)
+        self._changed.set()
+        self._changed = asyncio.Event()
+        return self.size - before
+
+    def _collect(self, data: dict):
+        if "content" in data and set(data) <= {"content", self.channel_field}:
+            channel = data.get(self.channel_field)
+            parts = self.content if channel is None else self.channels.setdefault(channel, [])
+            parts.append(data["content"])
+            self.result_bytes += len(data["content"].encode("utf-8"))
+            return
+        if "error" in data:
+            self.error = str(data["error"])
+        self.controls.append(data)
+        self.result_bytes += len(str(data).encode("utf-8"))
+
+    def finish(self, status: str):
+        self.status = status
+        self.finished_at = time.monotonic()
+        self._changed.set()
+        self._finished.set()
+
+    @property
+    def done(self) -> bool:
+        return self.status != "running"
+
+    async def wait(self, timeout: float) -> bool:
+        """长轮询：等待生成结束，超时返回 False"""
+        if self.done:
+            return True
+        try:
+            await asyncio.wait_for(self._finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def result(self) -> dict:
+        result = {
+            "id": self.id,
+            "status": self.status,
+            "last_event_id": self.last_id,
+            "content": "".join(self.content),
+            "events": self.controls,
+            "error": self.error,
+        }
+        if self.channels:
+            result["channels"] = {channel: "".join(parts) for channel, parts in self.channels.items()}
+        return result
+
+
+class StreamRegistry:
+    def __init__(self,
+                 max_events: int = STREAM_BUFFER_EVENTS,
+                 max_stream_bytes: int = STREAM_BUFFER_BYTES,
+                 ttl: float = STREAM_TTL,
+                 abandon_after: float = STREAM_ABANDON_AFTER,
+                 max_streams: int = STREAM_MAX_STREAMS,
+                 max_bytes: int = STREAM_MAX_BYTES):
+        self.max_events = max_events
+        self.max_stream_bytes = max_stream_bytes
+        self.ttl = ttl
+        self.abandon_after = abandon_after
+        self.max_streams = max_streams
+        self.max_bytes = max_bytes
+        self._streams: "OrderedDict[str, ResumableStream]" = OrderedDict()
+        self._bytes = 0
+        self.resumed = 0
+        self.rejected = 0
+
+    def _account(self, delta: int):
+        self._bytes += delta
+        stream_buffer_bytes.set(self._bytes)
+
+    def _evict(self, stream: ResumableStream):
+        del self._streams[stream.id]
+        self._account(-stream.size)
+
+    def _sweep(self):
+        """清理过期的流；超出数量或内存上限时，从最早结束的流开始提前清理"""
+        now = time.monotonic()
+        finished = [s for s in self._streams.values() if s.done]
+        for stream in finished:
+            if now - stream.finished_at >= self.ttl:
+                self._evict(stream)
+        finished = sorted((s for s in finished if s.id in self._streams), key=lambda s: s.finished_at)
+        while finished and (len(self._streams) >= self.max_streams or self._bytes >= self.max_bytes):
+            self._evict(finished.pop(0))
+
+    def start(self, deltas: AsyncIterator[Union[str, tuple, dict]], config: SSEConfig,
+              channel_field: str = "role", ticket: Optional[Ticket] = None) -> Optional[ResumableStream]:
+        """
+        在后台启动生成；流数或内存已达上限时返回 None，由调用方按普通流式响应处理
+
+        ticket 为请求占用的准入名额，由后台生成接管到结束，客户端断开后重新提交不能绕过并发上限
+        """
+        self._sweep()
+        if len(self._streams) >= self.max_streams or self._bytes >= self.max_bytes:
+            self.rejected += 1
+            return None
+        stream = ResumableStream(channel_field, self.max_events, self.max_stream_bytes)
+        self._streams[stream.id] = stream
+        held = ticket.transfer() if ticket is not None else None
+        stream.task = asyncio.create_task(self._produce(stream, deltas, config, held))
+        return stream
+
+    def get(self, stream_id: str) -> Optional[ResumableStream]:
+        self._sweep()
+        stream = self._streams.get(stream_id)
+        if stream is not None:
+            stream.touch()
+        return stream
+
+    async def _produce(self, stream: ResumableStream, deltas: AsyncIterator, config: SSEConfig,
+                       ticket: Optional[Ticket] = None):
+        events = sse_events(deltas, config, channel_field=stream.channel_field)
+        status = "cancelled"
+        try:
+            async for batch in events:
+                if batch:
+                    self._account(stream.append(batch))
+                # 空批次是心跳时机，顺便检查是否已无人关心这次生成
+                if not stream.subscribers and time.monotonic() - stream.last_access > self.abandon_after:
+                    status = "abandoned"
+                    print(f"🗑️ 流 {stream.id} 超过 {self.abandon_after:.0f} 秒无人连接，取消生成")
+                    return
+            status = "failed" if stream.error else "succeeded"
+        finally:
+            await events.aclose()
+            if ticket is not None:
+                ticket.release()
+            streams_finished.inc(status)
+            stream.finish("cancelled" if status == "abandoned" else status)
+
+    async def subscribe(self, stream: ResumableStream, last_event_id: int = 0,
+                        heartbeat: float = 15.0) -> AsyncIterator[str]:
+        """补发 last_event_id 之后的事件，然后实时推送直到生成结束"""
+        stream.subscribers += 1
+        sent = last_event_id
+        try:
+            if last_event_id:
+                self.resumed += 1
+                missed = stream.first_id > last_event_id + 1
+                stream_resumes.inc("truncated" if missed else "full")
+                if missed:
+                    # 缺失的事件已超出缓冲，告知客户端从哪里继续；完整结果仍可通过 result 接口获取
+                    yield format_event({"first_id": stream.first_id, "last_event_id": last_event_id},
+                                       event="truncated")
+            while True:
+                changed = stream._changed
+                # 事件 id 连续递增，可直接算出下一个未发送事件在缓冲中的位置
+                start = max(0, sent + 1 - stream.first_id)
+                frames = [frame for _, frame, _ in itertools.islice(stream.events, start, None)]
+                if frames:
+                    sent = stream.last_id
+                    yield "".join(frames)
+                    continue
+                if stream.done:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            stream.subscribers -= 1
+            stream.touch()
+
+    def cancel(self, stream_id: str) -> Optional[ResumableStream]:
+        stream = self._streams.get(stream_id)
+        if stream is not None and stream.task is not None and not stream.task.done():
+            stream.task.cancel()
+        return stream
+
+    def stats(self) -> dict:
+        return {
+            "streams": len(self._streams),
+            "running": sum(1 for s in self._streams.values() if not s.done),
+            "buffer_bytes": self._bytes,
+            "resumed": self.resumed,
+            "rejected": self.rejected,
+        }
+
+    async def aclose(self):
+        tasks = [s.task for s in self._streams.values() if s.task is not None and not s.task.done()]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except BaseException:
+                pass
+
+
+# 创建单例实例
+stream_registry = StreamRegistry()